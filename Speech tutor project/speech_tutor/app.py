@@ -1,13 +1,26 @@
 # Final version of app.py with enhanced layout, prompt fix, and gradient UI
 import gradio as gr
-from whisper_engine import transcribe
-from grammar_corrector import get_corrected_grammar, get_speech_feedback, compare_answers
+from whisper_engine import submit_transcription, warm_up_asr
+from audio_ingest import AudioRejected
+from asr_server import ASRServerError
+from audio_archive import archive_audio
+from fluency import analyze_fluency
+from grammar_corrector import start_evaluation
 from llm_engine import call_ollama
-from string import Template
+from model_manager import start_warm_up
+from prompt_registry import render
+from deadline import Deadline
+from question_bank import QuestionBank
+from interview_prep import generate_interview_questions, stream_interview_questions
+from job_api import create_job_api, start_job_api, job_api_port
+from metrics import start_metrics_server, metrics_port, register_collector, CACHE_REQUESTS, HISTORY_SAVE_SECONDS
+from constants import SUBMISSION_BUDGET_SECONDS, PENDING_GRACE_SECONDS, UI_CONCURRENCY_COUNT, UI_QUEUE_MAX_SIZE, CUSTOM_QUESTION_IDEAL_ANSWER
+from concurrent.futures import wait, FIRST_COMPLETED
 # import HuggingFaceLogin as HFL
 import json
 import datetime
 from pathlib import Path
+import threading
 
 # Import UI components
 from ui import create_ui, calculate_rating, format_star_rating
@@ -15,52 +28,56 @@ from ui import create_ui, calculate_rating, format_star_rating
 # HFL.login_to_huggingface()
 
 # --- Generate question + ideal answer ---
-def generate_question_and_answer(topic, difficulty, model):
+question_bank = QuestionBank()
+
+def generate_question_and_answer(topic, difficulty, model, user_id=None):
+    """
+    Returns (question, ideal_answer). Questions the user hasn't seen are served
+    from the question bank; the LLM is only called when the bank has none left,
+    and the bank is topped up in the background when it runs low.
+    """
+    seen_questions = [s["question"] for s in load_history(user_id)["sessions"]] if user_id else []
+    generate_for_bank = lambda: _generate_bank_question(topic, difficulty, model)
+
+    entry = question_bank.serve(topic, difficulty, user_id, seen_questions)
+    CACHE_REQUESTS.inc(cache="question_bank", result="hit" if entry else "miss")
+    if entry:
+        question_bank.ensure_stock(topic, difficulty, generate_for_bank, user_id, seen_questions)
+        return entry["question"], entry["ideal_answer"]
+
+    question, ideal, from_llm = generate_question_with_llm(topic, difficulty, model)
+    if from_llm:
+        question_bank.add(topic, difficulty, question, ideal, model, served_to=user_id)
+    # Refill only once the user has their question, so it never waits behind the prefetch
+    question_bank.ensure_stock(topic, difficulty, generate_for_bank, user_id, seen_questions + [question])
+    return question, ideal
+
+def _generate_bank_question(topic, difficulty, model):
+    question, ideal, from_llm = generate_question_with_llm(topic, difficulty, model)
+    return (question, ideal, model) if from_llm else None
+
+def generate_question_with_llm(topic, difficulty, model):
+    """
+    Generates a new question and ideal answer with the LLM. Returns
+    (question, ideal_answer, from_llm); `from_llm` is False when the fallback
+    question or placeholder answer had to be used.
+    """
     # Add a random seed to prevent repetition
     import random
     random_seed = random.randint(1, 10000)
     
-    prompt = Template("""
-You are a professor and recognized expert in "$topic".
-
-Create a concise, precise speaking prompt at a "$difficulty" level. Your task:
-
-1. Generate a BRIEF, focused question about "$topic" that:
-   - Is intellectually stimulating but CONCISE (max 1-2 sentences)
-   - Requires critical thinking appropriate for the difficulty level
-   - Avoids vague or overly broad phrasing
-   - Is DIFFERENT from standard/common questions on this topic
-
-2. Difficulty guidelines:
-   - Easy: Clear, accessible language about familiar concepts
-   - Medium: Focused questions on specific concepts requiring explanation
-   - Hard: Precise questions on advanced concepts requiring structured argument
-
-3. Question format requirements:
-   - BREVITY is essential - questions should be direct and to the point
-   - For medium/hard levels, focus on SPECIFIC aspects rather than broad topics
-   - Include a clear focus that guides the speaker
-
-Output format:
-Question: <Your concise, focused question - NO MORE THAN 1-2 SENTENCES>
-Ideal Answer: <A well-structured response showing appropriate depth for the difficulty level>
-
-IMPORTANT: 
-- Use random seed $random_seed to ensure question variety
-- Questions MUST be brief and precise
-- Avoid lengthy, multi-part questions
-- Focus on quality over quantity in both question and answer
-""").substitute(topic=topic, difficulty=difficulty, random_seed=random_seed)
-
-    # First attempt
-    response = call_ollama(prompt, model=model)
+    prompt = render("question_generation", topic=topic, difficulty=difficulty, random_seed=random_seed)
+
+    # First attempt — simultaneous requests for the same slot share one generation,
+    # the random seed only exists for variety between requests
+    response = call_ollama(prompt, model=model, task="question", dedupe_key=f"{topic}|{difficulty}")
     try:
         question, ideal = response.split("Ideal Answer:")
         question_text = question.replace("Question:", "").strip()
         
         # Verify we don't have an empty or default question
         if question_text and not question_text.lower().startswith("what do you think about"):
-            return question_text, ideal.strip()
+            return question_text, ideal.strip(), True
     except:
         pass  # Continue to fallback if there's an exception
     
@@ -75,30 +92,106 @@ IMPORTANT:
     fallback_answer = f"This would require a thoughtful response about {topic} appropriate for {difficulty} difficulty level."
     
     # Try one more time with a simpler prompt
-    retry_prompt = f"Generate a single, concise question about {topic} at {difficulty} difficulty level."
-    retry_response = call_ollama(retry_prompt, model=model)
+    retry_prompt = render("question_retry", topic=topic, difficulty=difficulty)
+    retry_response = call_ollama(retry_prompt, model=model, task="question_retry")
     
     if len(retry_response) > 10 and "?" in retry_response:
         # Use the retry response if it looks reasonable
-        return retry_response.strip(), fallback_answer
+        return retry_response.strip(), fallback_answer, False
     
     # Use our fallback if all else fails
-    return fallback_question, fallback_answer
+    return fallback_question, fallback_answer, False
 
 # --- Full agentic flow ---
-def tutor_conversation(audio, question, ideal_answer, difficulty, model):
+PENDING_TEXT = "⏳ Feedback pending — it will appear here when ready."
+TIMED_OUT_TEXT = "⌛ This feedback took too long and was skipped."
+
+def tutor_conversation_stream(audio, question, ideal_answer, difficulty, model, budget=SUBMISSION_BUDGET_SECONDS):
+    """
+    Runs one submission within a latency budget and yields its state as dicts with
+    `transcript`, `flagged_words`, `fluency`, `grammar`, `feedback`, `comparison`,
+    `pending` (names of sections still running), `final` and `queue_position`
+    (set while waiting for a transcription slot).
+
+    Transcription is bounded by the budget. The transcript and locally computed
+    fluency metrics are yielded as soon as it finishes, with PENDING_TEXT in the
+    LLM sections; the state is yielded again each time a section arrives, for up
+    to PENDING_GRACE_SECONDS after the budget.
+    """
+    state = {"transcript": "", "flagged_words": [], "fluency": None, "grammar": "", "feedback": "", "comparison": "", "pending": [], "final": True, "queue_position": None}
     if not audio:
-        return "❌ No audio received", "", "", ""
+        yield dict(state, transcript="❌ No audio received")
+        return
 
-    transcript, flagged_words = transcribe(audio)
+    deadline = Deadline(budget)
+    transcription, position = submit_transcription(audio, deadline=deadline)
+    if position:
+        yield dict(state, transcript="", pending=["grammar", "feedback", "comparison"], final=False, queue_position=position)
+    try:
+        asr = transcription.result()
+    except AudioRejected as e:
+        yield dict(state, transcript=f"❌ {e}")
+        return
+    except ASRServerError as e:
+        yield dict(state, transcript=f"❌ Transcription failed: {e}")
+        return
+    transcript, flagged_words = asr["transcript"], asr["flagged_words"]
     if not transcript:
-        return "❌ No speech detected", "", "", ""
+        yield dict(state, transcript="❌ No speech detected")
+        return
+
+    # LLM calls may outlive the budget so late sections can still be filled in
+    hard_deadline = Deadline(budget + PENDING_GRACE_SECONDS)
+    futures = start_evaluation(transcript, flagged_words, question=question, ideal_answer=ideal_answer, model=model, deadline=hard_deadline)
+    fluency = analyze_fluency(asr["words"], asr["starts"], asr["ends"], asr["probabilities"])
+    state.update(transcript=transcript, flagged_words=flagged_words, fluency=fluency)
 
-    grammar_output = get_corrected_grammar(transcript, question=question, model=model)
-    feedback_output = get_speech_feedback(flagged_words, transcript=transcript, question=question, model=model)
-    comparison = compare_answers(transcript, ideal_answer, model=model)
+    last_pending = None
+    while True:
+        pending = _collect_sections(futures, state)
+        if not pending:
+            yield dict(state, pending=[], final=True)
+            return
 
-    return transcript, grammar_output, feedback_output, comparison
+        if hard_deadline.expired():
+            for name in pending:
+                futures[name].cancel()
+                state[name] = TIMED_OUT_TEXT
+            yield dict(state, pending=[], final=True)
+            return
+
+        if pending != last_pending:
+            # Show what we have now, and again whenever another section arrives
+            last_pending = pending
+            yield dict(state, pending=pending, final=False)
+
+        wait([futures[name] for name in pending], timeout=hard_deadline.remaining(), return_when=FIRST_COMPLETED)
+
+def _collect_sections(futures, state):
+    """
+    Copies finished sections into `state`, marks the rest as pending and
+    returns their names.
+    """
+    pending = []
+    for name, future in futures.items():
+        if not future.done():
+            state[name] = PENDING_TEXT
+            pending.append(name)
+            continue
+        try:
+            state[name] = future.result()
+        except Exception as e:
+            state[name] = f"❌ Feedback failed: {str(e)}"
+    return pending
+
+def tutor_conversation(audio, question, ideal_answer, difficulty, model):
+    """
+    Blocking form of `tutor_conversation_stream`: returns
+    (transcript, grammar, feedback, comparison) once every section is done.
+    """
+    for state in tutor_conversation_stream(audio, question, ideal_answer, difficulty, model):
+        pass
+    return state["transcript"], state["grammar"], state["feedback"], state["comparison"]
 
 def resolve_topic(choice_mode, dropdown_value, custom_value):
     """
@@ -107,7 +200,7 @@ def resolve_topic(choice_mode, dropdown_value, custom_value):
     """
     return custom_value.strip() if choice_mode == "Enter custom topic" and custom_value else dropdown_value
 
-def handle_custom_question(choice_mode, current_question, topic, difficulty, model):
+def handle_custom_question(choice_mode, current_question, topic, difficulty, model, user_id=None):
     """
     Handles custom question input:
     - If in custom topic mode and question is already populated, use that question
@@ -115,36 +208,19 @@ def handle_custom_question(choice_mode, current_question, topic, difficulty, mod
     """
     if choice_mode == "Enter custom topic" and current_question.strip():
         # Return the existing question and a placeholder for ideal answer
-        return current_question, "This is a custom question. No ideal answer reference is available."
+        return current_question, CUSTOM_QUESTION_IDEAL_ANSWER
     else:
         # Generate a new question and ideal answer
-        return generate_question_and_answer(topic, difficulty, model)
-
-# Function to generate interview questions
-def generate_interview_questions(topic, personality_traits, technical_skills, model):
-    prompt = f"""Generate 5 interview questions related to {topic} that would be appropriate for someone with the following traits:
-    
-Personality traits: {personality_traits}
-Technical skills: {technical_skills}
-
-For each question, provide:
-1. The question itself (concise and clear)
-2. A brief hint/guideline on how to approach answering it
-3. Key points that should be included in a good answer
-
-Format each question as:
-Q: [Question text]
-Hint: [Brief guidance on approaching the answer]
-Key points: [Bullet points of important elements to include]
-
-Make the questions varied in difficulty and approach.
-"""
-    
-    response = call_ollama(prompt, model=model)
-    return response
+        return generate_question_and_answer(topic, difficulty, model, user_id=user_id)
 
 # Function to save user history
-def save_history(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating):
+def save_history(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating, fluency=None, ideal_answer=None, audio=None, model=None):
+    # Keep the recording so the session can be re-evaluated later (see audio_archive.py)
+    audio_id = archive_audio(audio) if audio else None
+    with HISTORY_SAVE_SECONDS.time():
+        return _save_history(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating, fluency, ideal_answer, audio_id, model)
+
+def _save_history(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating, fluency=None, ideal_answer=None, audio_id=None, model=None):
     # Create history directory if it doesn't exist
     history_dir = Path("user_history")
     history_dir.mkdir(exist_ok=True)
@@ -172,6 +248,14 @@ def save_history(user_id, topic, difficulty, question, transcript, grammar, feed
         "comparison_feedback": comparison,
         "rating": rating
     }
+    if model:
+        new_session["model"] = model
+    if fluency:
+        new_session["fluency"] = fluency
+    if ideal_answer:
+        new_session["ideal_answer"] = ideal_answer
+    if audio_id:
+        new_session["audio_id"] = audio_id
     
     history["sessions"].append(new_session)
     
@@ -193,12 +277,42 @@ def load_history(user_id):
 app = create_ui(
     generate_question_and_answer=generate_question_and_answer,
     tutor_conversation=tutor_conversation,
+    tutor_conversation_stream=tutor_conversation_stream,
     generate_interview_questions=generate_interview_questions,
+    generate_interview_questions_stream=stream_interview_questions,
     load_history=load_history,
     save_history=save_history,
     handle_custom_question=handle_custom_question
 )
 
+@register_collector
+def _ui_queue_metrics():
+    # Gradio 3 doesn't expose its queue publicly; report nothing until it exists
+    queue = getattr(app, "_queue", None)
+    if queue is None:
+        return []
+    busy = sum(job is not None for job in getattr(queue, "active_jobs", []))
+    return [
+        ("speech_tutor_ui_queue_waiting", "UI events waiting in Gradio's queue", {(): len(getattr(queue, "event_queue", []))}),
+        ("speech_tutor_ui_queue_active", "Gradio queue workers busy with an event", {(): busy}),
+    ]
+
 if __name__ == "__main__":
+    # Load the configured models in the background so first requests don't pay the load time
+    start_warm_up()
+    # Whisper is loaded here only when there is no shared ASR server (asr_server.py) to use
+    threading.Thread(target=warm_up_asr, name="asr-warm-up", daemon=True).start()
+    # Prometheus metrics for capacity planning and alerting
+    if metrics_port():
+        start_metrics_server(metrics_port())
+    # Headless job API for integrations; its jobs run on their own worker pool, not Gradio's threads
+    if job_api_port():
+        start_job_api(
+            create_job_api(tutor_conversation_stream, generate_question_and_answer, save_history, calculate_rating),
+            job_api_port()
+        )
+    # Queueing is required for streaming partial results to the UI
+    # and bounds how many requests may wait; the rest are turned away with "Queue is full"
+    app.queue(concurrency_count=UI_CONCURRENCY_COUNT, max_size=UI_QUEUE_MAX_SIZE)
     # Use a random port since specific ports are in use
     app.launch(share=True)
\ No newline at end of file
@@ -0,0 +1,289 @@
+# asr_server.py — Shared Whisper server for several app processes, and its client
+#
+# One server process owns the Whisper model(s); app processes send it recordings
+# over a local socket instead of each loading their own copy. Requests from all
+# clients share one queue and one limit of ASR_SERVER_WORKERS transcriptions.
+#
+#   python asr_server.py --listen unix:/tmp/speech-tutor-asr.sock --models base.en
+#   ASR_SERVER=unix:/tmp/speech-tutor-asr.sock python app.py
+#
+# Protocol: the client sends one JSON line ({"op": "transcribe", "model", "size",
+# "deadline"}) followed by `size` bytes of audio; the server answers with one
+# JSON line ({"ok": true, "result": {...}} or {"ok": false, "error": "..."}).
+# {"op": "ping"} answers with the loaded models and queue counts.
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import Deadline
+from audio_ingest import AudioRejected
+from constants import (
+    ASR_MODEL,
+    ASR_SERVER,
+    ASR_SERVER_CONNECT_TIMEOUT,
+    ASR_SERVER_TIMEOUT,
+    ASR_SERVER_RETRY_SECONDS,
+    ASR_SERVER_WORKERS,
+    ASR_SERVER_MAX_BYTES,
+)
+
+# Longest header line accepted, in bytes
+MAX_HEADER_BYTES = 64 * 1024
+# Bytes per socket read or write of audio
+SEND_CHUNK_BYTES = 1024 * 1024
+# Uploads larger than this are spooled to a temporary file instead of memory
+SPOOL_MEMORY_BYTES = 4 * 1024 * 1024
+
+_down_lock = threading.Lock()
+_down_until = 0.0
+
+
+class ASRServerError(RuntimeError):
+    """
+    The ASR server was reached but couldn't transcribe (e.g. model not served).
+    """
+
+
+class ASRServerTimeout(ASRServerError):
+    """
+    The ASR server took the recording but didn't answer within ASR_SERVER_TIMEOUT.
+    """
+
+
+# --- Client ---
+
+def asr_server_address():
+    return os.environ.get("ASR_SERVER") or ASR_SERVER
+
+
+def parse_address(address):
+    """
+    Returns (socket family, address) for "unix:/path.sock" or "host:port".
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def server_available():
+    """
+    False while a recently unreachable server is being given time to come back.
+    """
+    with _down_lock:
+        return time.monotonic() >= _down_until
+
+
+def mark_server_down(error):
+    global _down_until
+    with _down_lock:
+        _down_until = time.monotonic() + ASR_SERVER_RETRY_SECONDS
+    print(f"⚠️ ASR server unreachable ({error}); transcribing in-process for {ASR_SERVER_RETRY_SECONDS}s")
+
+
+def _request(address, header, audio_file=None, size=0):
+    family, target = parse_address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(ASR_SERVER_CONNECT_TIMEOUT)
+        sock.connect(target)
+        sock.settimeout(ASR_SERVER_TIMEOUT)
+        try:
+            sock.sendall(json.dumps(dict(header, size=size)).encode("utf-8") + b"\n")
+            if audio_file is not None:
+                while chunk := audio_file.read(SEND_CHUNK_BYTES):
+                    sock.sendall(chunk)
+            with sock.makefile("rb") as reply:
+                line = reply.readline()
+        except socket.timeout as e:
+            # Connected, so the server is up, just busy or stuck on this recording
+            raise ASRServerTimeout(f"ASR server didn't answer within {ASR_SERVER_TIMEOUT}s") from e
+    if not line:
+        raise ConnectionError("ASR server closed the connection without answering")
+    try:
+        response = json.loads(line)
+    except ValueError as e:
+        # A cut-off or garbled reply; treat the server like one that hung up
+        raise ConnectionError(f"ASR server sent an unreadable reply: {e}") from e
+    if not isinstance(response, dict):
+        raise ConnectionError("ASR server sent an unreadable reply")
+    if response.get("rejected"):
+        raise AudioRejected(response.get("error"))
+    if not response.get("ok"):
+        raise ASRServerError(f"ASR server error: {response.get('error')}")
+    return response
+
+
+def remote_transcribe(address, audio_path, deadline=None, model_name=ASR_MODEL):
+    """
+    Transcribes `audio_path` on the ASR server at `address` and returns the
+    `whisper_engine.transcribe_detailed` result. Raises OSError when the server
+    can't be reached, AudioRejected when the recording can't be used,
+    ASRServerTimeout when it doesn't answer in time and ASRServerError when
+    transcription fails there.
+    """
+    header = {"op": "transcribe", "model": model_name}
+    if deadline is not None:
+        header["deadline"] = deadline.remaining()
+    size = os.path.getsize(audio_path)
+    with open(audio_path, "rb") as f:
+        result = _request(address, header, f, size)["result"]
+    result["flagged_words"] = [tuple(pair) for pair in result["flagged_words"]]
+    return result
+
+
+def ping(address):
+    """
+    Returns the server's loaded `models` and its `waiting` and `running` counts.
+    """
+    return _request(address, {"op": "ping"})
+
+
+# --- Server ---
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    def handle(self):
+        server = self.server
+        try:
+            header = json.loads(self.rfile.readline(MAX_HEADER_BYTES) or b"{}")
+            op = header.get("op", "transcribe")
+            if op == "ping":
+                self.reply({"ok": True, "models": sorted(server.models), **server.stats()})
+                return
+            if op != "transcribe":
+                self.reply({"ok": False, "error": f"unknown op {op!r}"})
+                return
+
+            size = int(header.get("size", 0))
+            model_name = header.get("model") or ASR_MODEL
+            if size <= 0 or size > server.max_bytes:
+                self.reply({"ok": False, "error": f"recording must be 1–{server.max_bytes} bytes, got {size}"})
+                return
+            if model_name not in server.models:
+                self.reply({"ok": False, "error": f"model {model_name!r} not served (have {sorted(server.models)})"})
+                return
+            # Spooled to disk past SPOOL_MEMORY_BYTES, so large uploads don't sit in memory
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as audio:
+                received = 0
+                while received < size:
+                    chunk = self.rfile.read(min(SEND_CHUNK_BYTES, size - received))
+                    if not chunk:
+                        return  # client went away mid-upload
+                    audio.write(chunk)
+                    received += len(chunk)
+                audio.seek(0)
+
+                # The budget started on the client; what's left of it applies here
+                deadline = Deadline(header["deadline"]) if header.get("deadline") is not None else None
+                result = server.transcribe(audio, deadline, model_name)
+            self.reply({"ok": True, "result": result})
+        except (ConnectionError, BrokenPipeError):
+            pass
+        except AudioRejected as e:
+            self.reply({"ok": False, "error": str(e), "rejected": True})
+        except Exception as e:
+            print(f"❌ ASR request failed: {e}")
+            try:
+                self.reply({"ok": False, "error": str(e)})
+            except OSError:
+                pass
+
+
+class _ServerMixin:
+    """
+    Shared state of the TCP and Unix socket servers: one worker pool for every
+    connection, so the number of transcriptions at once stays bounded.
+    """
+    daemon_threads = True
+
+    def setup_asr(self, models, workers, max_bytes):
+        from whisper_engine import transcribe_local
+
+        self.models = set(models)
+        self.max_bytes = max_bytes
+        self._transcribe_local = transcribe_local
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr-server")
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+
+    def transcribe(self, audio, deadline, model_name):
+        with self._lock:
+            self._waiting += 1
+
+        def run():
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+            try:
+                return self._transcribe_local(audio, deadline, model_name)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        return self._executor.submit(run).result()
+
+    def stats(self):
+        with self._lock:
+            return {"waiting": self._waiting, "running": self._running}
+
+
+class _TCPServer(_ServerMixin, socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+
+class _UnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+def make_server(address, models=(ASR_MODEL,), workers=ASR_SERVER_WORKERS, max_bytes=ASR_SERVER_MAX_BYTES):
+    """
+    Loads `models` and returns a server listening on `address` (call serve_forever()).
+    """
+    from whisper_engine import get_model
+
+    for name in models:
+        get_model(name, num_workers=workers)
+
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(target):
+            os.unlink(target)
+        server = _UnixServer(target, _Handler)
+    else:
+        server = _TCPServer(target, _Handler)
+    server.setup_asr(models, workers, max_bytes)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Whisper transcription to several app processes")
+    parser.add_argument("--listen", default=asr_server_address() or "127.0.0.1:9310",
+                        help='"unix:/path/to.sock" or "host:port"')
+    parser.add_argument("--models", default=ASR_MODEL, help="Comma-separated Whisper models to load")
+    parser.add_argument("--workers", type=int, default=ASR_SERVER_WORKERS, help="Transcriptions run at once")
+    parser.add_argument("--max-bytes", type=int, default=ASR_SERVER_MAX_BYTES, help="Largest recording accepted")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    server = make_server(args.listen, args.models.split(","), args.workers, args.max_bytes)
+    if args.metrics_port:
+        from metrics import start_metrics_server
+        start_metrics_server(args.metrics_port)
+    print(f"🎧 ASR server with {args.models} ({args.workers} workers) listening on {args.listen}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
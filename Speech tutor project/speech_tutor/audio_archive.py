@@ -0,0 +1,231 @@
+# audio_archive.py — Content-addressed archive of submitted recordings
+#
+# Each distinct recording is stored once, named by the SHA-256 of the uploaded
+# file and transcoded to 16 kHz mono Opus (or FLAC):
+#
+#   audio_archive/3f/3f9a…e1.opus
+#
+# save_history links a session to its recording with the `audio_id`. Recordings
+# older than AUDIO_ARCHIVE_RETENTION_DAYS, and the least recently submitted ones
+# beyond AUDIO_ARCHIVE_MAX_BYTES, are deleted. Re-evaluate archived sessions with
+#
+#   python batch_evaluate.py --from-history --output rescored.jsonl
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import av
+import numpy as np
+
+from audio_ingest import decode_pcm, SAMPLE_RATE
+from metrics import CACHE_REQUESTS
+from constants import (
+    AUDIO_ARCHIVE_DIR,
+    AUDIO_ARCHIVE_ENABLED,
+    AUDIO_ARCHIVE_CODEC,
+    AUDIO_ARCHIVE_OPUS_BITRATE,
+    AUDIO_ARCHIVE_RETENTION_DAYS,
+    AUDIO_ARCHIVE_MAX_BYTES,
+    AUDIO_ARCHIVE_CHECK_SECONDS,
+)
+
+# codec -> (FFmpeg encoder, container format, file suffix)
+CODECS = {
+    "opus": ("libopus", "ogg", ".opus"),
+    "flac": ("flac", "flac", ".flac"),
+}
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Transcoding is kept off the request path, one recording at a time
+_archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-archive")
+_pending_lock = threading.Lock()
+_pending = set()  # audio ids being transcoded
+_check_lock = threading.Lock()
+_last_check = 0.0
+
+
+def archive_enabled():
+    value = os.environ.get("AUDIO_ARCHIVE")
+    if value is None:
+        return AUDIO_ARCHIVE_ENABLED
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _codec():
+    """
+    Returns the configured codec, or FLAC when FFmpeg can't encode it.
+    """
+    try:
+        av.codec.Codec(CODECS[AUDIO_ARCHIVE_CODEC][0], "w")
+        return AUDIO_ARCHIVE_CODEC
+    except Exception:
+        return "flac"
+
+
+def _encode(source, destination, codec):
+    encoder, container_format, _ = CODECS[codec]
+    with av.open(str(destination), "w", format=container_format) as output:
+        stream = output.add_stream(encoder, rate=SAMPLE_RATE, layout="mono")
+        if codec == "opus":
+            stream.bit_rate = AUDIO_ARCHIVE_OPUS_BITRATE
+            # About 4x faster than the default (10) for a few percent larger files
+            stream.codec_context.options = {"compression_level": "5"}
+        for block in decode_pcm(source):
+            samples = np.clip(block * 32768.0, -32768, 32767).astype(np.int16).reshape(1, -1)
+            frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+            frame.sample_rate = SAMPLE_RATE
+            for packet in stream.encode(frame):
+                output.mux(packet)
+        for packet in stream.encode(None):
+            output.mux(packet)
+
+
+def audio_path(audio_id, directory=AUDIO_ARCHIVE_DIR):
+    """
+    Returns the archived file for `audio_id`, or None if it isn't (or no longer) archived.
+    """
+    folder = Path(directory) / audio_id[:2]
+    for _, _, suffix in CODECS.values():
+        path = folder / f"{audio_id}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def archive_audio(path, directory=AUDIO_ARCHIVE_DIR):
+    """
+    Returns the audio id of the recording at `path` and archives it unless an
+    identical one is already there. Transcoding runs in the background from a
+    staged copy, so the caller may delete `path` right away. Returns None when
+    archiving is disabled or fails; a submission is never lost over its recording.
+    """
+    if not path or not archive_enabled():
+        return None
+    try:
+        audio_id = hash_file(path)
+        existing = audio_path(audio_id, directory)
+        if existing is not None:
+            # Submitted again: counts as recent for retention
+            os.utime(existing)
+            CACHE_REQUESTS.inc(cache="audio_archive", result="hit")
+            return audio_id
+        with _pending_lock:
+            if audio_id in _pending:
+                return audio_id
+            _pending.add(audio_id)
+
+        CACHE_REQUESTS.inc(cache="audio_archive", result="miss")
+        staged = Path(directory) / ".incoming" / f"{audio_id}{Path(path).suffix}"
+        staged.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # A hard link costs nothing; Gradio's temp dir may be on another filesystem though
+            os.link(path, staged)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(path, staged)
+    except Exception as e:
+        print(f"⚠️ Could not archive {path}: {e}")
+        return None
+
+    _archive_executor.submit(_store, audio_id, staged, Path(directory))
+    return audio_id
+
+
+def _store(audio_id, staged, directory):
+    codec = _codec()
+    destination = directory / audio_id[:2] / f"{audio_id}{CODECS[codec][2]}"
+    # Written under a temporary name so a crash never leaves a truncated recording
+    partial = destination.with_name(f".{destination.name}.part")
+    try:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        _encode(staged, partial, codec)
+        os.replace(partial, destination)
+        print(f"🗄️ Archived recording {audio_id[:12]} ({destination.stat().st_size / 1024:.0f} KB {codec})")
+    except Exception as e:
+        print(f"⚠️ Could not archive recording {audio_id[:12]}: {e}")
+    finally:
+        partial.unlink(missing_ok=True)
+        staged.unlink(missing_ok=True)
+        with _pending_lock:
+            _pending.discard(audio_id)
+    _maybe_enforce_quota(directory)
+
+
+def wait_for_archive():
+    """
+    Blocks until recordings handed to `archive_audio` so far are written.
+    """
+    _archive_executor.submit(lambda: None).result()
+
+
+def _maybe_enforce_quota(directory):
+    global _last_check
+    with _check_lock:
+        if time.monotonic() - _last_check < AUDIO_ARCHIVE_CHECK_SECONDS:
+            return
+        _last_check = time.monotonic()
+    enforce_quota(directory)
+
+
+def enforce_quota(directory=AUDIO_ARCHIVE_DIR, retention_days=AUDIO_ARCHIVE_RETENTION_DAYS, max_bytes=AUDIO_ARCHIVE_MAX_BYTES):
+    """
+    Deletes recordings older than `retention_days`, then the least recently
+    submitted ones until the archive fits in `max_bytes`. Returns the number deleted.
+    """
+    cutoff = time.time() - retention_days * 86400
+    files = []
+    for path in Path(directory).glob("*/*"):
+        # Skip staged uploads and partly written files
+        if path.name.startswith(".") or path.parent.name.startswith("."):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort(reverse=True)
+
+    deleted = 0
+    total = 0
+    for mtime, size, path in files:
+        total += size
+        if mtime < cutoff or total > max_bytes:
+            path.unlink(missing_ok=True)
+            deleted += 1
+    if deleted:
+        print(f"🧹 Deleted {deleted} archived recordings past retention or quota")
+    return deleted
+
+
+def archived_sessions(history_dir="user_history", directory=AUDIO_ARCHIVE_DIR):
+    """
+    Yields {"user_id", "session", "audio"} for every saved session whose
+    recording is still archived, in history file order.
+    """
+    for history_file in sorted(Path(history_dir).glob("*.json")):
+        try:
+            with open(history_file, "r") as f:
+                sessions = json.load(f).get("sessions", [])
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Skipping {history_file}: {e}")
+            continue
+        for session in sessions:
+            audio_id = session.get("audio_id")
+            path = audio_path(audio_id, directory) if audio_id else None
+            if path is not None:
+                yield {"user_id": history_file.stem, "session": session, "audio": str(path)}
@@ -0,0 +1,131 @@
+# audio_ingest.py — Bounded-memory decoding of recordings into 16 kHz mono chunks
+#
+# Recordings are decoded and resampled frame by frame and handed to Whisper in
+# chunks of ASR_CHUNK_SECONDS, so the memory a transcription needs doesn't grow
+# with the length or sample rate of the upload. Uploads over MAX_UPLOAD_BYTES
+# are rejected, and audio past MAX_AUDIO_SECONDS is not decoded at all.
+
+import itertools
+import os
+import tempfile
+from pathlib import Path
+
+import av
+import numpy as np
+
+from constants import MAX_UPLOAD_BYTES, MAX_AUDIO_SECONDS, ASR_CHUNK_SECONDS, ASR_CHUNK_SEARCH_SECONDS
+
+# Whisper's input format
+SAMPLE_RATE = 16000
+# Frame length (seconds) when looking for a quiet place to end a chunk
+QUIET_FRAME_SECONDS = 0.02
+
+
+class AudioRejected(ValueError):
+    pass
+
+
+def check_upload(audio, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Raises AudioRejected when the file at `audio` is larger than `max_bytes`.
+    File objects (already size-checked by whoever received them) pass.
+    """
+    if not isinstance(audio, (str, os.PathLike)):
+        return
+    size = os.path.getsize(audio)
+    if size > max_bytes:
+        raise AudioRejected(f"Recording is too large ({size / 1e6:.0f} MB, limit {max_bytes / 1e6:.0f} MB)")
+
+
+def decode_pcm(audio, max_seconds=MAX_AUDIO_SECONDS):
+    """
+    Yields the recording `audio` (a path or binary file object) as blocks of
+    16 kHz mono float32 samples, as it is decoded. Stops after `max_seconds`.
+    """
+    remaining = int(max_seconds * SAMPLE_RATE)
+    try:
+        container = av.open(audio)
+    except av.error.FFmpegError as e:
+        raise AudioRejected(f"Could not read the recording: {e}") from e
+
+    with container:
+        if not container.streams.audio:
+            raise AudioRejected("The recording has no audio track")
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+        try:
+            frames = container.decode(audio=0)
+            # None at the end flushes the samples the resampler still holds
+            for frame in itertools.chain(frames, [None]):
+                for resampled in resampler.resample(frame):
+                    block = resampled.to_ndarray().reshape(-1)[:remaining]
+                    remaining -= block.size
+                    yield block.astype(np.float32) / 32768.0
+                    if remaining <= 0:
+                        print(f"✂️ Recording is longer than {max_seconds}s — transcribing the first {max_seconds}s")
+                        return
+        except av.error.FFmpegError as e:
+            raise AudioRejected(f"Could not decode the recording: {e}") from e
+
+
+def _quiet_cut(buffer, start, end):
+    """
+    Returns the index of the quietest QUIET_FRAME_SECONDS frame in buffer[start:end].
+    """
+    frame = int(QUIET_FRAME_SECONDS * SAMPLE_RATE)
+    window = buffer[start:end]
+    frames = window[: window.size // frame * frame].reshape(-1, frame)
+    return start + int(np.argmin((frames ** 2).mean(axis=1))) * frame
+
+
+def audio_chunks(audio, chunk_seconds=ASR_CHUNK_SECONDS, max_seconds=MAX_AUDIO_SECONDS):
+    """
+    Yields (offset in seconds, samples) chunks of the decoded recording, each
+    about `chunk_seconds` long and cut at a quiet moment near the boundary.
+    Only one chunk (plus the search margin) is held in memory at a time.
+    """
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    search = int(ASR_CHUNK_SEARCH_SECONDS * SAMPLE_RATE)
+    buffer = np.empty(chunk + search, dtype=np.float32)
+    filled = 0
+    offset = 0
+
+    for block in decode_pcm(audio, max_seconds):
+        while block.size:
+            n = min(buffer.size - filled, block.size)
+            buffer[filled:filled + n] = block[:n]
+            filled += n
+            block = block[n:]
+            if filled < buffer.size:
+                continue
+            cut = _quiet_cut(buffer, chunk - search, buffer.size)
+            yield offset / SAMPLE_RATE, buffer[:cut].copy()
+            # Keep what's past the cut for the next chunk
+            buffer[:filled - cut] = buffer[cut:filled]
+            filled -= cut
+            offset += cut
+
+    if filled:
+        yield offset / SAMPLE_RATE, buffer[:filled].copy()
+
+
+def gradio_temp_dir():
+    return Path(os.environ.get("GRADIO_TEMP_DIR") or Path(tempfile.gettempdir()) / "gradio")
+
+
+def discard_upload(path):
+    """
+    Deletes a recording Gradio saved for this request (and its folder, once
+    empty). Files outside Gradio's temp directory are left alone.
+    """
+    if not path:
+        return
+    path = Path(path).resolve()
+    temp_dir = gradio_temp_dir().resolve()
+    if temp_dir not in path.parents:
+        return
+    try:
+        path.unlink(missing_ok=True)
+        if path.parent != temp_dir:
+            path.parent.rmdir()
+    except OSError:
+        pass  # folder still holds other files
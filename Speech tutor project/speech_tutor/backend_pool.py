@@ -0,0 +1,158 @@
+# backend_pool.py — Health-checked pool of Ollama servers with model-aware routing
+
+import contextlib
+import threading
+import time
+import requests
+
+from constants import BACKEND_HEALTH_CHECK_INTERVAL, BACKEND_EJECT_AFTER_FAILURES
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.failures = 0
+        self.outstanding = 0
+        self.loaded_models = set()     # resident in memory (/api/ps)
+        self.available_models = set()  # pulled on disk (/api/tags)
+        self.last_check = 0.0
+
+
+class BackendPool:
+    """
+    Routes each request to the healthy backend with the fewest outstanding
+    requests, preferring backends that already have the model loaded, then
+    ones that have it pulled. Backends are ejected after repeated failures
+    (health checks or real requests) and re-admitted once a check succeeds.
+    """
+
+    def __init__(self, urls, check_interval=BACKEND_HEALTH_CHECK_INTERVAL, eject_after=BACKEND_EJECT_AFTER_FAILURES):
+        self.backends = [Backend(url) for url in urls]
+        self.check_interval = check_interval
+        self.eject_after = eject_after
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def __len__(self):
+        return len(self.backends)
+
+    def start(self):
+        """
+        Starts the background health checker, which also keeps each backend's
+        list of pulled models current.
+        """
+        with self._lock:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(target=self._check_loop, name="ollama-health", daemon=True)
+            self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            self.check_all()
+            time.sleep(self.check_interval)
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check_backend(backend)
+
+    def check_backend(self, backend):
+        try:
+            tags = requests.get(f"{backend.url}/api/tags", timeout=3)
+            tags.raise_for_status()
+            ps = requests.get(f"{backend.url}/api/ps", timeout=3)
+            ps.raise_for_status()
+        except Exception as e:
+            self._mark_failure(backend, e)
+            return False
+
+        with self._lock:
+            backend.available_models = {m.get("name") or m.get("model") for m in tags.json().get("models", [])}
+            backend.loaded_models = {m.get("name") or m.get("model") for m in ps.json().get("models", [])}
+            backend.last_check = time.time()
+            backend.failures = 0
+            if not backend.healthy:
+                backend.healthy = True
+                print(f"✅ Ollama backend re-admitted: {backend.url}")
+        return True
+
+    def _mark_failure(self, backend, error):
+        with self._lock:
+            backend.failures += 1
+            if backend.healthy and backend.failures >= self.eject_after:
+                backend.healthy = False
+                print(f"🚫 Ollama backend ejected after {backend.failures} failures: {backend.url} ({error})")
+
+    def report_failure(self, url, error):
+        """
+        Counts a failed request against the backend at `url`.
+        """
+        for backend in self.backends:
+            if backend.url == url:
+                self._mark_failure(backend, error)
+
+    def _choose(self, model, exclude):
+        candidates = [b for b in self.backends if b.healthy and b.url not in exclude]
+        if not candidates:
+            # Nothing healthy — try the rest anyway rather than failing outright
+            candidates = [b for b in self.backends if b.url not in exclude] or self.backends
+
+        for has_model in (
+            lambda b: model in b.loaded_models,
+            lambda b: model in b.available_models,
+            lambda b: True,
+        ):
+            matching = [b for b in candidates if has_model(b)]
+            if matching:
+                return min(matching, key=lambda b: b.outstanding)
+
+    @contextlib.contextmanager
+    def acquire(self, model, exclude=()):
+        """
+        Yields the base URL of the backend to use for `model` and counts the
+        request as outstanding on it until the block exits.
+        """
+        self.start()
+        with self._lock:
+            backend = self._choose(model, exclude)
+            backend.outstanding += 1
+        try:
+            yield backend.url
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def mark_loaded(self, url, model):
+        """
+        Records that the backend at `url` just served `model`, so it has it in memory.
+        """
+        with self._lock:
+            for backend in self.backends:
+                if backend.url == url:
+                    backend.loaded_models.add(model)
+
+    def available_models(self):
+        """
+        Returns the models pulled on at least one healthy backend (empty until
+        the first health check has answered).
+        """
+        self.start()
+        with self._lock:
+            return set().union(*(b.available_models for b in self.backends if b.healthy))
+
+    def healthy_count(self):
+        return sum(b.healthy for b in self.backends)
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    "url": b.url,
+                    "healthy": b.healthy,
+                    "failures": b.failures,
+                    "outstanding": b.outstanding,
+                    "loaded_models": sorted(b.loaded_models),
+                }
+                for b in self.backends
+            ]
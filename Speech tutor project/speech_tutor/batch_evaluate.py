@@ -0,0 +1,274 @@
+# batch_evaluate.py — Evaluate a directory or manifest of recorded answers offline
+#
+# Transcription and LLM evaluation run as two pipelined stages with their own
+# worker limits; each result is appended to a JSONL file as soon as it is ready.
+# Re-running with the same output file skips recordings already evaluated.
+#
+#   python batch_evaluate.py --dir homework/ --question "Describe your last trip." --output results.jsonl
+#   python batch_evaluate.py --manifest homework.jsonl --output results.jsonl --asr-workers 2 --llm-workers 6
+#   python batch_evaluate.py --from-history --model phi4-mini:latest --output rescored.jsonl
+#
+# Manifest: JSONL or CSV with an `audio` path and optional `id`, `question`,
+# `ideal_answer`, `user_id`, `topic` and `difficulty`. In directory mode, a
+# `<recording>.json` file next to a recording supplies the same fields.
+
+import argparse
+import csv
+import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from whisper_engine import transcribe_unpooled, get_model
+from asr_server import asr_server_address
+from audio_archive import archived_sessions
+from fluency import analyze_fluency
+from grammar_corrector import evaluate_submission
+from rating import calculate_rating
+from llm_scheduler import llm_request_context, PRIORITY_BATCH
+from constants import DEFAULT_MODEL, BATCH_ASR_WORKERS, BATCH_LLM_WORKERS, AUDIO_EXTENSIONS
+
+
+def load_manifest(path, defaults):
+    """
+    Returns the items listed in a JSONL or CSV manifest. Relative audio paths
+    are resolved against the manifest's directory.
+    """
+    path = Path(path)
+    with open(path, "r", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    for row in rows:
+        audio = Path(row["audio"])
+        if not audio.is_absolute():
+            audio = path.parent / audio
+        items.append(_make_item(dict(row, audio=str(audio)), defaults))
+    return items
+
+
+def scan_directory(directory, defaults):
+    """
+    Returns an item for every recording in `directory` (recursively), with
+    fields from a `<recording>.json` sidecar when there is one.
+    """
+    items = []
+    for audio in sorted(Path(directory).rglob("*")):
+        if audio.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        row = {"audio": str(audio)}
+        sidecar = audio.with_suffix(".json")
+        if sidecar.exists():
+            with open(sidecar, "r") as f:
+                row.update(json.load(f))
+        items.append(_make_item(row, defaults))
+    return items
+
+
+def archived_items(history_dir, defaults):
+    """
+    Returns an item for every saved session whose recording is in the audio
+    archive, with the session's question, topic and difficulty.
+    """
+    items = []
+    for entry in archived_sessions(history_dir):
+        session = entry["session"]
+        row = {
+            "id": f"{entry['user_id']}:{session.get('timestamp')}:{session['audio_id'][:12]}",
+            "audio": entry["audio"],
+            "user_id": entry["user_id"],
+            **{key: session.get(key) for key in ("question", "ideal_answer", "topic", "difficulty")},
+        }
+        items.append(_make_item(row, defaults))
+    return items
+
+
+def _make_item(row, defaults):
+    item = dict(defaults)
+    item.update({k: v for k, v in row.items() if v not in (None, "")})
+    item["id"] = item.get("id") or item["audio"]
+    return item
+
+
+def completed_ids(output_path):
+    """
+    Returns the ids already evaluated without error in an existing output file.
+    """
+    done = set()
+    if not Path(output_path).exists():
+        return done
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; that item runs again
+                continue
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+def transcribe_item(item):
+    started = time.perf_counter()
+    asr = transcribe_unpooled(item["audio"])
+    asr["asr_seconds"] = time.perf_counter() - started
+    return asr
+
+
+def evaluate_item(item, asr, model):
+    started = time.perf_counter()
+    with llm_request_context(priority=PRIORITY_BATCH, owner="batch"):
+        grammar, feedback, comparison = evaluate_submission(
+            asr["transcript"], asr["flagged_words"], item.get("question"), item.get("ideal_answer"), model
+        )
+    return grammar, feedback, comparison, time.perf_counter() - started
+
+
+def build_record(item, asr, evaluation=None, error=None):
+    record = {
+        "id": item["id"],
+        "audio": item["audio"],
+        "question": item.get("question"),
+        "ideal_answer": item.get("ideal_answer"),
+        "user_id": item.get("user_id"),
+        "topic": item.get("topic"),
+        "difficulty": item.get("difficulty"),
+        "model": item.get("model"),
+        "error": error,
+        "evaluated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if asr is not None:
+        fluency = analyze_fluency(asr["words"], asr["starts"], asr["ends"], asr["probabilities"])
+        record.update(
+            transcript=asr["transcript"],
+            flagged_words=asr["flagged_words"],
+            fluency=fluency,
+            audio_duration=asr["duration"],
+            asr_seconds=round(asr["asr_seconds"], 3),
+        )
+    if evaluation is not None:
+        grammar, feedback, comparison, llm_seconds = evaluation
+        record.update(
+            grammar_feedback=grammar,
+            pronunciation_feedback=feedback,
+            comparison_feedback=comparison,
+            llm_seconds=round(llm_seconds, 3),
+            rating=calculate_rating(
+                asr["transcript"], grammar, feedback, comparison,
+                fluency=record["fluency"], flagged_words=asr["flagged_words"], ideal_answer=item.get("ideal_answer")
+            ),
+        )
+    return record
+
+
+def run_batch(items, output_path, model=DEFAULT_MODEL, asr_workers=BATCH_ASR_WORKERS, llm_workers=BATCH_LLM_WORKERS):
+    """
+    Transcribes and evaluates `items`, appending one JSONL record per item to
+    `output_path`. Items already in the file are skipped. Returns a summary dict.
+    """
+    done = completed_ids(output_path)
+    todo = [item for item in items if item["id"] not in done]
+    summary = {"total": len(items), "skipped": len(items) - len(todo), "evaluated": 0, "failed": 0,
+               "audio_seconds": 0.0, "asr_seconds": 0.0, "llm_seconds": 0.0}
+    print(f"📦 {len(todo)} recordings to evaluate ({summary['skipped']} already done)")
+
+    if todo and not asr_server_address():
+        # The batch has its own ASR workers; the model runs as many transcriptions at once as it has workers
+        get_model(num_workers=asr_workers)
+
+    started = time.perf_counter()
+    asr_pool = ThreadPoolExecutor(max_workers=asr_workers, thread_name_prefix="batch-asr")
+    llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="batch-llm")
+    # future -> (stage, item, asr result)
+    pending = {asr_pool.submit(transcribe_item, item): ("asr", item, None) for item in todo}
+
+    with open(output_path, "a") as out:
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary["failed" if record["error"] else "evaluated"] += 1
+            finished = summary["evaluated"] + summary["failed"]
+            print(f"{'❌' if record['error'] else '✅'} [{finished}/{len(todo)}] {record['id']}"
+                  + (f" — {record['error']}" if record["error"] else f" — ⭐ {record['rating']}"))
+
+        try:
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, item, asr = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        write(build_record(item, asr, error=f"{stage} failed: {e}"))
+                        continue
+
+                    if stage == "asr":
+                        summary["audio_seconds"] += result["duration"] or 0.0
+                        summary["asr_seconds"] += result["asr_seconds"]
+                        if not result["transcript"]:
+                            write(build_record(item, result, error="No speech detected"))
+                            continue
+                        llm_future = llm_pool.submit(evaluate_item, item, result, item.get("model") or model)
+                        pending[llm_future] = ("llm", item, result)
+                    else:
+                        summary["llm_seconds"] += result[3]
+                        # Ollama failures come back as messages; record them as errors so a rerun retries them
+                        failed = [text for text in result[:3] if text.startswith(("❌", "⚠️ Could not parse"))]
+                        write(build_record(item, asr, evaluation=result, error=failed[0] if failed else None))
+        finally:
+            # On Ctrl+C, drop queued work; finished records are already on disk
+            asr_pool.shutdown(wait=False, cancel_futures=True)
+            llm_pool.shutdown(wait=False, cancel_futures=True)
+
+    summary["wall_seconds"] = time.perf_counter() - started
+    return summary
+
+
+def format_summary(summary):
+    wall = summary["wall_seconds"] or 1e-9
+    processed = summary["evaluated"] + summary["failed"]
+    return "\n".join([
+        f"📊 Evaluated {summary['evaluated']}, failed {summary['failed']}, skipped {summary['skipped']} of {summary['total']}",
+        f"⏱️ Wall time {wall:.1f}s — {processed / wall * 60:.1f} recordings/min, "
+        f"{summary['audio_seconds'] / wall:.2f}x real time ({summary['audio_seconds'] / 60:.1f} min of audio)",
+        f"🎙️ ASR busy {summary['asr_seconds']:.1f}s, 🤖 LLM busy {summary['llm_seconds']:.1f}s "
+        f"(summed across workers)",
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate recorded answers in bulk")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of recordings")
+    source.add_argument("--manifest", help="JSONL or CSV manifest of recordings")
+    source.add_argument("--from-history", nargs="?", const="user_history", metavar="HISTORY_DIR",
+                        help="Re-evaluate saved sessions from their archived recordings")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--question", help="Question for recordings that don't specify one")
+    parser.add_argument("--ideal-answer", help="Ideal answer for recordings that don't specify one")
+    parser.add_argument("--topic")
+    parser.add_argument("--difficulty", default="Medium")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--asr-workers", type=int, default=BATCH_ASR_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=BATCH_LLM_WORKERS)
+    args = parser.parse_args()
+
+    defaults = {"question": args.question, "ideal_answer": args.ideal_answer, "topic": args.topic,
+                "difficulty": args.difficulty, "model": args.model}
+    if args.from_history:
+        items = archived_items(args.from_history, defaults)
+    elif args.dir:
+        items = scan_directory(args.dir, defaults)
+    else:
+        items = load_manifest(args.manifest, defaults)
+
+    try:
+        summary = run_batch(items, args.output, args.model, args.asr_workers, args.llm_workers)
+        print(format_summary(summary))
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Interrupted — run the same command again to resume from {args.output}")
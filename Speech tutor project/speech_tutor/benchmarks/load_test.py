@@ -0,0 +1,257 @@
+# load_test.py — Concurrent-user load test of the running Gradio app
+#
+# Simulated students each open their own Gradio session and loop through the
+# real flows: pick a topic, generate a question, think, then submit a recorded
+# answer. The number of users steps up level by level; each level reports
+# throughput, p50/p95/p99 per flow and the error rate, and the run ends with
+# the saturation point (the level after which adding users stops helping).
+#
+# Run the app against the mock LLM so only this node is measured:
+#   python mock_ollama.py --port 11501 --latency 0.3 --token-rate 40 --tokens 150
+#   OLLAMA_HOST=http://127.0.0.1:11501 python app.py
+#   python benchmarks/load_test.py --url http://127.0.0.1:7860 --users 1,2,4,8,16 --duration 120
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from gradio_client import Client
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from constants import TOPIC_CHOICES, DIFFICULTY_LEVELS, DEFAULT_MODEL
+from synthetic_audio import make_fixtures, wav_duration
+
+RESULTS_DIR = BENCHMARK_DIR / "results"
+FLOWS = ["start_session", "generate_question", "submit_answer"]
+# Throughput must grow by this much per level, and errors stay below this share
+SATURATION_MIN_GAIN = 0.10
+SATURATION_MAX_ERRORS = 0.05
+
+
+def think(mean, stop):
+    """
+    Waits a random, exponentially distributed time around `mean` seconds
+    (capped at 3x the mean). Returns False if `stop` was set meanwhile.
+    """
+    if mean <= 0:
+        return not stop.is_set()
+    return not stop.wait(min(random.expovariate(1 / mean), 3 * mean))
+
+
+class Recorder:
+    """
+    Collects (flow, started, seconds, ok) samples from every simulated user.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def record(self, flow, started, seconds, ok):
+        with self._lock:
+            self.samples.append((flow, started, seconds, ok))
+
+    def timed(self, flow, fn):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn()
+            # The app reports failures in the output text rather than raising
+            first = result[0] if isinstance(result, (list, tuple)) and result else result
+            ok = not (isinstance(first, str) and first.startswith("❌"))
+            return result
+        except Exception as e:
+            print(f"⚠️ {flow} failed: {e}")
+            return None
+        finally:
+            self.record(flow, started, time.perf_counter() - started, ok)
+
+
+def simulated_user(url, fixtures, args, recorder, stop):
+    """
+    One student: their own session, then question → think → answer until `stop`.
+    """
+    try:
+        client = Client(url, verbose=False)
+    except Exception as e:
+        print(f"⚠️ Could not connect to {url}: {e}")
+        recorder.record("start_session", time.perf_counter(), 0.0, False)
+        return
+
+    recorder.timed("start_session", lambda: client.predict(api_name="/start_session"))
+    model = args.model
+    while not stop.is_set():
+        topic = random.choice(TOPIC_CHOICES)
+        difficulty = random.choice(DIFFICULTY_LEVELS)
+
+        def generate():
+            client.predict("Select from list", topic, "", api_name="/set_topic")
+            question, answer = client.predict("Select from list", "", topic, difficulty, model, api_name="/generate_question")
+            client.predict(question, answer, difficulty, api_name="/set_question")
+            return question, answer
+
+        if recorder.timed("generate_question", generate) is None:
+            if not think(args.think_time, stop):
+                break
+            continue
+
+        # Reading the question, then speaking for as long as the recording lasts
+        path, seconds = random.choice(fixtures)
+        if not think(args.think_time, stop) or stop.wait(seconds * args.speaking_time):
+            break
+        recorder.timed("submit_answer", lambda: client.predict(None, str(path), api_name="/submit_answer"))
+        if not think(args.think_time, stop):
+            break
+
+
+def percentiles(times):
+    if not times:
+        return {"count": 0}
+    times = np.array(times)
+    return {
+        "count": int(times.size),
+        "p50": float(np.percentile(times, 50)),
+        "p95": float(np.percentile(times, 95)),
+        "p99": float(np.percentile(times, 99)),
+        "mean": float(times.mean()),
+        "max": float(times.max()),
+    }
+
+
+def run_level(users, url, fixtures, args):
+    """
+    Runs `users` simulated users for the level's duration and returns its report.
+    Only flows that started after the ramp-up and before the end are counted;
+    the ones still in flight are given `--drain` seconds to finish.
+    """
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=simulated_user, args=(url, fixtures, args, recorder, stop), name=f"user-{i}", daemon=True)
+        for i in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        # Stagger arrivals over the ramp-up so users don't move in lockstep
+        time.sleep(args.ramp_up / users)
+    measured_from = started + args.ramp_up
+    measured_to = measured_from + args.duration
+    stop.wait(max(0.0, measured_to - time.perf_counter()))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=args.drain)
+    elapsed = args.duration
+
+    # Sessions all start during the ramp-up, so they're always counted
+    samples = [s for s in recorder.samples if s[0] == "start_session" or measured_from <= s[1] < measured_to]
+    flows = {}
+    for flow in FLOWS:
+        times = [seconds for name, _, seconds, ok in samples if name == flow and ok]
+        errors = sum(1 for name, _, _, ok in samples if name == flow and not ok)
+        flows[flow] = {**percentiles(times), "errors": errors}
+    completed = sum(1 for name, _, _, ok in samples if name == "submit_answer" and ok)
+    total = len(samples)
+    errors = sum(1 for s in samples if not s[3])
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        # Answers evaluated per minute is what a deployment is sized by
+        "answers_per_minute": completed / elapsed * 60,
+        "requests_per_second": (total - errors) / elapsed,
+        "flows": flows,
+        "stuck_users": sum(thread.is_alive() for thread in threads),
+    }
+
+
+def saturation_point(levels):
+    """
+    Returns (users, reason) for the highest level worth running: the one before
+    throughput stopped growing by SATURATION_MIN_GAIN or errors passed
+    SATURATION_MAX_ERRORS. (None, reason) if even the first level fails.
+    """
+    previous = None
+    for level in levels:
+        if level["error_rate"] > SATURATION_MAX_ERRORS:
+            return (previous["users"] if previous else None), f"error rate {level['error_rate']:.1%} at {level['users']} users"
+        if previous and level["answers_per_minute"] < previous["answers_per_minute"] * (1 + SATURATION_MIN_GAIN):
+            return previous["users"], f"throughput gained less than {SATURATION_MIN_GAIN:.0%} at {level['users']} users"
+        previous = level
+    return (previous["users"] if previous else None), "not reached — try more users"
+
+
+def print_level(level):
+    print(f"👥 {level['users']} users: {level['answers_per_minute']:.1f} answers/min, "
+          f"{level['requests_per_second']:.2f} req/s, errors {level['error_rate']:.1%}")
+    for flow, stats in level["flows"].items():
+        if stats["count"]:
+            print(f"   {flow:<18} p50 {stats['p50']:7.2f}s   p95 {stats['p95']:7.2f}s   p99 {stats['p99']:7.2f}s   "
+                  f"n={stats['count']} errors={stats['errors']}")
+        elif stats["errors"]:
+            print(f"   {flow:<18} all {stats['errors']} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the running speech tutor with simulated users")
+    parser.add_argument("--url", default="http://127.0.0.1:7860", help="URL of the running app")
+    parser.add_argument("--users", default="1,2,4,8", help="Comma-separated numbers of concurrent users, one level each")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds per level")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds to bring a level's users in (not measured)")
+    parser.add_argument("--drain", type=float, default=30.0, help="Seconds to wait for in-flight requests after a level")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean seconds a user pauses between steps")
+    parser.add_argument("--speaking-time", type=float, default=1.0,
+                        help="Fraction of each recording's length spent 'speaking' before submitting")
+    parser.add_argument("--audio", help="Directory of WAV recordings to submit instead of synthetic audio")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "load_test.json"))
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.audio:
+        fixtures = [(path.resolve(), wav_duration(path)) for path in sorted(Path(args.audio).glob("*.wav"))]
+        if not fixtures:
+            sys.exit(f"❌ No .wav files in {args.audio}")
+    else:
+        fixtures = make_fixtures(RESULTS_DIR / "fixtures", durations=(5, 15, 30))
+    print(f"🎙️ {len(fixtures)} recordings, {min(s for _, s in fixtures):.0f}–{max(s for _, s in fixtures):.0f}s long")
+
+    levels = []
+    for users in (int(n) for n in args.users.split(",")):
+        print(f"🚦 Level: {users} users for {args.duration:.0f}s (+{args.ramp_up:.0f}s ramp-up)")
+        levels.append(run_level(users, args.url, fixtures, args))
+        print_level(levels[-1])
+
+    users, reason = saturation_point(levels)
+    if users is None:
+        print(f"🛑 No level was sustainable: {reason}")
+    else:
+        print(f"📌 Saturation point: {users} users ({reason})")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "url": args.url,
+            "model": args.model,
+            "duration": args.duration,
+            "think_time": args.think_time,
+            "speaking_time": args.speaking_time,
+            "recordings": [{"path": str(path), "seconds": seconds} for path, seconds in fixtures],
+        },
+        "levels": levels,
+        "saturation": {"users": users, "reason": reason},
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved to {args.output}")
@@ -0,0 +1,224 @@
+# run_benchmarks.py — End-to-end benchmarks against a mock Ollama server and synthetic audio
+#
+# Measures transcription, single LLM calls, the full submission flow, question
+# generation, history save/load at several history sizes and rating. Results are
+# written to benchmarks/results/latest.json and compared with a saved baseline.
+#
+#   python benchmarks/run_benchmarks.py --save-baseline        # record the baseline
+#   python benchmarks/run_benchmarks.py                        # compare; exits 1 on regressions
+#   python benchmarks/run_benchmarks.py --quick --only history --latency 0.2 --token-rate 40
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from mock_ollama import start_mock_server
+from constants import MODEL_CHOICES, DEFAULT_MODEL
+from synthetic_audio import make_fixtures
+
+RESULTS_DIR = BENCHMARK_DIR / "results"
+HISTORY_SIZES = [10, 100, 1000]
+
+
+def measure(fn, repeat, warmup=1, inner=1):
+    """
+    Runs `fn` `warmup` times untimed, then `repeat` timed rounds of `inner`
+    calls. Returns per-call seconds statistics.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        times.append((time.perf_counter() - started) / inner)
+    times = np.array(times)
+    return {
+        "median": float(np.median(times)),
+        "p95": float(np.percentile(times, 95)),
+        "mean": float(times.mean()),
+        "min": float(times.min()),
+        "runs": int(repeat * inner),
+    }
+
+
+def sample_session(i):
+    return {
+        "timestamp": "2025-01-01 12:00:00",
+        "topic": "Travel",
+        "difficulty": "Medium",
+        "question": f"Describe a memorable trip number {i}.",
+        "transcript": "I went to the mountains with my family and we hiked every day. " * 4,
+        "grammar_feedback": "Your grammar was mostly correct.\nScore: 4/5",
+        "pronunciation_feedback": "Clear speech overall.\nScore: 4/5",
+        "comparison_feedback": "You covered the main points.\nScore: 3/5",
+        "rating": 3.8,
+    }
+
+
+def run_benchmarks(args, workdir):
+    """
+    Returns {benchmark name: stats}. Imports the app here, after the mock
+    Ollama server is running and the working directory is set, because the
+    modules read OLLAMA_HOST and create their data directories on import.
+    """
+    from whisper_engine import transcribe
+    from llm_engine import call_ollama
+    from rating import calculate_rating, rate_batch
+    import app
+
+    quick = args.quick
+    repeat = lambda full: max(2, full // 4) if quick else full
+    selected = lambda name: not args.only or any(part in name for part in args.only.split(","))
+    results = {}
+
+    def bench(name, fn, full_repeat, **kwargs):
+        if not selected(name):
+            return
+        results[name] = measure(fn, repeat(full_repeat), **kwargs)
+        stats = results[name]
+        print(f"⏱️ {name:<45} median {stats['median'] * 1000:9.2f} ms   p95 {stats['p95'] * 1000:9.2f} ms")
+
+    fixtures = make_fixtures(Path(args.fixtures) if args.fixtures else workdir / "fixtures")
+
+    # --- ASR ---
+    for path, seconds in fixtures:
+        name = f"transcribe/{round(seconds)}s"
+        bench(name, lambda: transcribe(str(path)), 5, warmup=1)
+        if name in results:
+            results[name]["real_time_factor"] = results[name]["median"] / seconds
+
+    # --- LLM ---
+    counter = iter(range(10**9))
+    bench("call_ollama/grammar", lambda: call_ollama(f"Check this answer {next(counter)}", model=DEFAULT_MODEL, task="grammar"), 20)
+    bench("call_ollama/question", lambda: call_ollama(f"Write a question {next(counter)}", model=DEFAULT_MODEL, task="question"), 20)
+
+    # --- End to end ---
+    answer_path = str(fixtures[min(1, len(fixtures) - 1)][0])
+    bench(
+        "tutor_conversation",
+        lambda: app.tutor_conversation(answer_path, "What helps a new team member?", "Communication and asking questions.", "Medium", DEFAULT_MODEL),
+        5,
+    )
+    # A new topic every call: the bank has nothing to serve, so the LLM runs
+    bench("generate_question_and_answer/cold",
+          lambda: app.generate_question_and_answer(f"Topic {next(counter)}", "Medium", DEFAULT_MODEL, user_id=None), 10)
+    # A new user every call: served from the bank
+    app.generate_question_and_answer("Travel", "Medium", DEFAULT_MODEL, user_id="bench_seed")
+    bench("generate_question_and_answer/bank",
+          lambda: app.generate_question_and_answer("Travel", "Medium", DEFAULT_MODEL, user_id=f"bench_{next(counter)}"), 20)
+
+    # --- History ---
+    history_dir = Path("user_history")
+    history_dir.mkdir(exist_ok=True)
+    for size in HISTORY_SIZES:
+        user_id = f"bench_history_{size}"
+        with open(history_dir / f"{user_id}.json", "w") as f:
+            json.dump({"sessions": [sample_session(i) for i in range(size)]}, f)
+        session = sample_session(size)
+        bench(f"load_history/{size}", lambda: app.load_history(user_id), 20)
+        bench(f"save_history/{size}", lambda: app.save_history(
+            user_id, session["topic"], session["difficulty"], session["question"], session["transcript"],
+            session["grammar_feedback"], session["pronunciation_feedback"], session["comparison_feedback"], session["rating"]
+        ), 10)
+
+    # --- Rating ---
+    session = sample_session(0)
+    bench("calculate_rating", lambda: calculate_rating(
+        session["transcript"], session["grammar_feedback"], session["pronunciation_feedback"], session["comparison_feedback"]
+    ), 20, inner=50)
+    sessions = [sample_session(i) for i in range(1000)]
+    bench("rate_batch/1000", lambda: rate_batch(sessions), 10)
+
+    return results
+
+
+def compare(results, baseline, threshold, noise_floor):
+    """
+    Returns [(name, baseline median, new median, change)] for benchmarks whose
+    median got slower than `threshold` (a fraction) and `noise_floor` seconds.
+    """
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        change = stats["median"] / old["median"] - 1 if old["median"] else 0.0
+        if change > threshold and stats["median"] - old["median"] > noise_floor:
+            regressions.append((name, old["median"], stats["median"], change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the speech tutor end to end")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions")
+    parser.add_argument("--only", help="Comma-separated substrings of benchmark names to run")
+    parser.add_argument("--fixtures", help="Directory of WAV files to use instead of synthetic audio")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock Ollama delay before the first token (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Mock Ollama tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="Mock Ollama response length in tokens")
+    parser.add_argument("--baseline", default=str(RESULTS_DIR / "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Save these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown (fraction of the baseline) that counts as a regression")
+    parser.add_argument("--noise-floor", type=float, default=0.002, help="Ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    server = start_mock_server(0, MODEL_CHOICES, args.latency, args.token_rate, args.tokens)
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.pop("OLLAMA_BACKENDS", None)
+
+    workdir = Path(tempfile.mkdtemp(prefix="speech-tutor-bench-"))
+    if args.fixtures:
+        args.fixtures = str(Path(args.fixtures).resolve())
+    args.baseline = str(Path(args.baseline).resolve())
+    os.chdir(workdir)
+    print(f"🧪 Benchmarking in {workdir} against mock Ollama ({args.latency}s latency, {args.token_rate} tok/s, {args.tokens} tokens)")
+
+    results = run_benchmarks(args, workdir)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mock_ollama": {"latency": args.latency, "token_rate": args.token_rate, "tokens": args.tokens},
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    with open(RESULTS_DIR / "latest.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not Path(args.baseline).exists():
+        print("ℹ️ No baseline yet — run with --save-baseline to record one")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("mock_ollama") != report["meta"]["mock_ollama"]:
+        print("⚠️ Baseline was recorded with different mock Ollama settings; LLM numbers aren't comparable")
+
+    regressions = compare(results, baseline, args.threshold, args.noise_floor)
+    for name, old, new, change in regressions:
+        print(f"🐢 REGRESSION {name}: {old * 1000:.2f} ms → {new * 1000:.2f} ms (+{change:.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
@@ -0,0 +1,84 @@
+# synthetic_audio.py — Fixture recordings for the benchmarks
+#
+# Uses espeak-ng / espeak for real synthetic speech when installed. Otherwise
+# writes "speech-like" audio (voiced harmonics modulated at a syllable rate),
+# which still exercises decoding and the ASR model at the same length.
+
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+SAMPLE_ANSWER = (
+    "I think the most important skill for a new team member is communication. "
+    "When I started my last job, I asked a lot of questions in the first weeks, "
+    "and I wrote down what I learned so that I could share it with the next person. "
+    "For example, I made a short guide about our deployment process. "
+    "It saved time for everyone, and it helped me understand the system much better. "
+)
+# Rough espeak speaking rate, used to size the text for a target duration
+WORDS_PER_SECOND = 2.7
+
+
+def wav_duration(path):
+    with wave.open(str(path), "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+
+def speech_like_wav(path, seconds, seed=0):
+    """
+    Writes `seconds` of 16 kHz mono audio with a speech-like envelope.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 20 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    # ~4 syllables per second, with short pauses between phrases
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    phrases = (np.sin(2 * np.pi * 0.25 * t + rng.uniform(0, np.pi)) > -0.7).astype(float)
+    signal = voiced * syllables * phrases + 0.01 * rng.standard_normal(t.size)
+    signal = (signal / np.abs(signal).max() * 0.6 * 32767).astype(np.int16)
+
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(signal.tobytes())
+    return path
+
+
+def espeak_wav(path, seconds):
+    """
+    Writes roughly `seconds` of synthetic speech with espeak. Returns None when
+    espeak isn't installed.
+    """
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    if espeak is None:
+        return None
+    words = SAMPLE_ANSWER.split()
+    needed = int(seconds * WORDS_PER_SECOND)
+    text = " ".join(words[i % len(words)] for i in range(max(needed, 1)))
+    subprocess.run([espeak, "-w", str(path), text], check=True, capture_output=True)
+    return path
+
+
+def make_fixtures(directory, durations=(5, 30, 60)):
+    """
+    Creates one recording per target duration in `directory` (reusing existing
+    ones) and returns [(path, seconds)].
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fixtures = []
+    for seconds in durations:
+        path = directory / f"answer_{seconds}s.wav"
+        if not path.exists():
+            if espeak_wav(path, seconds) is None:
+                speech_like_wav(path, seconds, seed=seconds)
+        fixtures.append((path, wav_duration(path)))
+    return fixtures
@@ -30,3 +30,278 @@ MODEL_CHOICES = [
 
 # Difficulty levels
 DIFFICULTY_LEVELS = ["Easy", "Medium", "Hard"]
+
+# Default model selected in the UI and used when none is given
+DEFAULT_MODEL = "mistral:latest"
+
+# --- Model lifecycle (Ollama keep_alive) ---
+# Models loaded into Ollama at startup so the first request doesn't pay the load time
+PRELOAD_MODELS = ["mistral:latest", "llama3.2:latest"]
+
+# How long Ollama keeps each model resident after its last request
+# (Ollama duration strings, or seconds; -1 never unloads, 0 unloads immediately)
+DEFAULT_KEEP_ALIVE = "10m"
+MODEL_KEEP_ALIVE = {
+    "mistral-small3.1": "20m",
+    "gemma3:27b": "30m",
+    "qwq:latest": "30m",
+    "qwen3:32b": "30m",
+    "phi4-mini:latest": "30m",
+    "qwen3:4b": "30m",
+}
+
+# Keep the default model loaded for the lifetime of the Ollama server
+PIN_DEFAULT_MODEL = True
+
+# --- Adaptive model routing ---
+# Route each LLM task to a model tier instead of always using the selected model
+ADAPTIVE_ROUTING = True
+
+# Model tiers, fastest first within each tier
+MODEL_TIERS = {
+    "small": ["phi4-mini:latest", "qwen3:4b", "llama3.2:latest"],
+    "medium": ["mistral:latest", "llama2:latest", "mistral-small3.1"],
+    "large": ["gemma3:27b", "qwen3:32b", "qwq:latest"],
+}
+
+# Task -> (largest tier the task needs, latency budget in seconds)
+TASK_ROUTES = {
+    "question": ("large", 30),
+    "question_retry": ("small", 8),
+    "grammar": ("large", 45),
+    "pronunciation": ("medium", 30),
+    "pronunciation_brief": ("small", 10),
+    "comparison": ("large", 45),
+    "interview": ("large", 90),
+    "interview_single": ("large", 30),
+}
+
+# Flagged-word count at or below which pronunciation feedback counts as a short task
+BRIEF_PRONUNCIATION_WORDS = 2
+
+# --- Generation profiles ---
+# Ollama options sent with every request, per task. num_predict caps the output
+# length (and with it the latency). num_ctx is the same for every task on purpose:
+# Ollama reloads a model whenever the requested context size changes.
+GENERATION_PROFILES = {
+    "default": {"num_predict": 512, "num_ctx": 4096, "temperature": 0.7},
+    "question": {"num_predict": 400, "num_ctx": 4096, "temperature": 0.9},
+    "question_retry": {"num_predict": 60, "num_ctx": 4096, "temperature": 0.9, "stop": ["\n\n"]},
+    "grammar": {"num_predict": 400, "num_ctx": 4096, "temperature": 0.3},
+    "pronunciation": {"num_predict": 350, "num_ctx": 4096, "temperature": 0.4},
+    "pronunciation_brief": {"num_predict": 200, "num_ctx": 4096, "temperature": 0.4},
+    "comparison": {"num_predict": 350, "num_ctx": 4096, "temperature": 0.3},
+    "interview": {"num_predict": 1200, "num_ctx": 4096, "temperature": 0.8},
+    "interview_single": {"num_predict": 300, "num_ctx": 4096, "temperature": 0.8},
+}
+
+# --- Prompt templates ---
+# Placeholders each template in prompts/ must use (validated when loaded)
+PROMPT_PLACEHOLDERS = {
+    "correction_prompt": {"question", "transcript"},
+    "feedback_prompt": {"question", "transcript", "flagged_words"},
+    "comparison_prompt": {"user_answer", "ideal_answer"},
+    "question_generation": {"topic", "difficulty", "random_seed"},
+    "question_retry": {"topic", "difficulty"},
+    "interview_questions": {"topic", "personality_traits", "technical_skills"},
+    "interview_question_single": {"topic", "personality_traits", "technical_skills", "focus"},
+    "evaluation_system": set(),
+    "evaluation_prefix": {"question", "transcript", "ideal_answer"},
+    "grammar_task": set(),
+    "pronunciation_task": {"flagged_words"},
+    "comparison_task": set(),
+}
+
+# Seconds between checks of the prompt files for changes
+PROMPT_RELOAD_INTERVAL = 2.0
+
+# --- LLM scheduling ---
+# Concurrent requests sent to Ollama per model; keep at or below OLLAMA_NUM_PARALLEL
+DEFAULT_MODEL_CONCURRENCY = 2
+MODEL_CONCURRENCY = {
+    "gemma3:27b": 1,
+    "qwen3:32b": 1,
+    "qwq:latest": 1,
+    "mistral-small3.1": 1,
+}
+
+# Threads available for in-flight Ollama HTTP calls across all models
+LLM_WORKER_THREADS = 16
+
+# --- Ollama backend pool ---
+# Seconds between health checks of each backend
+BACKEND_HEALTH_CHECK_INTERVAL = 10.0
+# Consecutive failures before a backend stops receiving requests
+BACKEND_EJECT_AFTER_FAILURES = 3
+
+# --- Latency budgets ---
+# Seconds a submission may take before the UI shows partial results
+SUBMISSION_BUDGET_SECONDS = 45
+# Extra seconds to keep waiting for pending feedback sections after the budget
+PENDING_GRACE_SECONDS = 180
+# Upper bound for any single Ollama request
+LLM_REQUEST_TIMEOUT = 600
+# Threads running evaluation sections in the background
+EVALUATION_WORKERS = 16
+# Gradio worker threads handling UI events
+UI_CONCURRENCY_COUNT = 16
+# Requests waiting in Gradio's queue before new ones are turned away ("Queue is full")
+UI_QUEUE_MAX_SIZE = 64
+# Transcriptions run at once; the rest wait their turn (CPU-bound, so keep near the core count / 4)
+ASR_WORKERS = 2
+
+# --- Audio ingest (audio_ingest.py) ---
+# Recordings larger than this are rejected before decoding
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+# Audio past this point is not transcribed
+MAX_AUDIO_SECONDS = 15 * 60
+# Seconds of decoded audio handed to Whisper at a time; bounds the memory a transcription needs
+ASR_CHUNK_SECONDS = 60
+# Chunks end at the quietest moment within this many seconds of the boundary, so words aren't cut in half
+ASR_CHUNK_SEARCH_SECONDS = 1.0
+
+# --- Audio archive (audio_archive.py) ---
+# Submitted recordings are kept here, once per distinct recording, for later re-evaluation
+AUDIO_ARCHIVE_DIR = "audio_archive"
+# Keep submitted recordings at all (overridden by the AUDIO_ARCHIVE env var, "0" to disable)
+AUDIO_ARCHIVE_ENABLED = True
+# "opus" (compact, lossy; about 180 KB per minute at 24 kbps) or "flac" (lossless, about 5x larger).
+# Falls back to FLAC when this build of FFmpeg has no Opus encoder.
+AUDIO_ARCHIVE_CODEC = "opus"
+AUDIO_ARCHIVE_OPUS_BITRATE = 24000
+# Recordings not submitted again for this many days are deleted
+AUDIO_ARCHIVE_RETENTION_DAYS = 180
+# Total archive size; the least recently submitted recordings are deleted beyond it
+AUDIO_ARCHIVE_MAX_BYTES = 10 * 1024 ** 3
+# Seconds between retention and quota checks
+AUDIO_ARCHIVE_CHECK_SECONDS = 600
+
+# --- Shared ASR server (asr_server.py) ---
+# Whisper model used for transcription, in-process or by the ASR server
+ASR_MODEL = "base.en"
+# Address of a shared ASR server, "unix:/path/to.sock" or "host:port" (None: every
+# process loads its own model; overridden by the ASR_SERVER env var)
+ASR_SERVER = None
+# Seconds to wait for the ASR server to accept a connection
+ASR_SERVER_CONNECT_TIMEOUT = 2
+# Upper bound for a transcription on the ASR server
+ASR_SERVER_TIMEOUT = 600
+# After the ASR server was unreachable, seconds of in-process transcription before trying it again
+ASR_SERVER_RETRY_SECONDS = 30
+# Transcriptions the server runs at once, across all clients
+ASR_SERVER_WORKERS = 4
+# Largest recording the server accepts
+ASR_SERVER_MAX_BYTES = MAX_UPLOAD_BYTES
+
+# --- Fluency analytics ---
+# Word probability below which a word is flagged for pronunciation
+CLARITY_THRESHOLD = 0.85
+# Gap between words (seconds) that counts as a pause
+PAUSE_THRESHOLD = 0.3
+# Words that are always fillers
+FILLER_WORDS = ["um", "uh", "er", "ah", "hmm"]
+# Words and two-word phrases that are only fillers when used as an interjection,
+# i.e. next to a pause ("I, like... went" but not "I like travel")
+PAUSE_FILLER_WORDS = ["like", "basically", "actually", "literally"]
+FILLER_PHRASES = [("you", "know"), ("i", "mean"), ("sort", "of"), ("kind", "of")]
+
+# Ideal answer shown for questions the user typed themselves
+CUSTOM_QUESTION_IDEAL_ANSWER = "This is a custom question. No ideal answer reference is available."
+
+# --- Local relevance scoring ---
+# Answers with fewer words are not sent to the LLM for content evaluation
+RELEVANCE_MIN_WORDS = 5
+# Ideal answers with fewer content words are too thin to compare against
+RELEVANCE_MIN_IDEAL_WORDS = 12
+# Similarity below which an answer that shares no words with the question is off-topic
+RELEVANCE_OFF_TOPIC = 0.05
+# Similarity below which the LLM comparison is kept short
+RELEVANCE_WEAK = 0.15
+# Similarity at or above which the answer is reported as matching the ideal answer
+RELEVANCE_NEAR_IDENTICAL = 0.9
+# Output cap for the shortened comparison
+RELEVANCE_SHORT_COMPARISON_TOKENS = 150
+
+# --- Question bank ---
+QUESTION_BANK_FILE = "question_bank/bank.json"
+# Cosine similarity at or above which a new question counts as a near-duplicate
+QUESTION_DUPLICATE_THRESHOLD = 0.8
+# Refill a (topic, difficulty) slot in the background when a user has fewer unseen questions left
+QUESTION_BANK_LOW_WATERMARK = 3
+# Questions generated per background refill
+QUESTION_BANK_REFILL_BATCH = 3
+# Seconds changes to the bank are collected before it is written to disk
+QUESTION_BANK_SAVE_DELAY = 5.0
+# Most recent questions remembered as served per user, and users remembered
+QUESTION_BANK_SERVED_PER_USER = 200
+QUESTION_BANK_SERVED_USERS = 5000
+
+# --- Interview prep ---
+# One focus per question when the questions are generated as parallel calls
+INTERVIEW_FOCUS_AREAS = [
+    "core technical knowledge",
+    "a practical problem-solving scenario",
+    "teamwork and communication",
+    "handling a difficult situation or failure",
+    "motivation and career goals",
+]
+# The questions are generated in parallel instead of in one streamed call when at
+# least this share of the model's concurrency limit is free (and at least 2 slots)
+INTERVIEW_PARALLEL_MIN_FREE_SHARE = 0.5
+# Generated question sets kept in memory
+INTERVIEW_CACHE_SIZE = 256
+
+# --- Headless job API ---
+# Port for the job API started next to the UI (None to disable; overridden by the JOB_API_PORT env var)
+JOB_API_PORT = None
+# Interface the job API listens on; it has no authentication, so only locally by default
+# (overridden by the JOB_API_HOST env var, e.g. 0.0.0.0 behind an authenticating proxy)
+JOB_API_HOST = "127.0.0.1"
+# User ids accepted by the job API, the shape states.new_user_id produces; they name history files
+USER_ID_PATTERN = r"^user_[0-9a-f]+$"
+# Jobs run at once; they use their own threads, not Gradio's
+JOB_WORKERS = 4
+# Queued jobs accepted before new submissions are rejected
+JOB_QUEUE_LIMIT = 200
+# Finished jobs kept for polling before the oldest are forgotten
+JOB_RETENTION = 1000
+# Where uploaded audio waits until its job has run
+JOB_UPLOAD_DIR = "job_uploads"
+# Longest a poll or event stream waits for news before answering
+JOB_MAX_WAIT_SECONDS = 30
+
+# --- Batch evaluation (batch_evaluate.py) ---
+# Recordings transcribed at once; transcription is CPU-bound
+BATCH_ASR_WORKERS = 2
+# Recordings being evaluated by the LLM at once; these mostly wait on Ollama
+BATCH_LLM_WORKERS = 4
+# Files picked up when evaluating a directory
+AUDIO_EXTENSIONS = [".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm"]
+
+# --- History analytics (history_analytics.py) ---
+# Columnar export of every user's sessions
+ANALYTICS_DIR = "analytics"
+# Export parts kept before they are merged into one
+ANALYTICS_MAX_PARTS = 32
+
+# --- Metrics ---
+# Port serving Prometheus metrics at /metrics (None to disable; overridden by the METRICS_PORT env var).
+# The job API also serves /metrics.
+METRICS_PORT = None
+# Histogram buckets
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300]
+FAST_LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+RTF_BUCKETS = [0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4]
+TOKEN_RATE_BUCKETS = [1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200]
+
+# --- Request profiling (profiling.py) ---
+# Environment variable turning profiling on: "1" profiles every request, a
+# fraction such as "0.05" profiles that share of them. Add ?profile=1 to the UI
+# URL to profile just your own requests.
+PROFILE_ENV_VAR = "SPEECH_TUTOR_PROFILE"
+PROFILE_DIR = "profiles"
+# Seconds between stack samples for the collapsed-stack (flamegraph) output
+PROFILE_SAMPLE_INTERVAL = 0.005
+# Oldest profiles are deleted beyond either limit
+PROFILE_MAX_FILES = 200
+PROFILE_MAX_BYTES = 200 * 1024 * 1024
@@ -0,0 +1,26 @@
+# deadline.py — End-to-end time budget passed down through the tutor pipeline
+
+import time
+
+
+class Deadline:
+    """
+    A point in time by which work should finish. Pass it down to each stage and
+    let the stage bound its own waits with `timeout()`.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """
+        Returns the time left, but no more than `cap` seconds.
+        """
+        return min(cap, self.remaining())
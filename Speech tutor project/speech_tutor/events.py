@@ -1,18 +1,23 @@
 # events.py — Event and flow handlers for VaakShakti AI
 
-def handle_question_generation(choice_mode, current_question, topic, difficulty, model, handle_custom_question=None, fallback_generate=None):
+from theme import format_star_rating
+from fluency import format_fluency_report
+from constants import CUSTOM_QUESTION_IDEAL_ANSWER
+
+def handle_question_generation(choice_mode, current_question, topic, difficulty, model, handle_custom_question=None, fallback_generate=None, user_id=None):
     """
     Handles the logic of generating a question and ideal answer.
     If `handle_custom_question` is provided, it is used for custom question generation.
+    `user_id` lets the question bank serve questions this user hasn't seen.
     """
     if handle_custom_question:
-        return handle_custom_question(choice_mode, current_question, topic, difficulty, model)
+        return handle_custom_question(choice_mode, current_question, topic, difficulty, model, user_id=user_id)
     
     if choice_mode == "Enter custom topic" and current_question.strip():
-        return current_question, "This is a custom question. No ideal answer reference is available."
+        return current_question, CUSTOM_QUESTION_IDEAL_ANSWER
     
     if fallback_generate:
-        return fallback_generate(topic, difficulty, model)
+        return fallback_generate(topic, difficulty, model, user_id=user_id)
 
     return "Sample Question?", "Sample Ideal Answer."
 
@@ -26,21 +31,62 @@ def enhanced_tutor_conversation(audio, question, ideal_answer, difficulty, model
 
     transcript, grammar, feedback, comparison = tutor_conversation_func(audio, question, ideal_answer, difficulty, model)
     rating = calculate_rating_func(transcript, grammar, feedback, comparison)
-    save_history_func(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating)
+    # Rejected uploads and failed transcriptions are neither logged nor archived
+    if transcript and not transcript.startswith("❌"):
+        save_history_func(user_id, topic, difficulty, question, transcript, grammar, feedback, comparison, rating, audio=audio, model=model)
     
     return transcript, grammar, feedback, comparison, ideal_answer, rating, ""
 
 
+def staged_tutor_conversation(audio, question, ideal_answer, difficulty, model, user_id, topic, tutor_conversation_stream_func, save_history_func, calculate_rating_func):
+    """
+    Streaming form of `enhanced_tutor_conversation`: shows the transcript,
+    fluency analytics and a provisional rating as soon as transcription is done,
+    fills in the feedback sections as they arrive, and logs the session once complete.
+    """
+    if not audio:
+        yield "❌ No audio received", "", "", "", ideal_answer, 0.0, "", ""
+        return
+
+    for state in tutor_conversation_stream_func(audio, question, ideal_answer, difficulty, model):
+        if state.get("queue_position"):
+            yield f"⏳ Waiting to be transcribed — you are #{state['queue_position']} in line", "", "", "", ideal_answer, 0.0, "", ""
+            continue
+
+        sections = {name: (None if name in state["pending"] else state[name]) for name in ("grammar", "feedback", "comparison")}
+        rating = calculate_rating_func(
+            state["transcript"], sections["grammar"], sections["feedback"], sections["comparison"],
+            fluency=state["fluency"], flagged_words=state["flagged_words"], ideal_answer=ideal_answer
+        )
+        if state["final"] and state["transcript"] and not state["transcript"].startswith("❌"):
+            save_history_func(
+                user_id, topic, difficulty, question, state["transcript"], state["grammar"], state["feedback"], state["comparison"], rating,
+                fluency=state["fluency"], ideal_answer=ideal_answer, audio=audio, model=model
+            )
+
+        yield (
+            state["transcript"], state["grammar"], state["feedback"], state["comparison"],
+            ideal_answer, rating, format_star_rating(rating), format_fluency_report(state["fluency"])
+        )
+
+
 def format_interview_questions(topic, personality, skills, model, generator_func):
     """
     Generates interview questions based on user traits and skills.
+    `generator_func` may return the questions or yield them as they are
+    generated; each partial result is shown as it arrives.
     """
     if not topic or not personality or not skills:
-        return "Please fill in all fields to generate interview questions."
+        yield "Please fill in all fields to generate interview questions."
+        return
 
     questions = generator_func(topic, personality, skills, model)
-    formatted = f"## Interview Questions for: {topic}\n\n{questions}"
-    return formatted
+    if isinstance(questions, str):
+        questions = [questions]
+
+    yield f"## Interview Questions for: {topic}\n\n⏳ Generating questions..."
+    for partial in questions:
+        yield f"## Interview Questions for: {topic}\n\n{partial}"
 
 
 def format_history(user_id, load_history_func):
@@ -0,0 +1,104 @@
+# fluency.py — Fluency metrics from Whisper word timestamps, computed locally with NumPy
+
+import numpy as np
+
+from constants import PAUSE_THRESHOLD, FILLER_WORDS, PAUSE_FILLER_WORDS, FILLER_PHRASES, CLARITY_THRESHOLD
+
+# Bucket edges (seconds) for the pause histogram
+PAUSE_BINS = np.array([PAUSE_THRESHOLD, 0.6, 1.0, 2.0, np.inf])
+# Bucket edges for the word confidence histogram
+CONFIDENCE_BINS = np.array([0.0, 0.5, 0.7, CLARITY_THRESHOLD, 0.95, 1.0 + 1e-9])
+
+
+def _normalize(words):
+    tokens = np.char.lower(np.char.strip(np.asarray(words, dtype=str)))
+    return np.char.strip(tokens, ".,!?;:\"'")
+
+
+def analyze_fluency(words, starts, ends, probabilities):
+    """
+    Computes fluency metrics for one answer from per-word arrays (as returned by
+    whisper_engine.transcribe_detailed). Returns a dict of plain floats/ints/lists:
+
+    - speaking_rate_wpm: words per minute over the whole answer, pauses included
+    - articulation_rate_wpm: words per minute of speaking time, pauses excluded
+    - pause_count, mean_pause, longest_pause, pause_histogram (see PAUSE_BINS)
+    - filler_count, filler_rate (fillers per 100 words)
+    - mean_confidence, low_confidence_ratio, confidence_histogram (see CONFIDENCE_BINS)
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    probabilities = np.asarray(probabilities, dtype=float)
+    word_count = int(starts.size)
+
+    if word_count == 0:
+        return {
+            "word_count": 0,
+            "speaking_time": 0.0,
+            "speaking_rate_wpm": 0.0,
+            "articulation_rate_wpm": 0.0,
+            "pause_count": 0,
+            "mean_pause": 0.0,
+            "longest_pause": 0.0,
+            "pause_histogram": [0] * (PAUSE_BINS.size - 1),
+            "filler_count": 0,
+            "filler_rate": 0.0,
+            "mean_confidence": 0.0,
+            "low_confidence_ratio": 0.0,
+            "confidence_histogram": [0] * (CONFIDENCE_BINS.size - 1),
+        }
+
+    total_time = max(float(ends[-1] - starts[0]), 1e-6)
+
+    gaps = np.clip(starts[1:] - ends[:-1], 0.0, None)
+    pauses = gaps[gaps >= PAUSE_THRESHOLD]
+    articulation_time = max(total_time - float(pauses.sum()), 1e-6)
+
+    tokens = _normalize(words)
+    # Whether each word has a pause right before / right after it
+    paused = gaps >= PAUSE_THRESHOLD
+    pause_before = np.concatenate([[False], paused])
+    pause_after = np.concatenate([paused, [False]])
+
+    filler_count = int(np.isin(tokens, FILLER_WORDS).sum())
+    filler_count += int((np.isin(tokens, PAUSE_FILLER_WORDS) & (pause_before | pause_after)).sum())
+    if word_count > 1:
+        for first, second in FILLER_PHRASES:
+            phrase = (tokens[:-1] == first) & (tokens[1:] == second)
+            filler_count += int((phrase & (pause_before[:-1] | pause_after[1:])).sum())
+
+    return {
+        "word_count": word_count,
+        "speaking_time": round(total_time, 2),
+        "speaking_rate_wpm": round(word_count / total_time * 60, 1),
+        "articulation_rate_wpm": round(word_count / articulation_time * 60, 1),
+        "pause_count": int(pauses.size),
+        "mean_pause": round(float(pauses.mean()), 2) if pauses.size else 0.0,
+        "longest_pause": round(float(gaps.max()), 2) if gaps.size else 0.0,
+        "pause_histogram": np.histogram(pauses, bins=PAUSE_BINS)[0].tolist(),
+        "filler_count": filler_count,
+        "filler_rate": round(filler_count / word_count * 100, 1),
+        "mean_confidence": round(float(probabilities.mean()), 3),
+        "low_confidence_ratio": round(float((probabilities < CLARITY_THRESHOLD).mean()), 3),
+        "confidence_histogram": np.histogram(np.clip(probabilities, 0.0, 1.0), bins=CONFIDENCE_BINS)[0].tolist(),
+    }
+
+
+def format_fluency_report(metrics):
+    """
+    Renders fluency metrics as Markdown for the UI.
+    """
+    if not metrics or not metrics["word_count"]:
+        return "No speech to analyze."
+
+    pause_labels = ["0.3–0.6s", "0.6–1s", "1–2s", "2s+"]
+    confidence_labels = ["<50%", "50–70%", f"70–{round(CLARITY_THRESHOLD * 100)}%", f"{round(CLARITY_THRESHOLD * 100)}–95%", "95%+"]
+
+    output = f"**Speaking rate:** {metrics['speaking_rate_wpm']} words/min "
+    output += f"(articulation {metrics['articulation_rate_wpm']} words/min)\n\n"
+    output += f"**Pauses:** {metrics['pause_count']} (avg {metrics['mean_pause']}s, longest {metrics['longest_pause']}s) — "
+    output += ", ".join(f"{label}: {count}" for label, count in zip(pause_labels, metrics["pause_histogram"])) + "\n\n"
+    output += f"**Filler words:** {metrics['filler_count']} ({metrics['filler_rate']} per 100 words)\n\n"
+    output += f"**Clarity:** {round(metrics['mean_confidence'] * 100)}% average word confidence — "
+    output += ", ".join(f"{label}: {count}" for label, count in zip(confidence_labels, metrics["confidence_histogram"]))
+    return output
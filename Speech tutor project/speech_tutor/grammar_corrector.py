@@ -1,59 +1,135 @@
-from string import Template
-from llm_engine import call_ollama
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from llm_engine import call_ollama, call_ollama_chat, routed_model
+from prompt_registry import render
+from relevance import score_relevance, local_comparison
+from profiling import profile_section
+from constants import BRIEF_PRONUNCIATION_WORDS, EVALUATION_WORKERS, RELEVANCE_SHORT_COMPARISON_TOKENS
+
+_evaluation_executor = ThreadPoolExecutor(max_workers=EVALUATION_WORKERS, thread_name_prefix="evaluation")
 
 def get_corrected_grammar(transcript, question=None, model="mistral:latest"):
     if not transcript:
         return "⚠️ No transcript found to correct."
 
-    with open("prompts/correction_prompt.txt") as f:
-        prompt_template = Template(f.read())
-
-    prompt = prompt_template.substitute(
+    prompt = render(
+        "correction_prompt",
         transcript=transcript,
         question=question or "No specific question provided."
     )
 
-    return call_ollama(prompt, model=model)
+    return call_ollama(prompt, model=model, task="grammar")
 
-def get_speech_feedback(flagged_words, transcript=None, question=None, model="mistral:latest"):
-    if not flagged_words:
-        return "✅ Your speech was clear!"
-
-    flagged = "\n".join([
+def format_flagged_words(flagged_words):
+    return "\n".join([
         f'- "{w.strip()}" ({round(p * 100)}%) — Pronunciation below clarity threshold'
         for w, p in flagged_words
     ])
 
-    with open("prompts/feedback_prompt.txt") as f:
-        prompt_template = Template(f.read())
+def pronunciation_task(flagged_words):
+    return "pronunciation_brief" if len(flagged_words) <= BRIEF_PRONUNCIATION_WORDS else "pronunciation"
+
+def get_speech_feedback(flagged_words, transcript=None, question=None, model="mistral:latest"):
+    if not flagged_words:
+        return "✅ Your speech was clear!"
 
-    prompt = prompt_template.substitute(
-        flagged_words=flagged,
+    prompt = render(
+        "feedback_prompt",
+        flagged_words=format_flagged_words(flagged_words),
         transcript=transcript or "Transcript not available.",
         question=question or "No question provided."
     )
 
-    return call_ollama(prompt, model=model)
+    return call_ollama(prompt, model=model, task=pronunciation_task(flagged_words))
 
 def compare_answers(user_answer, ideal_answer, model="mistral:latest"):
-    prompt = f"""
-You are an English communication evaluator.
+    prompt = render("comparison_prompt", user_answer=user_answer, ideal_answer=ideal_answer)
+    return call_ollama(prompt, model=model, task="comparison")
 
-Compare the student's answer to the ideal answer.
+def evaluation_messages(prefix, task_instructions):
+    """
+    Builds the chat messages for one evaluation task. Every task for a submission
+    starts with the same system role and prefix (question, transcript, ideal answer),
+    so Ollama can reuse the evaluated prefix from its cache and only process the
+    task-specific tail.
+    """
+    return [
+        {"role": "system", "content": render("evaluation_system").strip()},
+        {"role": "user", "content": f"{prefix}\n\n{task_instructions}"},
+    ]
 
-User's Spoken Answer:
-{user_answer}
+def _run_sections(sections, model, deadline):
+    for name, task, messages, options, future in sections:
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            with profile_section():
+                result = call_ollama_chat(messages, model=model, task=task, options=options, deadline=deadline)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
 
-Ideal Answer:
-{ideal_answer}
+def start_evaluation(transcript, flagged_words, question=None, ideal_answer=None, model="mistral:latest", deadline=None):
+    """
+    Starts the grammar, content and pronunciation evaluations for one submission
+    in the background and returns {"grammar", "feedback", "comparison"} futures.
 
-Evaluate based on:
-- Relevance to the question
-- Structure and fluency
-- Grammar and vocabulary
+    Every task shares one prompt prefix. Tasks routed to the same model run one
+    after another, so each continues from the prefix the previous one left in
+    the model's cache; tasks on different models run in parallel.
+
+    The answer is scored locally for relevance first: empty and off-topic
+    answers get a local content evaluation instead of an LLM call (see
+    relevance.LOCAL_COMPARISONS), and weak ones a shortened comparison.
+    """
+    prefix = render(
+        "evaluation_prefix",
+        question=question or "No specific question provided.",
+        transcript=transcript,
+        ideal_answer=ideal_answer or "No ideal answer provided."
+    ).strip()
+
+    futures = {}
+    sections = [("grammar", "grammar", render("grammar_task").strip(), None)]
+
+    relevance = score_relevance(transcript, ideal_answer, question)
+    local = local_comparison(relevance)
+    if local is not None:
+        futures["comparison"] = Future()
+        futures["comparison"].set_result(local)
+    else:
+        options = {"num_predict": RELEVANCE_SHORT_COMPARISON_TOKENS} if relevance["verdict"] == "weak" else None
+        sections.append(("comparison", "comparison", render("comparison_task").strip(), options))
+
+    if flagged_words:
+        task_instructions = render("pronunciation_task", flagged_words=format_flagged_words(flagged_words)).strip()
+        sections.append(("feedback", pronunciation_task(flagged_words), task_instructions, None))
+    else:
+        futures["feedback"] = Future()
+        futures["feedback"].set_result("✅ Your speech was clear!")
+
+    by_model = {}
+    for name, task, task_instructions, options in sections:
+        futures[name] = Future()
+        by_model.setdefault(routed_model(task, model), []).append(
+            (name, task, evaluation_messages(prefix, task_instructions), options, futures[name])
+        )
+
+    for group_model, model_sections in by_model.items():
+        # Carry the caller's LLM priority/owner into the worker thread
+        context = contextvars.copy_context()
+        _evaluation_executor.submit(context.run, _run_sections, model_sections, group_model, deadline)
+
+    return futures
+
+def evaluate_submission(transcript, flagged_words, question=None, ideal_answer=None, model="mistral:latest", deadline=None):
+    """
+    Runs the grammar, content and pronunciation evaluations for one submission
+    (see `start_evaluation`) and waits for them. Returns (grammar, feedback, comparison).
+    """
+    if not transcript:
+        return "⚠️ No transcript found to correct.", "✅ Your speech was clear!", ""
 
-Then provide:
-1. A short comparison
-2. 2 suggestions to improve
-"""
-    return call_ollama(prompt, model=model)
+    futures = start_evaluation(transcript, flagged_words, question, ideal_answer, model, deadline)
+    return futures["grammar"].result(), futures["feedback"].result(), futures["comparison"].result()
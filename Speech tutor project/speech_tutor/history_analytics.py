@@ -0,0 +1,287 @@
+# history_analytics.py — Columnar export of all users' sessions, and reports over it
+#
+# Sessions from user_history/*.json are materialized once into NumPy structured
+# arrays (ANALYTICS_DIR/sessions-*.npy): one row per session with its topic,
+# difficulty, model, time, rating and the numeric features from rating.py.
+# Each export only reads history files that changed and only adds their new
+# sessions, so reports never parse the prose feedback again.
+#
+#   python history_analytics.py export
+#   python history_analytics.py report --by topic --since 2026-10-01
+#   python history_analytics.py report --by month,difficulty --model mistral:latest --json
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from rating import FEATURE_NAMES, session_features
+from constants import ANALYTICS_DIR, ANALYTICS_MAX_PARTS
+
+HISTORY_DIR = "user_history"
+STATE_FILE = "export_state.json"
+# Longer strings are truncated to these widths
+SESSION_DTYPE = np.dtype(
+    [
+        ("user_id", "U40"),
+        ("timestamp", "datetime64[s]"),
+        ("topic", "U64"),
+        ("difficulty", "U16"),
+        ("model", "U48"),
+        ("rating", "f4"),
+    ]
+    + [(name, "f4") for name in FEATURE_NAMES]
+)
+# Pseudo-columns accepted by `aggregate` that group by the session time
+PERIODS = {"day": "datetime64[D]", "week": "datetime64[W]", "month": "datetime64[M]", "year": "datetime64[Y]"}
+DEFAULT_METRICS = ["rating", "grammar_score", "pronunciation_score", "content_score", "speaking_rate_wpm"]
+
+
+def _parse_timestamp(value):
+    try:
+        return np.datetime64(str(value).replace(" ", "T"), "s")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def sessions_to_array(user_id, sessions):
+    """
+    Returns the rows for `sessions` of `user_id` as a SESSION_DTYPE array.
+    """
+    rows = np.zeros(len(sessions), dtype=SESSION_DTYPE)
+    if not sessions:
+        return rows
+    rows["user_id"] = user_id
+    rows["timestamp"] = [_parse_timestamp(s.get("timestamp")) for s in sessions]
+    rows["topic"] = [s.get("topic") or "" for s in sessions]
+    rows["difficulty"] = [s.get("difficulty") or "" for s in sessions]
+    rows["model"] = [s.get("model") or "" for s in sessions]
+    rows["rating"] = [float(s.get("rating") or 0.0) for s in sessions]
+    features = np.vstack([session_features(s) for s in sessions])
+    for i, name in enumerate(FEATURE_NAMES):
+        rows[name] = features[:, i]
+    return rows
+
+
+def _load_state(export_dir):
+    path = Path(export_dir) / STATE_FILE
+    if not path.exists():
+        return {"files": {}, "parts": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_state(export_dir, state):
+    path = Path(export_dir) / STATE_FILE
+    partial = path.with_suffix(".tmp")
+    with open(partial, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(partial, path)
+
+
+def _write_part(export_dir, rows):
+    numbers = [int(path.stem.split("-")[1]) for path in Path(export_dir).glob("sessions-*.npy")]
+    name = f"sessions-{max(numbers + [0]) + 1:05d}.npy"
+    np.save(Path(export_dir) / name, rows)
+    return name
+
+
+def _remove_parts(export_dir, names):
+    for name in names:
+        (Path(export_dir) / name).unlink(missing_ok=True)
+
+
+def export_sessions(history_dir=HISTORY_DIR, export_dir=ANALYTICS_DIR, rebuild=False):
+    """
+    Adds the sessions saved since the last export to the columnar export.
+    History files are append-only in normal use; if one was rewritten (for
+    example by `rating.py --rescore --write`) the export is rebuilt from scratch.
+    Returns the number of sessions added.
+    """
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    state = {"files": {}, "parts": []} if rebuild else _load_state(export_dir)
+
+    new_rows = []
+    seen = {}
+    for history_file in sorted(Path(history_dir).glob("*.json")):
+        stat = history_file.stat()
+        known = state["files"].get(history_file.name)
+        if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+            seen[history_file.name] = known
+            continue
+        try:
+            with open(history_file, "r") as f:
+                sessions = json.load(f).get("sessions", [])
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Skipping {history_file}: {e}")
+            if known:
+                seen[history_file.name] = known
+            continue
+
+        exported = known["sessions"] if known else 0
+        if known and len(sessions) <= exported:
+            # Same or fewer sessions but different contents: rewritten, not appended to
+            print(f"🔁 {history_file.name} was rewritten — rebuilding the export")
+            return export_sessions(history_dir, export_dir, rebuild=True)
+        new_rows.append(sessions_to_array(history_file.stem, sessions[exported:]))
+        seen[history_file.name] = {"mtime": stat.st_mtime, "size": stat.st_size, "sessions": len(sessions)}
+
+    replaced = _load_state(export_dir)["parts"] if rebuild else []
+    added = sum(len(rows) for rows in new_rows)
+    if added:
+        state["parts"].append(_write_part(export_dir, np.concatenate(new_rows)))
+    state["files"] = seen
+    # The state is replaced atomically, so an interrupted export leaves the previous one readable
+    _save_state(export_dir, state)
+    _remove_parts(export_dir, replaced)
+
+    if len(state["parts"]) > ANALYTICS_MAX_PARTS:
+        compact(export_dir)
+    print(f"📦 Exported {added} new sessions ({len(seen)} history files)")
+    return added
+
+
+def load_sessions(export_dir=ANALYTICS_DIR):
+    """
+    Returns every exported session as one SESSION_DTYPE array.
+    """
+    state = _load_state(export_dir)
+    parts = [np.load(Path(export_dir) / name) for name in state["parts"]]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=SESSION_DTYPE)
+
+
+def compact(export_dir=ANALYTICS_DIR):
+    """
+    Merges all export parts into one.
+    """
+    export_dir = Path(export_dir)
+    state = _load_state(export_dir)
+    old_parts = list(state["parts"])
+    rows = load_sessions(export_dir)
+    state["parts"] = [_write_part(export_dir, rows)]
+    _save_state(export_dir, state)
+    _remove_parts(export_dir, old_parts)
+
+
+def filter_sessions(table, since=None, until=None, **equals):
+    """
+    Returns the rows from `since` (inclusive) to `until` (exclusive), both
+    "YYYY-MM-DD" strings, whose columns match `equals` (e.g. model="mistral:latest").
+    """
+    mask = np.ones(len(table), dtype=bool)
+    if since:
+        mask &= table["timestamp"] >= np.datetime64(since, "s")
+    if until:
+        mask &= table["timestamp"] < np.datetime64(until, "s")
+    for column, value in equals.items():
+        if value is not None:
+            mask &= table[column] == value
+    return table[mask]
+
+
+def aggregate(table, by=("topic",), metrics=DEFAULT_METRICS):
+    """
+    Groups `table` by the columns in `by` (or the periods "day", "week",
+    "month", "year") and returns one dict per group, sorted by key, with the
+    number of `sessions` and distinct `users` and the mean of each metric.
+    NaN values (for example a feedback section without a score) are left out of means.
+    """
+    if not len(table):
+        return []
+    keys = np.zeros(len(table), dtype=[(name, _key_dtype(table, name)) for name in by])
+    for name in by:
+        keys[name] = table["timestamp"].astype(PERIODS[name]) if name in PERIODS else table[name]
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    sessions = np.bincount(inverse, minlength=len(groups))
+    user_pairs = np.unique(np.stack([inverse, np.unique(table["user_id"], return_inverse=True)[1].reshape(-1)]), axis=1)
+    users = np.bincount(user_pairs[0], minlength=len(groups))
+
+    means = {}
+    for metric in metrics:
+        values = table[metric].astype(np.float64)
+        valid = ~np.isnan(values)
+        totals = np.bincount(inverse[valid], weights=values[valid], minlength=len(groups))
+        counts = np.bincount(inverse[valid], minlength=len(groups))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[metric] = totals / counts
+
+    report = []
+    for i, group in enumerate(groups):
+        row = {name: str(group[name]) for name in by}
+        row.update(sessions=int(sessions[i]), users=int(users[i]))
+        for metric in metrics:
+            row[f"mean_{metric}"] = None if np.isnan(means[metric][i]) else round(float(means[metric][i]), 3)
+        report.append(row)
+    return report
+
+
+def _key_dtype(table, name):
+    return PERIODS[name] if name in PERIODS else table.dtype[name]
+
+
+def write_parquet(table, path):
+    """
+    Writes `table` as a Parquet file (requires pyarrow).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+    pq.write_table(pa.table({name: table[name] for name in table.dtype.names}), path)
+
+
+def format_report(report, by, metrics):
+    columns = list(by) + ["sessions", "users"] + [f"mean_{m}" for m in metrics]
+    widths = [max(len(c), *(len(str(row[c])) for row in report)) for c in columns]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    for row in report:
+        lines.append("  ".join(("–" if row[c] is None else str(row[c])).ljust(w) for c, w in zip(columns, widths)))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and report on all users' practice sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Add new sessions to the columnar export")
+    export.add_argument("--rebuild", action="store_true", help="Re-export every session")
+    export.add_argument("--parquet", help="Also write all sessions to this Parquet file (needs pyarrow)")
+
+    report = commands.add_parser("report", help="Aggregate exported sessions")
+    report.add_argument("--by", default="topic", help=f"Comma-separated columns or periods ({', '.join(PERIODS)})")
+    report.add_argument("--metrics", default=",".join(DEFAULT_METRICS), help=f"Any of: rating, {', '.join(FEATURE_NAMES)}")
+    report.add_argument("--since", help="YYYY-MM-DD, inclusive")
+    report.add_argument("--until", help="YYYY-MM-DD, exclusive")
+    report.add_argument("--topic")
+    report.add_argument("--difficulty")
+    report.add_argument("--model")
+    report.add_argument("--no-export", action="store_true", help="Report on the export as it is")
+    report.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    for command in (export, report):
+        command.add_argument("--history-dir", default=HISTORY_DIR)
+        command.add_argument("--export-dir", default=ANALYTICS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_sessions(args.history_dir, args.export_dir, rebuild=args.rebuild)
+        if args.parquet:
+            write_parquet(load_sessions(args.export_dir), args.parquet)
+            print(f"💾 Parquet written to {args.parquet}")
+    else:
+        if not args.no_export:
+            export_sessions(args.history_dir, args.export_dir)
+        by = args.by.split(",")
+        metrics = args.metrics.split(",")
+        table = filter_sessions(
+            load_sessions(args.export_dir), args.since, args.until,
+            topic=args.topic, difficulty=args.difficulty, model=args.model
+        )
+        result = aggregate(table, by, metrics)
+        print(json.dumps(result, indent=2) if args.json else format_report(result, by, metrics))
@@ -0,0 +1,184 @@
+# interview_prep.py — Streamed, cached interview question generation for the Interview Prep tab
+#
+# Questions reach the UI one "Q:" block at a time. Finished sets are cached per
+# normalized (topic, traits, skills, model) and prompt version, so repeat requests
+# are instant. When the LLM has spare capacity, each question is generated by its
+# own call in parallel instead of one long streamed call.
+
+import contextvars
+import math
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from llm_engine import call_ollama_detailed, stream_ollama_detailed, spare_llm_slots, llm_slot_limit
+from prompt_registry import render, prompt_version
+from metrics import CACHE_REQUESTS
+from constants import INTERVIEW_FOCUS_AREAS, INTERVIEW_PARALLEL_MIN_FREE_SHARE, INTERVIEW_CACHE_SIZE
+
+# Start of a question block: "Q:", "Q1.", "**Q2:**", "Question 3:", "3. Q:" ...
+_BLOCK_START = re.compile(r"^[\s*#>\d.)-]*Q(?:uestion)?\s*\d*\s*\**\s*[:.)]", re.IGNORECASE | re.MULTILINE)
+
+_executor = ThreadPoolExecutor(max_workers=len(INTERVIEW_FOCUS_AREAS) * 2, thread_name_prefix="interview")
+
+_cache = OrderedDict()  # key -> formatted questions
+_cache_lock = threading.Lock()
+
+
+def _normalize_text(text):
+    return " ".join((text or "").lower().split())
+
+
+def _normalize_list(text):
+    # "Python, SQL" and "sql,python " ask for the same thing
+    return ",".join(sorted({_normalize_text(item) for item in (text or "").split(",") if item.strip()}))
+
+
+def cache_key(topic, personality_traits, technical_skills, model):
+    return (
+        _normalize_text(topic),
+        _normalize_list(personality_traits),
+        _normalize_list(technical_skills),
+        model,
+        prompt_version(),
+    )
+
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _cache_put(key, text):
+    with _cache_lock:
+        _cache[key] = text
+        _cache.move_to_end(key)
+        while len(_cache) > INTERVIEW_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def split_question_blocks(text):
+    """
+    Splits generated text into question blocks, each starting at a "Q:" line.
+    Text before the first question (e.g. "Here are five questions") is dropped.
+    """
+    starts = [m.start() for m in _BLOCK_START.finditer(text or "")]
+    bounds = zip(starts, starts[1:] + [len(text or "")])
+    return [text[start:end].strip() for start, end in bounds if text[start:end].strip()]
+
+
+def _streamed_blocks(prompt_values, model, failures):
+    """
+    Yields each question block of one streamed call as soon as the next one starts.
+    A block cut off by an error or the token limit is not yielded.
+    """
+    prompt = render("interview_questions", **prompt_values)
+    emitted = 0
+    generated = ""
+    result = None
+    for result in stream_ollama_detailed(prompt, model=model, task="interview"):
+        # A failed stream ends with the error appended to the text so far
+        if not (result["done"] and result["error"]):
+            generated = result["response"]
+        blocks = split_question_blocks(generated)
+        # The last block may still be growing, or was never finished
+        finished = result["done"] and not result["error"] and not result["truncated"]
+        complete = blocks if finished else blocks[:-1]
+        for block in complete[emitted:]:
+            yield block
+        emitted = max(emitted, len(complete))
+
+    if result is None:
+        failures.append("❌ No response from Ollama.")
+    elif result["error"]:
+        message = result["response"]
+        if generated.strip() and message.startswith(generated.strip()):
+            message = message[len(generated.strip()):].strip()
+        failures.append(message)
+    elif result["truncated"]:
+        failures.append("✂️ The questions were cut off at the length limit.")
+    elif not emitted:
+        failures.append(result["response"])
+
+
+def _parallel_blocks(prompt_values, model, failures):
+    """
+    Generates one question per focus area with independent calls and yields
+    each block as its call completes.
+    """
+    def generate(focus):
+        prompt = render("interview_question_single", focus=focus, **prompt_values)
+        return call_ollama_detailed(prompt, model=model, task="interview_single")
+
+    # Run each call under the caller's LLM priority and owner
+    futures = [
+        _executor.submit(contextvars.copy_context().run, generate, focus)
+        for focus in INTERVIEW_FOCUS_AREAS
+    ]
+    for future in as_completed(futures):
+        result = future.result()
+        blocks = split_question_blocks(result["response"])
+        if result["error"] or not blocks:
+            failures.append(result["response"])
+            continue
+        if result["truncated"]:
+            # Shown, but keeps the set out of the cache
+            failures.append("✂️ A question was cut off at the length limit.")
+        yield blocks[0]
+
+
+def format_question_blocks(blocks):
+    return "\n\n".join(f"### Question {i + 1}\n{block}" for i, block in enumerate(blocks))
+
+
+def use_parallel_blocks(model):
+    """
+    True when the model has enough free slots for generating the questions in
+    parallel to be faster than one streamed call. Models limited to one call
+    at a time always stream.
+    """
+    needed = max(2, math.ceil(llm_slot_limit(model, task="interview_single") * INTERVIEW_PARALLEL_MIN_FREE_SHARE))
+    return spare_llm_slots(model, task="interview_single") >= needed
+
+
+def stream_interview_questions(topic, personality_traits, technical_skills, model):
+    """
+    Yields the interview questions generated so far as Markdown, once per
+    completed question block. A cached set is returned in one step.
+    """
+    key = cache_key(topic, personality_traits, technical_skills, model)
+    cached = _cache_get(key)
+    CACHE_REQUESTS.inc(cache="interview_questions", result="miss" if cached is None else "hit")
+    if cached is not None:
+        print(f"📦 Interview questions served from cache: {topic}")
+        yield cached
+        return
+
+    prompt_values = {"topic": topic, "personality_traits": personality_traits, "technical_skills": technical_skills}
+    generate_blocks = _parallel_blocks if use_parallel_blocks(model) else _streamed_blocks
+
+    blocks = []
+    failures = []
+    for block in generate_blocks(prompt_values, model, failures):
+        blocks.append(block)
+        yield format_question_blocks(blocks)
+
+    text = format_question_blocks(blocks)
+    if failures:
+        yield "\n\n".join(part for part in [text, *failures] if part)
+    else:
+        _cache_put(key, text)
+
+
+def generate_interview_questions(topic, personality_traits, technical_skills, model):
+    """
+    Returns the complete interview questions as Markdown.
+    """
+    text = ""
+    for text in stream_interview_questions(topic, personality_traits, technical_skills, model):
+        pass
+    return text
@@ -0,0 +1,251 @@
+# job_api.py — Headless HTTP API for submitting recordings and polling their results
+#
+# Endpoints:
+#   POST   /jobs/evaluate        multipart: audio file + question, ideal_answer, difficulty, model, user_id, topic
+#   POST   /jobs/question        JSON: topic, difficulty, model, user_id
+#   GET    /jobs                 job summaries (optional ?status=)
+#   GET    /jobs/{id}            status and staged results (?after=<version>&wait=<seconds> to long-poll)
+#   GET    /jobs/{id}/events     staged results as server-sent events until the job finishes
+#   DELETE /jobs/{id}            cancel
+#   GET    /metrics              Prometheus metrics
+#
+# Started next to the UI when JOB_API_PORT is set, or on its own:
+#   python job_api.py --port 7870
+
+import argparse
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from jobs import JobManager, JobQueueFull, FINISHED
+from metrics import render as render_metrics, register_collector
+from constants import (
+    DEFAULT_MODEL,
+    JOB_API_PORT,
+    JOB_API_HOST,
+    JOB_UPLOAD_DIR,
+    JOB_MAX_WAIT_SECONDS,
+    MAX_UPLOAD_BYTES,
+    USER_ID_PATTERN,
+)
+
+
+class QuestionRequest(BaseModel):
+    topic: str
+    difficulty: str = "Medium"
+    model: str = DEFAULT_MODEL
+    user_id: str = None
+
+
+def check_user_id(user_id):
+    """
+    Rejects user ids that aren't ours, since they become history file names.
+    """
+    if user_id is not None and not re.fullmatch(USER_ID_PATTERN, user_id):
+        raise HTTPException(status_code=422, detail=f"user_id must match {USER_ID_PATTERN}")
+
+
+def evaluation_handler(tutor_conversation_stream, save_history, calculate_rating):
+    """
+    Job handler for one recording: reports every state of the staged
+    evaluation with its rating and saves the session once complete (unless
+    the job was cancelled).
+    """
+    def run(params, report, cancelled):
+        stage = None
+        for state in tutor_conversation_stream(
+            params["audio"], params["question"], params["ideal_answer"], params["difficulty"], params["model"]
+        ):
+            sections = {name: (None if name in state["pending"] else state[name]) for name in ("grammar", "feedback", "comparison")}
+            rating = calculate_rating(
+                state["transcript"], sections["grammar"], sections["feedback"], sections["comparison"],
+                fluency=state["fluency"], flagged_words=state["flagged_words"], ideal_answer=params["ideal_answer"]
+            )
+            stage = {
+                "transcript": state["transcript"],
+                "grammar": state["grammar"],
+                "feedback": state["feedback"],
+                "comparison": state["comparison"],
+                "fluency": state["fluency"],
+                "pending": state["pending"],
+                "rating": rating,
+                "final": state["final"],
+                "queue_position": state.get("queue_position"),
+            }
+            report(stage)
+
+        if cancelled():
+            return stage
+        if stage and params["user_id"] and state["transcript"] and not state["transcript"].startswith("❌"):
+            save_history(
+                params["user_id"], params["topic"], params["difficulty"], params["question"], state["transcript"],
+                state["grammar"], state["feedback"], state["comparison"], stage["rating"],
+                fluency=state["fluency"], ideal_answer=params["ideal_answer"], audio=params["audio"], model=params["model"]
+            )
+        return stage
+
+    return run
+
+
+def question_handler(generate_question_and_answer):
+    def run(params, report, cancelled):
+        question, ideal_answer = generate_question_and_answer(
+            params["topic"], params["difficulty"], params["model"], user_id=params["user_id"]
+        )
+        return {"question": question, "ideal_answer": ideal_answer}
+
+    return run
+
+
+def create_job_api(tutor_conversation_stream, generate_question_and_answer, save_history, calculate_rating, manager=None):
+    """
+    Returns the FastAPI app serving the job API over the given tutor functions.
+    """
+    manager = manager or JobManager({
+        "evaluate": evaluation_handler(tutor_conversation_stream, save_history, calculate_rating),
+        "question": question_handler(generate_question_and_answer),
+    })
+    upload_dir = Path(JOB_UPLOAD_DIR)
+    upload_dir.mkdir(exist_ok=True)
+    api = FastAPI(title="VaakShakti AI job API")
+    api.state.jobs = manager
+
+    @register_collector
+    def _job_metrics():
+        return [("speech_tutor_jobs", "Known API jobs by status", {(("status", k),): n for k, n in manager.stats().items()})]
+
+    def submit(kind, params, cleanup=None):
+        try:
+            job = manager.submit(kind, params, cleanup)
+        except JobQueueFull as e:
+            if cleanup:
+                cleanup()
+            raise HTTPException(status_code=503, detail=f"Job queue is full: {e}")
+        return {"job_id": job.id, "status": job.status}
+
+    def find(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return job
+
+    @api.post("/jobs/evaluate", status_code=202)
+    def submit_evaluation(
+        audio: UploadFile = File(...),
+        question: str = Form(...),
+        ideal_answer: str = Form(""),
+        difficulty: str = Form("Medium"),
+        model: str = Form(DEFAULT_MODEL),
+        user_id: str = Form(None),
+        topic: str = Form(""),
+    ):
+        check_user_id(user_id)
+        path = upload_dir / f"{uuid.uuid4().hex}{Path(audio.filename or '').suffix or '.wav'}"
+        size = 0
+        with open(path, "wb") as f:
+            while chunk := audio.file.read(1024 * 1024):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    break
+                f.write(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            path.unlink(missing_ok=True)
+            raise HTTPException(status_code=413, detail=f"Recording is larger than {MAX_UPLOAD_BYTES} bytes")
+
+        params = {
+            "audio": str(path), "question": question, "ideal_answer": ideal_answer, "difficulty": difficulty,
+            "model": model, "user_id": user_id, "topic": topic,
+        }
+        return submit("evaluate", params, cleanup=lambda: path.unlink(missing_ok=True))
+
+    @api.post("/jobs/question", status_code=202)
+    def submit_question(request: QuestionRequest):
+        check_user_id(request.user_id)
+        return submit("question", request.dict())
+
+    @api.get("/jobs")
+    def list_jobs(status: str = None):
+        return {"jobs": manager.list(status), "counts": manager.stats()}
+
+    @api.get("/jobs/{job_id}")
+    def get_job(job_id: str, after: int = 0, wait: float = 0):
+        find(job_id)
+        job = manager.wait(job_id, after_version=after, timeout=min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+        return job.to_dict()
+
+    @api.get("/jobs/{job_id}/events")
+    def job_events(job_id: str):
+        find(job_id)
+
+        def events():
+            version, sent = 0, 0
+            while True:
+                job = manager.wait(job_id, after_version=version, timeout=JOB_MAX_WAIT_SECONDS)
+                if job is None:
+                    return
+                version = job.version
+                for stage in job.stages[sent:]:
+                    yield f"event: stage\ndata: {json.dumps(stage)}\n\n"
+                sent = len(job.stages)
+                if job.status in FINISHED:
+                    yield f"event: {job.status}\ndata: {json.dumps(job.to_dict(after_stage=sent))}\n\n"
+                    return
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @api.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return render_metrics()
+
+    @api.delete("/jobs/{job_id}")
+    def cancel_job(job_id: str):
+        find(job_id)
+        return manager.cancel(job_id).summary()
+
+    return api
+
+
+def start_job_api(api, port, host=None):
+    """
+    Serves `api` on a background thread and returns the uvicorn server.
+    """
+    host = host or job_api_host()
+    server = uvicorn.Server(uvicorn.Config(api, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="job-api", daemon=True).start()
+    print(f"🛰️ Job API listening on http://{host}:{port}")
+    return server
+
+
+def job_api_port():
+    port = os.environ.get("JOB_API_PORT") or JOB_API_PORT
+    return int(port) if port else None
+
+
+def job_api_host():
+    return os.environ.get("JOB_API_HOST") or JOB_API_HOST
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the headless job API without the UI")
+    parser.add_argument("--host", default=job_api_host(), help="Use 0.0.0.0 to accept remote clients")
+    parser.add_argument("--port", type=int, default=job_api_port() or 7870)
+    args = parser.parse_args()
+
+    from app import tutor_conversation_stream, generate_question_and_answer, save_history, calculate_rating
+    from model_manager import start_warm_up
+
+    start_warm_up()
+    uvicorn.run(
+        create_job_api(tutor_conversation_stream, generate_question_and_answer, save_history, calculate_rating),
+        host=args.host, port=args.port
+    )
@@ -0,0 +1,194 @@
+# jobs.py — Bounded background job queue for non-interactive (API) work
+#
+# Each job runs a handler on a fixed pool of worker threads, separate from
+# Gradio's. Handlers report staged results as they go; clients poll or wait for
+# the next update.
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_engine import cancel_llm_requests
+from llm_scheduler import llm_request_context, PRIORITY_BATCH
+from constants import JOB_WORKERS, JOB_QUEUE_LIMIT, JOB_RETENTION
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, kind, params, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.cleanup = cleanup
+        self.status = QUEUED
+        self.stages = []   # staged results, oldest first
+        self.result = None
+        self.error = None
+        self.version = 0   # bumped on every change, for "wait for the next update"
+        self.cancel_requested = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def owner(self):
+        # LLM calls made by the job are tagged with this, so they can be cancelled together
+        return f"job:{self.id}"
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "version": self.version,
+            "stages": len(self.stages),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def to_dict(self, after_stage=0):
+        return dict(self.summary(), stage_results=self.stages[after_stage:], result=self.result, error=self.error)
+
+
+class JobManager:
+    """
+    Runs `handlers[kind](params, report, cancelled)` for each submitted job on
+    at most `workers` threads. `report(stage)` records a staged result and
+    `cancelled()` tells whether the job was cancelled; the handler's return
+    value is the final result. LLM calls made by jobs run at batch
+    priority, behind interactive UI requests.
+    """
+
+    def __init__(self, handlers, workers=JOB_WORKERS, max_queued=JOB_QUEUE_LIMIT, retention=JOB_RETENTION):
+        self.handlers = dict(handlers)
+        self.max_queued = max_queued
+        self.retention = retention
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, kind, params, cleanup=None):
+        """
+        Queues a job and returns it. `cleanup()` runs once the job has finished
+        (e.g. to delete its uploaded audio). Raises JobQueueFull when too many
+        jobs are waiting, and KeyError for an unknown kind.
+        """
+        if kind not in self.handlers:
+            raise KeyError(f"Unknown job kind: {kind}")
+
+        with self._condition:
+            queued = sum(job.status == QUEUED for job in self._jobs.values())
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs are already queued")
+            job = Job(kind, params, cleanup)
+            self._jobs[job.id] = job
+            self._forget_old()
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def _update(self, job, **fields):
+        with self._condition:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._condition.notify_all()
+
+    def _report(self, job, stage):
+        with self._condition:
+            job.stages.append(stage)
+            job.version += 1
+            self._condition.notify_all()
+
+    def _run(self, job):
+        with self._condition:
+            if job.status != QUEUED:
+                return
+        self._update(job, status=RUNNING, started_at=time.time())
+
+        try:
+            with llm_request_context(priority=PRIORITY_BATCH, owner=job.owner):
+                result = self.handlers[job.kind](
+                    job.params, lambda stage: self._report(job, stage), lambda: job.cancel_requested
+                )
+            status = CANCELLED if job.cancel_requested else DONE
+            self._update(job, status=status, result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+            status = CANCELLED if job.cancel_requested else FAILED
+            self._update(job, status=status, error=str(e), finished_at=time.time())
+        finally:
+            if job.cleanup is not None:
+                try:
+                    job.cleanup()
+                except Exception as e:
+                    print(f"⚠️ Job {job.id} cleanup failed: {e}")
+
+    def get(self, job_id):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def list(self, status=None):
+        """
+        Returns the summaries of known jobs, newest first, optionally filtered by status.
+        """
+        with self._condition:
+            jobs = [job.summary() for job in reversed(self._jobs.values())]
+        return [job for job in jobs if status is None or job["status"] == status]
+
+    def wait(self, job_id, after_version=0, timeout=0):
+        """
+        Waits up to `timeout` seconds for the job to change past `after_version`
+        (or finish) and returns it; None for an unknown job.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._condition.wait_for(lambda: job.version > after_version or job.status in FINISHED, timeout=timeout)
+            return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job, or stops a running one's LLM calls.
+        Returns the job, or None if it is unknown.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            queued = job.status == QUEUED
+
+        if queued:
+            self._update(job, status=CANCELLED, finished_at=time.time())
+            if job.cleanup is not None:
+                job.cleanup()
+        else:
+            cancel_llm_requests(job.owner)
+        return job
+
+    def stats(self):
+        with self._condition:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
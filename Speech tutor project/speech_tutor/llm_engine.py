@@ -1,24 +1,403 @@
+import os
+import time
+import threading
 import requests
 import json
+import hashlib
+import queue
+from concurrent.futures import CancelledError
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from constants import DEFAULT_KEEP_ALIVE, MODEL_KEEP_ALIVE, DEFAULT_MODEL, PIN_DEFAULT_MODEL, GENERATION_PROFILES, LLM_REQUEST_TIMEOUT
+from model_router import route_model, record_latency, record_failure
+from single_flight import SingleFlight
+from llm_scheduler import LLMScheduler, current_priority, current_owner
+from backend_pool import BackendPool
+from metrics import LLM_SECONDS, LLM_TOKENS_PER_SECOND, LLM_TOKENS, LLM_ERRORS, CACHE_REQUESTS, register_collector
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_URL = f"{OLLAMA_HOST}/api/generate"
+
+# Comma-separated Ollama base URLs to balance across (defaults to OLLAMA_HOST alone)
+OLLAMA_BACKENDS = [u.strip().rstrip("/") for u in os.environ.get("OLLAMA_BACKENDS", "").split(",") if u.strip()] or [OLLAMA_HOST]
+
+_pool = BackendPool(OLLAMA_BACKENDS)
+
+# task -> {"calls", "tokens", "truncated"} accumulated since startup
+_generation_stats = {}
+_stats_lock = threading.Lock()
+
+# Identical requests already in flight share one Ollama call
+_single_flight = SingleFlight()
+
+# Per-model concurrency limits and priority ordering for every Ollama call
+_scheduler = LLMScheduler(scale=len(OLLAMA_BACKENDS))
+
+
+def keep_alive_for(model):
+    """
+    Returns the Ollama keep_alive value to send with a request for `model`.
+    The default model is pinned (never unloaded) when PIN_DEFAULT_MODEL is set.
+    """
+    if PIN_DEFAULT_MODEL and model == DEFAULT_MODEL:
+        return -1
+    return MODEL_KEEP_ALIVE.get(model, DEFAULT_KEEP_ALIVE)
+
+
+def generation_options(task, overrides=None):
+    """
+    Returns the Ollama `options` for `task` from GENERATION_PROFILES,
+    falling back to the default profile.
+    """
+    options = dict(GENERATION_PROFILES.get(task) or GENERATION_PROFILES["default"])
+    if overrides:
+        options.update(overrides)
+    return options
+
+
+def _record_generation(task, model, result):
+    key = task or "default"
+    with _stats_lock:
+        stats = _generation_stats.setdefault(key, {"calls": 0, "tokens": 0, "truncated": 0})
+        stats["calls"] += 1
+        stats["tokens"] += result["eval_count"]
+        stats["truncated"] += int(result["truncated"])
+
+    if result["truncated"]:
+        print(f"✂️ {key} output truncated at {result['eval_count']} tokens ({model})")
+
+
+def _observe_request(task, model, result):
+    labels = {"model": model, "task": task or "default"}
+    if result["error"]:
+        LLM_ERRORS.inc(**labels)
+        return
+    LLM_SECONDS.observe(result["duration"], **labels)
+    LLM_TOKENS.inc(result["eval_count"], **labels)
+    if result["duration"] > 0:
+        LLM_TOKENS_PER_SECOND.observe(result["eval_count"] / result["duration"], **labels)
+
+
+def generation_stats():
+    """
+    Returns a copy of the per-task token and truncation counters.
+    """
+    with _stats_lock:
+        return {task: dict(stats) for task, stats in _generation_stats.items()}
 
-def call_ollama(prompt, model="mistral:latest"):
-    response = requests.post(
-        OLLAMA_URL,
-        json={"model": model, "prompt": prompt, "stream": False},
-        timeout=600
-    )
+
+def _empty_result(model, response=""):
+    return {
+        "response": response,
+        "model": model,
+        "eval_count": 0,
+        "prompt_eval_count": 0,
+        "truncated": False,
+        "duration": 0.0,
+        "error": True,
+    }
+
+
+def routed_model(task, model):
+    """
+    Returns the model the router picks for `task`, among the models the Ollama backends have.
+    """
+    return route_model(task, model, _pool.available_models())
+
+
+def _send(path, payload, task, model, deadline=None):
+    """
+    Posts `payload` to the Ollama endpoint `path` and returns the detailed
+    result dict described in `call_ollama_detailed`. The request timeout is
+    bounded by `deadline`; nothing is sent once it has passed.
+    """
+    result = _post(path, payload, task, model, deadline)
+    _observe_request(task, model, result)
+    return result
+
+
+def _post(path, payload, task, model, deadline=None):
+    result = _empty_result(model)
+    payload = dict(payload, model=model, stream=False, keep_alive=keep_alive_for(model))
+
+    if deadline is not None and deadline.expired():
+        result["response"] = "⌛ Skipped: time budget exceeded."
+        return result
+    timeout = LLM_REQUEST_TIMEOUT if deadline is None else deadline.timeout(LLM_REQUEST_TIMEOUT)
+
+    started = time.perf_counter()
+    tried = []
+    while True:
+        with _pool.acquire(model, exclude=tried) as base_url:
+            try:
+                response = requests.post(f"{base_url}{path}", json=payload, timeout=timeout)
+                break
+            except requests.RequestException as e:
+                _pool.report_failure(base_url, e)
+                tried.append(base_url)
+                # Retry unreachable backends elsewhere; a timeout may still be generating
+                if isinstance(e, requests.Timeout) or len(tried) >= len(_pool):
+                    result["response"] = f"❌ Ollama call failed: {str(e)}"
+                    record_failure(task, model)
+                    return result
 
     try:
         raw_lines = response.text.strip().splitlines()
         for line in raw_lines:
             try:
                 data = json.loads(line)
-                if "response" in data:
-                    return data["response"]
             except json.JSONDecodeError:
                 continue
-        return "⚠️ Could not parse Ollama response."
+            if "response" in data or "message" in data:
+                text = data["response"] if "response" in data else data["message"].get("content", "")
+                result.update(
+                    response=text,
+                    eval_count=data.get("eval_count", 0),
+                    prompt_eval_count=data.get("prompt_eval_count", 0),
+                    truncated=data.get("done_reason") == "length",
+                    duration=time.perf_counter() - started,
+                    error=False,
+                )
+                _pool.mark_loaded(base_url, model)
+                record_latency(task, model, result["duration"])
+                _record_generation(task, model, result)
+                return result
+        result["response"] = "⚠️ Could not parse Ollama response."
     except Exception as e:
-        return f"❌ Ollama call failed: {str(e)}"
+        result["response"] = f"❌ Ollama call failed: {str(e)}"
+    # Also covers models the backend doesn't have, which answer with {"error": ...}
+    record_failure(task, model)
+    return result
+
+
+def _send_stream(path, payload, task, model, emit, stop, deadline=None):
+    """
+    Streaming form of `_send`: posts `payload` with stream=True and calls
+    `emit(result)` with the detailed result so far (`response` holds the text
+    generated up to now, `done` marks the last one). Stops reading once `stop` is set.
+    """
+    result = dict(_empty_result(model), done=False)
+    payload = dict(payload, model=model, stream=True, keep_alive=keep_alive_for(model))
+
+    def finish(message=None, **fields):
+        if message is not None and message.startswith(("❌", "⚠️")):
+            record_failure(task, model)
+        if message is not None:
+            result["response"] = (result["response"] + "\n\n" + message).strip()
+        result.update(fields, done=True)
+        _observe_request(task, model, result)
+        emit(dict(result))
+
+    if deadline is not None and deadline.expired():
+        return finish("⌛ Skipped: time budget exceeded.")
+    timeout = LLM_REQUEST_TIMEOUT if deadline is None else deadline.timeout(LLM_REQUEST_TIMEOUT)
+
+    started = time.perf_counter()
+    tried = []
+    while True:
+        with _pool.acquire(model, exclude=tried) as base_url:
+            try:
+                response = requests.post(f"{base_url}{path}", json=payload, timeout=timeout, stream=True)
+            except requests.RequestException as e:
+                _pool.report_failure(base_url, e)
+                tried.append(base_url)
+                if isinstance(e, requests.Timeout) or len(tried) >= len(_pool):
+                    return finish(f"❌ Ollama call failed: {str(e)}")
+                continue
+
+            # The backend stays counted as busy until the whole stream is read
+            with response:
+                try:
+                    for line in response.iter_lines():
+                        if stop.is_set():
+                            return finish("⏹️ Request cancelled.")
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if "error" in data:
+                            return finish(f"❌ Ollama error: {data['error']}")
+
+                        text = data["response"] if "response" in data else data.get("message", {}).get("content", "")
+                        if not data.get("done"):
+                            if text:
+                                result["response"] += text
+                                emit(dict(result))
+                            continue
+
+                        result["response"] += text
+                        result.update(
+                            eval_count=data.get("eval_count", 0),
+                            prompt_eval_count=data.get("prompt_eval_count", 0),
+                            truncated=data.get("done_reason") == "length",
+                            duration=time.perf_counter() - started,
+                            error=False,
+                        )
+                        _pool.mark_loaded(base_url, model)
+                        record_latency(task, model, result["duration"])
+                        _record_generation(task, model, result)
+                        return finish()
+                except requests.RequestException as e:
+                    return finish(f"❌ Ollama call failed: {str(e)}")
+            return finish("⚠️ Ollama stream ended unexpectedly.")
+
+
+def _send_coalesced(path, payload, task, model, dedupe_key=None, deadline=None):
+    """
+    Sends the request unless an identical one is already in flight, in which
+    case the caller waits for that call's result instead. Requests are identical
+    when their endpoint, model and payload match, or when they share `dedupe_key`,
+    and they have the same priority (so an interactive call never ends up
+    waiting on a prefetch queued behind other work). The shared call belongs to
+    no single owner: cancelling one caller only stops that caller waiting, and
+    the call itself is cancelled once all its callers have been.
+    """
+    priority, owner = current_priority(), current_owner()
+    if dedupe_key is None:
+        dedupe_key = json.dumps(payload, sort_keys=True)
+    key = hashlib.sha256(f"{path}|{model}|{task}|{priority}|{dedupe_key}".encode("utf-8")).hexdigest()
+
+    def scheduled_send():
+        return _scheduler.start(model, lambda: _send(path, payload, task, model, deadline), priority)
+
+    try:
+        waiter, shared = _single_flight.join(key, scheduled_send, owner)
+        result = waiter.result()
+    except CancelledError:
+        LLM_ERRORS.inc(model=model, task=task or "default")
+        return dict(_empty_result(model, "⏹️ Request cancelled."), shared=False, cancelled=True)
+    CACHE_REQUESTS.inc(cache="llm_in_flight", result="hit" if shared else "miss")
+    return dict(result, shared=shared)
+
+
+def spare_llm_slots(model, task=None):
+    """
+    Returns how many more calls the model `task` would be routed to could
+    start right now without queueing (0 or less when it is saturated).
+    """
+    return _scheduler.free_slots(routed_model(task, model))
+
+
+def llm_slot_limit(model, task=None):
+    """
+    Returns how many calls the model `task` would be routed to may run at once.
+    """
+    return _scheduler.limit_for(routed_model(task, model))
+
+
+@register_collector
+def _queue_metrics():
+    stats = _scheduler.stats()
+    backends = _pool.status()
+    return [
+        ("speech_tutor_llm_queued", "LLM calls waiting in the scheduler", {(("model", m),): n for m, n in stats["queued"].items()}),
+        ("speech_tutor_llm_running", "LLM calls in flight", {(("model", m),): n for m, n in stats["running"].items()}),
+        ("speech_tutor_ollama_backend_healthy", "1 if the Ollama backend is receiving requests",
+         {(("backend", b["url"]),): int(b["healthy"]) for b in backends}),
+        ("speech_tutor_ollama_backend_outstanding", "Requests in flight per Ollama backend",
+         {(("backend", b["url"]),): b["outstanding"] for b in backends}),
+    ]
+
+
+def cancel_llm_requests(owner):
+    """
+    Cancels the queued and running LLM calls tagged with `owner`
+    (see llm_scheduler.llm_request_context). Returns how many were cancelled.
+    Coalesced calls keep running while other owners still wait on them.
+    """
+    return _single_flight.detach(owner) + _scheduler.cancel_owner(owner)
+
+
+def scheduler_stats():
+    return _scheduler.stats()
+
+
+def backend_status():
+    """
+    Returns the health, outstanding requests and loaded models of each Ollama backend.
+    """
+    return _pool.status()
+
+
+def single_flight_stats():
+    """
+    Returns {"calls", "coalesced", "in_flight"}; `coalesced` is the number of
+    Ollama calls saved by sharing an in-flight result.
+    """
+    return _single_flight.stats()
+
+
+def call_ollama_detailed(prompt, model="mistral:latest", task=None, options=None, dedupe_key=None, deadline=None):
+    """
+    Sends `prompt` to Ollama and returns a dict with the generated `response`,
+    the `model` actually used, `eval_count` (tokens generated),
+    `prompt_eval_count`, `truncated` (stopped by num_predict), `duration` in seconds
+    and `shared` (result came from an identical in-flight call).
+    On failure `response` holds the error message and `error` is True.
+    `deadline` (a deadline.Deadline) bounds how long the call may take.
+    """
+    model = routed_model(task, model)
+    payload = {"prompt": prompt, "options": generation_options(task, options)}
+    return _send_coalesced("/api/generate", payload, task, model, dedupe_key, deadline)
+
+
+def call_ollama_chat_detailed(messages, model="mistral:latest", task=None, options=None, dedupe_key=None, deadline=None):
+    """
+    Same as `call_ollama_detailed`, but sends a list of chat `messages`
+    ({"role", "content"} dicts) to Ollama's chat API.
+    """
+    model = routed_model(task, model)
+    payload = {"messages": messages, "options": generation_options(task, options)}
+    return _send_coalesced("/api/chat", payload, task, model, dedupe_key, deadline)
+
+
+def stream_ollama_detailed(prompt, model="mistral:latest", task=None, options=None, deadline=None):
+    """
+    Streams the response to `prompt`. Yields the detailed result (see
+    `call_ollama_detailed`) each time more text arrives: `response` is the text
+    generated so far, and the last item has `done` set along with the token counts
+    and `error`. The call waits its turn in the scheduler like any other; closing
+    the generator or cancelling its owner stops the stream.
+    """
+    model = routed_model(task, model)
+    payload = {"prompt": prompt, "options": generation_options(task, options)}
+    updates = queue.Queue()
+    stop = threading.Event()
+
+    future = _scheduler.start(
+        model, lambda: _send_stream("/api/generate", payload, task, model, updates.put, stop, deadline),
+        current_priority(), current_owner()
+    )
+    # Wake the reader when the call finishes or is cancelled before sending anything
+    future.add_done_callback(lambda f: updates.put(None))
+
+    try:
+        while True:
+            update = updates.get()
+            if update is None:
+                break
+            yield update
+            if update["done"]:
+                return
+        if future.cancelled():
+            yield dict(_empty_result(model, "⏹️ Request cancelled."), done=True, cancelled=True)
+        elif future.exception() is not None:
+            yield dict(_empty_result(model, f"❌ Ollama call failed: {future.exception()}"), done=True)
+    finally:
+        stop.set()
+
+
+def call_ollama(prompt, model="mistral:latest", task=None, options=None, dedupe_key=None, deadline=None):
+    """
+    Sends `prompt` to Ollama and returns the generated text.
+    When `task` is given, the model is chosen by the router, the task's
+    generation profile bounds the output, and the call's latency is recorded.
+    Pass `dedupe_key` to coalesce requests whose prompts differ only in noise.
+    """
+    return call_ollama_detailed(prompt, model=model, task=task, options=options, dedupe_key=dedupe_key, deadline=deadline)["response"]
+
+
+def call_ollama_chat(messages, model="mistral:latest", task=None, options=None, dedupe_key=None, deadline=None):
+    """
+    Sends chat `messages` to Ollama and returns the generated text.
+    """
+    return call_ollama_chat_detailed(messages, model=model, task=task, options=options, dedupe_key=dedupe_key, deadline=deadline)["response"]
@@ -0,0 +1,228 @@
+# llm_scheduler.py — asyncio scheduler for Ollama calls: per-model limits and priorities
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import DEFAULT_MODEL_CONCURRENCY, MODEL_CONCURRENCY, LLM_WORKER_THREADS
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 5
+PRIORITY_BATCH = 10
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PREFETCH: "prefetch",
+    PRIORITY_BATCH: "batch",
+}
+
+# Priority and owner (usually the user id) of LLM calls made in the current context
+_request_priority = contextvars.ContextVar("llm_request_priority", default=PRIORITY_INTERACTIVE)
+_request_owner = contextvars.ContextVar("llm_request_owner", default=None)
+
+
+@contextlib.contextmanager
+def llm_request_context(priority=PRIORITY_INTERACTIVE, owner=None):
+    """
+    Tags every LLM call made inside the block with `priority` and `owner`,
+    so they can be ordered against other work and cancelled together.
+    """
+    priority_token = _request_priority.set(priority)
+    owner_token = _request_owner.set(owner)
+    try:
+        yield
+    finally:
+        _request_priority.reset(priority_token)
+        _request_owner.reset(owner_token)
+
+
+def iterate_in_llm_context(iterator, priority=PRIORITY_INTERACTIVE, owner=None):
+    """
+    Yields from `iterator` with every step running under the given priority and
+    owner. Use this for generators (e.g. streaming Gradio handlers) whose steps
+    may resume on different threads, where a `with llm_request_context()` block
+    can't span the yields.
+    """
+    context = contextvars.copy_context()
+    context.run(_request_priority.set, priority)
+    context.run(_request_owner.set, owner)
+    while True:
+        try:
+            item = context.run(next, iterator)
+        except StopIteration:
+            return
+        yield item
+
+
+def current_priority():
+    return _request_priority.get()
+
+
+def current_owner():
+    return _request_owner.get()
+
+
+class _Job:
+    def __init__(self, model, fn, priority, owner, future):
+        self.model = model
+        self.fn = fn
+        self.priority = priority
+        self.owner = owner
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class LLMScheduler:
+    """
+    Runs blocking LLM calls with at most N in flight per model. Waiting calls
+    are started in priority order (FIFO within a priority). The scheduler owns
+    an event loop on a background thread; `submit` can be awaited from any loop
+    and `run` blocks the calling thread.
+    """
+
+    def __init__(self, limits=None, default_limit=DEFAULT_MODEL_CONCURRENCY, worker_threads=LLM_WORKER_THREADS, scale=1):
+        self._limits = dict(MODEL_CONCURRENCY if limits is None else limits)
+        self._default_limit = default_limit
+        # Multiplier for every limit, e.g. the number of Ollama backends serving the models
+        self._scale = scale
+        self._queues = {}   # model -> heap of (priority, seq, job)
+        self._running = {}  # model -> calls in flight
+        self._jobs = set()  # queued and running jobs
+        self._seq = itertools.count()
+        self._wait_stats = {}  # priority -> {"count", "total", "max"}
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads * scale, thread_name_prefix="llm-call")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-scheduler", daemon=True)
+        self._thread.start()
+
+    def limit_for(self, model):
+        return self._limits.get(model, self._default_limit) * self._scale
+
+    async def _submit(self, model, fn, priority, owner):
+        future = self._loop.create_future()
+        job = _Job(model, fn, priority, owner, future)
+        self._jobs.add(job)
+        heapq.heappush(self._queues.setdefault(model, []), (priority, next(self._seq), job))
+        self._dispatch(model)
+        try:
+            return await future
+        finally:
+            # Cancelling the waiter cancels `future`; the dispatcher skips it if still queued
+            if not future.done():
+                future.cancel()
+
+    def _dispatch(self, model):
+        queue = self._queues.get(model, [])
+        while queue and self._running.get(model, 0) < self.limit_for(model):
+            _, _, job = heapq.heappop(queue)
+            if job.future.done():
+                self._jobs.discard(job)
+                continue
+
+            waited = time.perf_counter() - job.queued_at
+            stats = self._wait_stats.setdefault(job.priority, {"count": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += waited
+            stats["max"] = max(stats["max"], waited)
+
+            self._running[model] = self._running.get(model, 0) + 1
+            task = self._loop.run_in_executor(self._executor, job.fn)
+            task.add_done_callback(lambda t, job=job: self._finish(job, t))
+
+    def _finish(self, job, task):
+        self._running[job.model] -= 1
+        self._jobs.discard(job)
+        if not job.future.done():
+            if task.exception() is not None:
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result())
+        self._dispatch(job.model)
+
+    async def submit(self, model, fn, priority=PRIORITY_INTERACTIVE, owner=None):
+        """
+        Queues the blocking callable `fn` for `model` and returns its result.
+        Cancelling the awaiting task removes the call from the queue (a call
+        already sent to Ollama finishes in the background and is discarded).
+        """
+        coro = self._submit(model, fn, priority, owner)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def start(self, model, fn, priority=PRIORITY_INTERACTIVE, owner=None):
+        """
+        Queues `fn` without waiting and returns a concurrent.futures.Future
+        for its result (cancelled if the call is cancelled).
+        """
+        return asyncio.run_coroutine_threadsafe(self._submit(model, fn, priority, owner), self._loop)
+
+    def run(self, model, fn, priority=PRIORITY_INTERACTIVE, owner=None):
+        """
+        Blocking form of `submit` for worker threads (Gradio handlers).
+        Raises concurrent.futures.CancelledError if the call was cancelled.
+        """
+        return self.start(model, fn, priority, owner).result()
+
+    def free_slots(self, model):
+        """
+        Returns how many more calls `model` could start right now
+        (its limit minus the calls running and queued; may be negative).
+        """
+        async def count():
+            queued = sum(not job.future.done() for _, _, job in self._queues.get(model, []))
+            return self.limit_for(model) - self._running.get(model, 0) - queued
+
+        return asyncio.run_coroutine_threadsafe(count(), self._loop).result()
+
+    def cancel_owner(self, owner):
+        """
+        Cancels every queued or running call tagged with `owner`.
+        Returns the number of calls cancelled.
+        """
+        if owner is None:
+            return 0
+
+        def cancel():
+            cancelled = 0
+            for job in list(self._jobs):
+                if job.owner == owner and not job.future.done():
+                    job.future.cancel()
+                    cancelled += 1
+            return cancelled
+
+        async def run_cancel():
+            return cancel()
+
+        return asyncio.run_coroutine_threadsafe(run_cancel(), self._loop).result()
+
+    def stats(self):
+        """
+        Returns queue depth and in-flight calls per model, and queue wait
+        times (count, mean, max seconds) per priority.
+        """
+        async def snapshot():
+            return {
+                "queued": {model: sum(not job.future.done() for _, _, job in queue) for model, queue in self._queues.items()},
+                "running": dict(self._running),
+                "wait": {
+                    PRIORITY_NAMES.get(priority, str(priority)): {
+                        "count": stats["count"],
+                        "mean": stats["total"] / stats["count"] if stats["count"] else 0.0,
+                        "max": stats["max"],
+                    }
+                    for priority, stats in self._wait_stats.items()
+                },
+            }
+
+        return asyncio.run_coroutine_threadsafe(snapshot(), self._loop).result()
@@ -0,0 +1,200 @@
+# metrics.py — Prometheus-format metrics: counters, histograms and scrape-time gauges
+#
+# Modules record into the metrics defined here; `render()` produces the text
+# exposition format served at /metrics (see start_metrics_server, and the job API).
+#
+#   METRICS_PORT=9464 python app.py      then scrape http://host:9464/metrics
+
+import contextlib
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import LATENCY_BUCKETS, FAST_LATENCY_BUCKETS, RTF_BUCKETS, TOKEN_RATE_BUCKETS, METRICS_PORT
+
+_started = time.time()
+_lock = threading.Lock()
+_metrics = []     # every Counter/Histogram, in definition order
+_collectors = []  # functions returning gauge samples at scrape time
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = sorted(buckets) + [float("inf")]
+        self._values = {}  # key -> {"counts": per bucket, "sum", "count"}
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            series = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observes the seconds spent in the `with` block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}"
+
+
+def register_collector(fn):
+    """
+    Registers `fn()` to be called at scrape time. It returns a list of
+    (name, help, {labels: value}) gauges, where labels is a tuple of (name, value) pairs.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def process_rss_bytes():
+    """
+    Current resident set size, or the peak RSS where /proc isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if peak > 1 << 32 else peak * 1024
+
+
+@register_collector
+def _process_metrics():
+    return [
+        ("process_resident_memory_bytes", "Resident memory size in bytes", {(): process_rss_bytes()}),
+        ("process_uptime_seconds", "Seconds since the process started", {(): time.time() - _started}),
+    ]
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.extend(metric.lines())
+
+    for collector in list(_collectors):
+        try:
+            gauges = collector()
+        except Exception as e:
+            print(f"⚠️ Metrics collector {collector.__name__} failed: {e}")
+            continue
+        for name, help, samples in gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples.items():
+                names = tuple(n for n, _ in labels)
+                values = tuple(v for _, v in labels)
+                lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def metrics_port():
+    port = os.environ.get("METRICS_PORT") or METRICS_PORT
+    return int(port) if port else None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serves /metrics on a background thread and returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# --- Metrics recorded across the app ---
+ASR_SECONDS = Histogram("speech_tutor_asr_seconds", "Transcription latency in seconds")
+ASR_REAL_TIME_FACTOR = Histogram(
+    "speech_tutor_asr_real_time_factor", "Transcription time divided by audio duration", buckets=RTF_BUCKETS
+)
+LLM_SECONDS = Histogram("speech_tutor_llm_seconds", "Ollama request latency in seconds", ["model", "task"])
+LLM_TOKENS_PER_SECOND = Histogram(
+    "speech_tutor_llm_tokens_per_second", "Generated tokens per second of request time", ["model", "task"],
+    buckets=TOKEN_RATE_BUCKETS
+)
+LLM_TOKENS = Counter("speech_tutor_llm_tokens_total", "Tokens generated", ["model", "task"])
+LLM_ERRORS = Counter("speech_tutor_llm_errors_total", "Failed, skipped or cancelled Ollama requests", ["model", "task"])
+CACHE_REQUESTS = Counter("speech_tutor_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+HISTORY_SAVE_SECONDS = Histogram(
+    "speech_tutor_history_save_seconds", "Time to save a session to the user's history file", buckets=FAST_LATENCY_BUCKETS
+)
@@ -0,0 +1,133 @@
+# mock_ollama.py — Minimal stand-in for the Ollama HTTP API, for local testing without models
+#
+# Usage:
+#   python mock_ollama.py --port 11501 --models mistral:latest,phi4-mini:latest
+#   OLLAMA_BACKENDS=http://localhost:11501,http://localhost:11502 python app.py
+#
+# --latency is the delay before the first token; with --token-rate the response
+# is then generated at that many tokens (words) per second, --tokens long.
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_RESPONSE = "Question: What is one habit that helps you stay focused?\nIdeal Answer: A short, structured answer."
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    # Set per server in `start_mock_server`
+    models = ()
+    loaded = None
+    latency = 0.0
+    token_rate = 0.0  # tokens per second; 0 returns the whole response at once
+    tokens = 0        # response length in tokens; 0 uses MOCK_RESPONSE as is
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _response_words(self, request):
+        """
+        Returns (words, done_reason) for a request: MOCK_RESPONSE padded to
+        `tokens` words, cut at the request's num_predict.
+        """
+        words = MOCK_RESPONSE.split(" ")
+        if self.tokens > len(words):
+            words += ["detail"] * (self.tokens - len(words))
+        limit = (request.get("options") or {}).get("num_predict")
+        if limit and limit > 0 and len(words) > limit:
+            return words[:limit], "length"
+        return words, "stop"
+
+    def _token_delay(self):
+        return 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+
+    def _stream(self, model, words, done_reason, chat=False):
+        # One NDJSON line per word, then the final "done" line, like Ollama with stream=true
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for i, word in enumerate(words):
+            time.sleep(self._token_delay())
+            chunk = word if i == 0 else " " + word
+            body = {"message": {"role": "assistant", "content": chunk}} if chat else {"response": chunk}
+            self.wfile.write((json.dumps(dict(body, model=model, done=False)) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+        final.update(model=model, done=True, done_reason=done_reason, eval_count=len(words))
+        self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._reply(200, {"models": [{"name": m} for m in self.models]})
+        elif self.path == "/api/ps":
+            self._reply(200, {"models": [{"name": m, "size_vram": 0, "expires_at": ""} for m in sorted(self.loaded)]})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", "")
+        if model not in self.models:
+            self._reply(404, {"error": f"model '{model}' not found"})
+            return
+
+        self.loaded.add(model)
+        time.sleep(self.latency)
+
+        # An empty prompt only loads the model (warm-up)
+        words, done_reason = self._response_words(request) if request.get("prompt") or request.get("messages") else ([], "load")
+        if request.get("stream") and self.path in ("/api/generate", "/api/chat"):
+            self._stream(model, words, done_reason, chat=self.path == "/api/chat")
+            return
+
+        time.sleep(self._token_delay() * len(words))
+        text = " ".join(words)
+        if self.path == "/api/generate":
+            self._reply(200, {"model": model, "response": text, "done": True, "done_reason": done_reason, "eval_count": len(words)})
+        elif self.path == "/api/chat":
+            self._reply(200, {"model": model, "message": {"role": "assistant", "content": text},
+                              "done": True, "done_reason": done_reason, "eval_count": len(words)})
+        else:
+            self._reply(404, {"error": "not found"})
+
+
+def start_mock_server(port=0, models=("mistral:latest",), latency=0.0, token_rate=0.0, tokens=0):
+    """
+    Starts a mock Ollama server on a background thread and returns it.
+    Its base URL is f"http://127.0.0.1:{server.server_address[1]}"; stop it with server.shutdown().
+    """
+    handler = type("Handler", (MockOllamaHandler,), {
+        "models": tuple(models), "loaded": set(), "latency": latency, "token_rate": token_rate, "tokens": tokens,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, name=f"mock-ollama-{port}", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="mistral:latest", help="Comma-separated model names to serve")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Tokens generated per second (0: instant)")
+    parser.add_argument("--tokens", type=int, default=0, help="Response length in tokens (0: the built-in response)")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.port, args.models.split(","), args.latency, args.token_rate, args.tokens)
+    print(f"🧪 Mock Ollama listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
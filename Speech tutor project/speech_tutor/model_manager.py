@@ -0,0 +1,92 @@
+# model_manager.py — Ollama model lifecycle: warm-up at startup and residency reporting
+
+import threading
+import requests
+
+from llm_engine import OLLAMA_BACKENDS, keep_alive_for, generation_options
+from constants import PRELOAD_MODELS, DEFAULT_MODEL, PIN_DEFAULT_MODEL
+
+
+def preload_model(model, host):
+    """
+    Loads `model` into the Ollama server at `host` without generating anything.
+    An empty prompt makes Ollama load the weights and apply the keep_alive.
+    The context size matches the generation profiles so the first real
+    request doesn't trigger a reload.
+    """
+    try:
+        response = requests.post(
+            f"{host}/api/generate",
+            json={
+                "model": model,
+                "prompt": "",
+                "stream": False,
+                "keep_alive": keep_alive_for(model),
+                "options": {"num_ctx": generation_options(None)["num_ctx"]},
+            },
+            timeout=600
+        )
+        response.raise_for_status()
+        print(f"🔥 Preloaded model: {model} on {host}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not preload {model} on {host}: {e}")
+        return False
+
+
+def warm_up_models(models=None):
+    """
+    Preloads the configured models (PRELOAD_MODELS, plus the pinned default model)
+    on every Ollama backend. Returns a dict of model -> whether it loaded everywhere.
+    """
+    models = list(PRELOAD_MODELS if models is None else models)
+    if PIN_DEFAULT_MODEL and DEFAULT_MODEL not in models:
+        models.insert(0, DEFAULT_MODEL)
+
+    results = {model: all([preload_model(model, host) for host in OLLAMA_BACKENDS]) for model in models}
+    report_resident_models()
+    return results
+
+
+def start_warm_up(models=None):
+    """
+    Runs `warm_up_models` in a background thread so the UI can start serving immediately.
+    """
+    thread = threading.Thread(target=warm_up_models, args=(models,), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def resident_models(host):
+    """
+    Returns the models the Ollama server at `host` currently holds in memory as a
+    list of dicts with `name`, `size_vram` and `expires_at` (empty if unreachable).
+    """
+    try:
+        response = requests.get(f"{host}/api/ps", timeout=5)
+        response.raise_for_status()
+        return [
+            {
+                "name": m.get("name") or m.get("model"),
+                "size_vram": m.get("size_vram", 0),
+                "expires_at": m.get("expires_at", ""),
+            }
+            for m in response.json().get("models", [])
+        ]
+    except Exception as e:
+        print(f"⚠️ Could not query resident models on {host}: {e}")
+        return []
+
+
+def report_resident_models():
+    """
+    Prints and returns the resident models of every backend as {host: [models]}.
+    """
+    report = {}
+    for host in OLLAMA_BACKENDS:
+        models = report[host] = resident_models(host)
+        if not models:
+            print(f"📦 No models resident on {host}")
+        for m in models:
+            print(f"📦 Resident on {host}: {m['name']} — VRAM {m['size_vram'] / 1e9:.1f} GB — expires {m['expires_at']}")
+    return report
@@ -0,0 +1,105 @@
+# model_router.py — Picks a model per LLM task from its tier and observed latency
+
+import threading
+
+from constants import ADAPTIVE_ROUTING, MODEL_TIERS, TASK_ROUTES
+
+TIER_ORDER = ["small", "medium", "large"]
+
+# Weight of the newest observation in the moving average
+LATENCY_SMOOTHING = 0.3
+# Seconds a failed call counts as, so a failing model falls out of every budget
+FAILURE_PENALTY_SECONDS = 600.0
+
+_latency = {}  # (task, model) -> exponentially weighted average latency in seconds
+_lock = threading.Lock()
+
+
+def model_tier(model):
+    for tier, models in MODEL_TIERS.items():
+        if model in models:
+            return tier
+    return None
+
+
+def record_latency(task, model, seconds):
+    """
+    Folds one observed call duration into the moving average for (task, model).
+    """
+    if not task:
+        return
+    with _lock:
+        previous = _latency.get((task, model))
+        if previous is None:
+            _latency[(task, model)] = seconds
+        else:
+            _latency[(task, model)] = LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous
+
+
+def record_failure(task, model):
+    """
+    Counts a failed call (unreachable, model not pulled, unparseable reply)
+    as a call that took FAILURE_PENALTY_SECONDS.
+    """
+    record_latency(task, model, FAILURE_PENALTY_SECONDS)
+
+
+def observed_latency(task, model):
+    with _lock:
+        return _latency.get((task, model))
+
+
+def _is_available(model, available):
+    # Ollama lists untagged pulls as "<name>:latest"
+    return not available or model in available or f"{model}:latest" in available
+
+
+def route_model(task, requested_model, available=None):
+    """
+    Returns the model to use for `task`.
+
+    The selected model is kept when it is no larger than the task needs and has
+    stayed within the task's latency budget. Otherwise the first model in tier
+    order (largest allowed tier first) that is within the budget or not tried yet
+    is used. `available` is the set of models the Ollama backends have pulled;
+    other models are never routed to (an empty set means not known yet).
+    """
+    if not ADAPTIVE_ROUTING or task not in TASK_ROUTES:
+        return requested_model
+
+    max_tier, budget = TASK_ROUTES[task]
+    allowed = TIER_ORDER[:TIER_ORDER.index(max_tier) + 1]
+
+    requested_tier = model_tier(requested_model)
+    if requested_tier is None:
+        # Not a model we know how to size — respect the user's choice
+        return requested_model
+
+    requested_latency = observed_latency(task, requested_model)
+    if requested_tier in allowed and (requested_latency is None or requested_latency <= budget):
+        return requested_model
+
+    # Candidates: no larger than the selected model, the largest tier first so
+    # quality only drops as far as needed
+    ceiling = min(TIER_ORDER.index(requested_tier), TIER_ORDER.index(max_tier))
+    candidates = [
+        m for tier in reversed(TIER_ORDER[:ceiling + 1]) for m in MODEL_TIERS[tier] if _is_available(m, available)
+    ]
+    if not candidates:
+        return requested_model
+    observed = [(observed_latency(task, m), m) for m in candidates]
+
+    for latency, m in observed:
+        if latency is None or latency <= budget:
+            return m
+
+    # Everything is over budget — take the fastest we've seen
+    return min(observed)[1]
+
+
+def routing_report():
+    """
+    Returns the observed latency table as a list of (task, model, seconds) rows.
+    """
+    with _lock:
+        return sorted((task, model, round(seconds, 2)) for (task, model), seconds in _latency.items())
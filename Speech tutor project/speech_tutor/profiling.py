@@ -0,0 +1,237 @@
+# profiling.py — Opt-in per-request profiling with pstats and flamegraph-ready output
+#
+# A profiled request writes two files to PROFILE_DIR:
+#   <time>-<name>-<id>.pstats     cProfile data of every thread that worked on the
+#                                 request (python -m pstats, snakeviz)
+#   <time>-<name>-<id>.collapsed  sampled stacks, one "frame;frame;frame count" line
+#                                 per stack (flamegraph.pl, speedscope)
+#
+# Enable with SPEECH_TUTOR_PROFILE=1 (or a fraction like 0.05), or per request with ?profile=1.
+
+import contextlib
+import contextvars
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from constants import (
+    PROFILE_ENV_VAR,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_MAX_FILES,
+    PROFILE_MAX_BYTES,
+)
+
+# Session of the request being profiled in the current context, if any
+_current_session = contextvars.ContextVar("profile_session", default=None)
+
+
+def profiling_rate():
+    """
+    Share of requests to profile according to the environment (0.0–1.0).
+    """
+    value = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return 0.0
+    if value in ("true", "yes", "on", "all"):
+        return 1.0
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+def profile_requested(request=None):
+    """
+    True when this request should be profiled: `?profile=1` on the page URL
+    (a gr.Request), or the environment's profiling rate.
+    """
+    params = getattr(request, "query_params", None) or {}
+    if str(params.get("profile", "")).lower() in ("1", "true", "yes"):
+        return True
+    rate = profiling_rate()
+    return rate > 0 and random.random() < rate
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class ProfileSession:
+    """
+    Profiles one request across the threads that work on it. Each thread runs
+    its part under `section()`, which records it with cProfile; a sampler thread
+    meanwhile collects the stacks of those threads for the collapsed output.
+    """
+
+    def __init__(self, name, directory=PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL):
+        self.name = name
+        self.id = uuid.uuid4().hex[:8]
+        self.directory = Path(directory)
+        self.interval = interval
+        self.started = time.time()
+        self.profiles = []
+        self.samples = Counter()
+        self._threads = {}  # thread ident -> nesting depth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    @contextlib.contextmanager
+    def section(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0)
+            self._threads[ident] = depth + 1
+        if depth:
+            # Already profiling this thread further up the stack
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._threads[ident] -= 1
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler at a time; the sampler still covers this thread
+            profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                del self._threads[ident]
+                if profile is not None:
+                    self.profiles.append(profile)
+
+    def _sample_loop(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    names[ident] = thread.name if thread else str(ident)
+                stack.append(names[ident])
+                self.samples[";".join(reversed(stack))] += 1
+
+    def finish(self):
+        """
+        Stops sampling and writes the .pstats and .collapsed files.
+        Returns the path prefix of the written files.
+        """
+        self._stop.set()
+        self._sampler.join()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        prefix = self.directory / f"{stamp}-{self.name}-{self.id}"
+
+        with self._lock:
+            profiles = list(self.profiles)
+        if profiles:
+            pstats.Stats(*profiles).dump_stats(f"{prefix}.pstats")
+        with open(f"{prefix}.collapsed", "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+        print(f"🔬 Profile of {self.name} ({time.time() - self.started:.2f}s) saved to {prefix}.*")
+        enforce_retention(self.directory)
+        return prefix
+
+
+def enforce_retention(directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES, max_bytes=PROFILE_MAX_BYTES):
+    """
+    Deletes the oldest profile files beyond `max_files` or `max_bytes` in total.
+    """
+    files = sorted(
+        (p for p in Path(directory).glob("*") if p.suffix in (".pstats", ".collapsed")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    total = 0
+    for i, path in enumerate(files):
+        total += path.stat().st_size
+        if i >= max_files or total > max_bytes:
+            path.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def profile_section():
+    """
+    Profiles the block as part of the current request's profile, if it has one.
+    Use this in worker threads that run work for a request (the context must be
+    copied into the thread, e.g. with contextvars.copy_context().run).
+    """
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+    with session.section():
+        yield
+
+
+def profiled_call(name, fn, *args, enabled=False, **kwargs):
+    """
+    Calls `fn(*args, **kwargs)`, profiling it as request `name` when `enabled`.
+    """
+    if not enabled:
+        return fn(*args, **kwargs)
+
+    session = ProfileSession(name)
+    token = _current_session.set(session)
+    try:
+        with session.section():
+            return fn(*args, **kwargs)
+    finally:
+        _current_session.reset(token)
+        session.finish()
+
+
+def profiled_iter(name, iterator, enabled=False):
+    """
+    Yields from `iterator`, profiling every step as request `name` when
+    `enabled`. Steps may run on different threads (streaming Gradio handlers).
+    """
+    if not enabled:
+        yield from iterator
+        return
+
+    session = ProfileSession(name)
+    context = contextvars.copy_context()
+    context.run(_current_session.set, session)
+
+    def step():
+        with session.section():
+            return next(iterator)
+
+    try:
+        while True:
+            try:
+                item = context.run(step)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        session.finish()
@@ -0,0 +1,125 @@
+# prompt_registry.py — Loads prompt templates once and hot-reloads them when edited
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+from string import Template
+
+from constants import PROMPT_PLACEHOLDERS, PROMPT_RELOAD_INTERVAL
+
+PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+
+_templates = {}  # name -> {"template", "mtime", "source"}
+_rejected = {}  # name -> mtime of an invalid edit, reported once
+_version = ""
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def template_placeholders(template):
+    """
+    Returns the set of placeholder names used in a string.Template.
+    """
+    names = set()
+    for match in template.pattern.finditer(template.template):
+        name = match.group("named") or match.group("braced")
+        if name:
+            names.add(name)
+    return names
+
+
+def _compile(name, path):
+    source = path.read_text(encoding="utf-8")
+    template = Template(source)
+
+    expected = PROMPT_PLACEHOLDERS.get(name)
+    if expected is not None:
+        found = template_placeholders(template)
+        if found != expected:
+            missing = ", ".join(sorted(expected - found)) or "none"
+            unknown = ", ".join(sorted(found - expected)) or "none"
+            raise ValueError(f"Prompt '{name}' placeholders don't match (missing: {missing}; unknown: {unknown})")
+
+    return {"template": template, "mtime": path.stat().st_mtime, "source": source}
+
+
+def _compute_version():
+    digest = hashlib.sha256()
+    for name in sorted(_templates):
+        digest.update(name.encode("utf-8"))
+        digest.update(_templates[name]["source"].encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def load_prompts():
+    """
+    Loads and validates every template in prompts/. Raises if a template listed
+    in PROMPT_PLACEHOLDERS is missing or invalid, so bad prompts fail at startup.
+    """
+    global _version, _last_check
+    with _lock:
+        loaded = {path.stem: _compile(path.stem, path) for path in sorted(PROMPT_DIR.glob("*.txt"))}
+        missing = set(PROMPT_PLACEHOLDERS) - set(loaded)
+        if missing:
+            raise FileNotFoundError(f"Missing prompt templates: {', '.join(sorted(missing))}")
+        _templates.clear()
+        _templates.update(loaded)
+        _version = _compute_version()
+        _last_check = time.monotonic()
+    return _version
+
+
+def _reload_changed():
+    """
+    Recompiles templates whose file mtime changed. An invalid edit is reported
+    and the previous version stays in use.
+    """
+    global _version, _last_check
+    with _lock:
+        now = time.monotonic()
+        if now - _last_check < PROMPT_RELOAD_INTERVAL:
+            return
+        _last_check = now
+
+        changed = False
+        for path in PROMPT_DIR.glob("*.txt"):
+            name = path.stem
+            try:
+                mtime = path.stat().st_mtime
+                if name in _templates and _templates[name]["mtime"] == mtime or _rejected.get(name) == mtime:
+                    continue
+                _templates[name] = _compile(name, path)
+                _rejected.pop(name, None)
+                changed = True
+                print(f"🔄 Reloaded prompt: {name}")
+            except (OSError, ValueError) as e:
+                if isinstance(e, ValueError):
+                    _rejected[name] = mtime
+                print(f"⚠️ Keeping previous version of prompt '{name}': {e}")
+
+        if changed:
+            _version = _compute_version()
+
+
+def get_template(name):
+    _reload_changed()
+    return _templates[name]["template"]
+
+
+def render(name, **values):
+    """
+    Fills in the template `name` (file stem in prompts/) with `values`.
+    """
+    return get_template(name).substitute(**values)
+
+
+def prompt_version():
+    """
+    Returns a short hash of all current templates, for use in cache keys.
+    """
+    _reload_changed()
+    return _version
+
+
+load_prompts()
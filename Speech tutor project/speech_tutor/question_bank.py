@@ -0,0 +1,220 @@
+# question_bank.py — Persistent bank of generated questions with near-duplicate detection
+#
+# Every generated question/ideal-answer pair is kept per (topic, difficulty) slot.
+# Users are served questions they haven't seen straight from the bank; the LLM
+# only runs in the background when a slot runs low for that user.
+
+import atexit
+import datetime
+import hashlib
+import json
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from relevance import content_words
+from llm_scheduler import llm_request_context, PRIORITY_PREFETCH
+from constants import (
+    QUESTION_BANK_FILE,
+    QUESTION_DUPLICATE_THRESHOLD,
+    QUESTION_BANK_LOW_WATERMARK,
+    QUESTION_BANK_REFILL_BATCH,
+    QUESTION_BANK_SAVE_DELAY,
+    QUESTION_BANK_SERVED_PER_USER,
+    QUESTION_BANK_SERVED_USERS,
+)
+
+# Dimension of the hashed bag-of-words vectors used for similarity
+VECTOR_SIZE = 1024
+
+
+def slot_key(topic, difficulty):
+    return f"{' '.join((topic or '').lower().split())}|{(difficulty or '').lower()}"
+
+
+def question_vector(text):
+    """
+    Returns the L2-normalized hashed bag-of-words vector of a question's content words.
+    """
+    vector = np.zeros(VECTOR_SIZE)
+    for word in content_words(text):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % VECTOR_SIZE] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QuestionBank:
+    """
+    Question/ideal-answer pairs by slot, persisted as JSON, with a per-slot
+    similarity index (a matrix of question vectors) to reject near-duplicates.
+    Changes are written at most every `save_delay` seconds (and at exit).
+    """
+
+    def __init__(self, path=QUESTION_BANK_FILE, save_delay=QUESTION_BANK_SAVE_DELAY):
+        self.path = Path(path)
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._refilling = set()
+        self._questions = {}  # slot -> [entry]
+        self._served = {}     # user_id -> [question id], least recently served user first
+        self._index = {}      # slot -> matrix of question vectors
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        for entry in data.get("questions", []):
+            self._questions.setdefault(slot_key(entry["topic"], entry["difficulty"]), []).append(entry)
+        self._served = data.get("served", {})
+        for slot, entries in self._questions.items():
+            self._index[slot] = np.vstack([question_vector(e["question"]) for e in entries])
+
+    def _save(self):
+        """
+        Schedules a write of the bank (call with the lock held).
+        """
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """
+        Writes pending changes to disk now.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is None:
+                    return
+                self._save_timer.cancel()
+                self._save_timer = None
+                # Entries are never modified once added, so a shallow copy is a consistent snapshot
+                data = {
+                    "questions": [e for entries in self._questions.values() for e in entries],
+                    "served": {user_id: list(ids) for user_id, ids in self._served.items()},
+                }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            tmp.replace(self.path)
+
+    def _mark_served(self, user_id, question_id):
+        """
+        Records a served question (call with the lock held). Only the latest
+        QUESTION_BANK_SERVED_PER_USER per user, for the QUESTION_BANK_SERVED_USERS
+        most recent users, are kept; questions the user answered are also
+        excluded through their history.
+        """
+        served = self._served.pop(user_id, [])
+        served.append(question_id)
+        self._served[user_id] = served[-QUESTION_BANK_SERVED_PER_USER:]
+        while len(self._served) > QUESTION_BANK_SERVED_USERS:
+            del self._served[next(iter(self._served))]
+        self._save()
+
+    def is_duplicate(self, topic, difficulty, question):
+        slot = slot_key(topic, difficulty)
+        with self._lock:
+            index = self._index.get(slot)
+            if index is None:
+                return False
+            return bool((index @ question_vector(question)).max() >= QUESTION_DUPLICATE_THRESHOLD)
+
+    def add(self, topic, difficulty, question, ideal_answer, model=None, served_to=None):
+        """
+        Stores a generated pair, recording it as served to `served_to` if given.
+        Returns the new entry, or None if it's a near-duplicate of a question
+        already in the slot (which then counts as served instead).
+        """
+        slot = slot_key(topic, difficulty)
+        vector = question_vector(question)
+        with self._lock:
+            index = self._index.get(slot)
+            if index is not None:
+                similarities = index @ vector
+                closest = int(similarities.argmax())
+                if similarities[closest] >= QUESTION_DUPLICATE_THRESHOLD:
+                    if served_to:
+                        self._mark_served(served_to, self._questions[slot][closest]["id"])
+                    return None
+
+            entry = {
+                "id": uuid.uuid4().hex[:12],
+                "topic": topic,
+                "difficulty": difficulty,
+                "question": question,
+                "ideal_answer": ideal_answer,
+                "model": model,
+                "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._questions.setdefault(slot, []).append(entry)
+            self._index[slot] = vector[None, :] if index is None else np.vstack([index, vector])
+            if served_to:
+                self._mark_served(served_to, entry["id"])
+            self._save()
+            return entry
+
+    def _unseen(self, slot, user_id, seen_questions):
+        served = set(self._served.get(user_id, [])) if user_id else set()
+        seen_questions = set(seen_questions or [])
+        return [e for e in self._questions.get(slot, []) if e["id"] not in served and e["question"] not in seen_questions]
+
+    def unseen_count(self, topic, difficulty, user_id=None, seen_questions=None):
+        with self._lock:
+            return len(self._unseen(slot_key(topic, difficulty), user_id, seen_questions))
+
+    def serve(self, topic, difficulty, user_id=None, seen_questions=None):
+        """
+        Returns the oldest question in the slot the user hasn't been served or
+        answered, and records it as served. None if there is none.
+        """
+        with self._lock:
+            unseen = self._unseen(slot_key(topic, difficulty), user_id, seen_questions)
+            if not unseen:
+                return None
+            entry = unseen[0]
+            if user_id:
+                self._mark_served(user_id, entry["id"])
+            return entry
+
+    def ensure_stock(self, topic, difficulty, generate_fn, user_id=None, seen_questions=None):
+        """
+        Starts a background refill of the slot when the user has fewer than
+        QUESTION_BANK_LOW_WATERMARK unseen questions left. `generate_fn()` returns
+        (question, ideal_answer, model) or None; it runs at prefetch priority, so call
+        this after any foreground generation for the user has returned.
+        """
+        slot = slot_key(topic, difficulty)
+        with self._lock:
+            if slot in self._refilling or len(self._unseen(slot, user_id, seen_questions)) >= QUESTION_BANK_LOW_WATERMARK:
+                return False
+            self._refilling.add(slot)
+
+        def refill():
+            try:
+                with llm_request_context(priority=PRIORITY_PREFETCH):
+                    for _ in range(QUESTION_BANK_REFILL_BATCH):
+                        generated = generate_fn()
+                        if generated:
+                            question, ideal_answer, model = generated
+                            self.add(topic, difficulty, question, ideal_answer, model=model)
+            except Exception as e:
+                print(f"⚠️ Question bank refill failed for {slot}: {e}")
+            finally:
+                with self._lock:
+                    self._refilling.discard(slot)
+
+        threading.Thread(target=refill, name=f"question-refill-{slot}", daemon=True).start()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {slot: len(entries) for slot, entries in self._questions.items()}
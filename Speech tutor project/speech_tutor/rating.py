@@ -1,60 +1,239 @@
 # rating.py — Defines the algorithm for calculating a 1.0–5.0 star rating
+#
+# Ratings are computed from numeric features (answer length, pronunciation,
+# fluency, the LLM's structured scores and similarity to the ideal answer), so
+# one session or a whole history corpus can be scored with the same vectorized code.
+#
+# Re-score every saved session after a scoring change:
+#   python rating.py --rescore            (report only)
+#   python rating.py --rescore --write    (update the stored ratings)
+#
+# Sessions saved before the scored features existed (no Score lines, fluency or
+# ideal answer) keep their original rating.
 
-def calculate_rating(transcript, grammar, feedback, comparison):
+import argparse
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+from relevance import tfidf_similarity, has_usable_ideal_answer
+
+FEATURE_NAMES = [
+    "word_count",
+    "flagged_ratio",
+    "speaking_rate_wpm",
+    "longest_pause",
+    "filler_rate",
+    "grammar_score",
+    "pronunciation_score",
+    "content_score",
+    "similarity",
+]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# Weight of each LLM score's distance from the neutral 3/5
+LLM_SCORE_WEIGHTS = {"grammar_score": 0.35, "pronunciation_score": 0.25, "content_score": 0.5}
+
+_SCORE_PATTERN = re.compile(r"score\s*[:=]\s*\**\s*(\d(?:\.\d+)?)\s*(?:/\s*5|out of 5)", re.IGNORECASE)
+
+
+def parse_llm_score(text):
+    """
+    Returns the "Score: N/5" value the evaluation prompts ask for, or NaN when
+    the section is pending (None) or has no score line.
+    """
+    if not text:
+        return np.nan
+    matches = _SCORE_PATTERN.findall(text)
+    if not matches:
+        return np.nan
+    return float(np.clip(float(matches[-1]), 1.0, 5.0))
+
+
+def is_failed_transcript(transcript):
+    """
+    True for a missing transcript or an error message in its place ("❌ No speech detected").
+    """
+    return not transcript or transcript.startswith("❌")
+
+
+def extract_features(transcript, grammar=None, feedback=None, comparison=None, fluency=None,
+                     flagged_words=None, ideal_answer=None):
+    """
+    Returns the feature vector (see FEATURE_NAMES) for one answer.
+    Unknown features are NaN and don't move the score.
     """
-    Simple scoring logic to evaluate user's spoken answer based on:
+    features = np.full(len(FEATURE_NAMES), np.nan)
+    word_count = 0 if is_failed_transcript(transcript) else len(transcript.split())
+    features[FEATURE_INDEX["word_count"]] = word_count
+
+    if flagged_words is not None and word_count:
+        features[FEATURE_INDEX["flagged_ratio"]] = len(flagged_words) / word_count
+    elif fluency and fluency.get("word_count"):
+        features[FEATURE_INDEX["flagged_ratio"]] = fluency["low_confidence_ratio"]
+
+    if fluency and fluency.get("word_count"):
+        features[FEATURE_INDEX["speaking_rate_wpm"]] = fluency["speaking_rate_wpm"]
+        features[FEATURE_INDEX["longest_pause"]] = fluency["longest_pause"]
+        features[FEATURE_INDEX["filler_rate"]] = fluency["filler_rate"]
+
+    features[FEATURE_INDEX["grammar_score"]] = parse_llm_score(grammar)
+    features[FEATURE_INDEX["pronunciation_score"]] = parse_llm_score(feedback)
+    features[FEATURE_INDEX["content_score"]] = parse_llm_score(comparison)
+
+    if has_usable_ideal_answer(ideal_answer):
+        features[FEATURE_INDEX["similarity"]] = tfidf_similarity(transcript, ideal_answer)
+
+    return features
+
+
+def score_features(features):
+    """
+    Scores a (n_answers, n_features) matrix in one vectorized pass.
+    Returns an array of ratings in 1.0–5.0 (0.0 for empty answers).
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=float))
+    column = lambda name: features[:, FEATURE_INDEX[name]]
+    known = lambda values: ~np.isnan(values)
+
+    score = np.full(features.shape[0], 3.0)
+
+    # Word count bonus
+    word_count = column("word_count")
+    score += np.select([word_count > 50, word_count > 30, word_count > 15], [0.5, 0.3, 0.1], 0.0)
+
+    # Share of words below the clarity threshold
+    flagged_ratio = column("flagged_ratio")
+    score -= np.where(known(flagged_ratio), np.clip(flagged_ratio - 0.1, 0.0, 0.5) * 1.5, 0.0)
+
+    # Fluency from word timings
+    rate = column("speaking_rate_wpm")
+    score += np.where(known(rate) & (rate >= 110) & (rate <= 170), 0.2, 0.0)
+    score -= np.where(known(rate) & ((rate < 80) | (rate > 200)), 0.2, 0.0)
+    score -= np.where(column("longest_pause") > 3.0, 0.2, 0.0)
+    score -= np.where(column("filler_rate") > 5.0, 0.2, 0.0)
+
+    # Structured LLM scores, centred on 3/5
+    for name, weight in LLM_SCORE_WEIGHTS.items():
+        llm_score = column(name)
+        score += np.where(known(llm_score), (llm_score - 3.0) * weight, 0.0)
+
+    # TF-IDF similarity to the ideal answer (see relevance.py)
+    similarity = column("similarity")
+    score += np.where(known(similarity), np.clip(similarity - 0.3, -0.3, 0.5), 0.0)
+
+    # Bound and return
+    score = np.round(np.clip(score, 1.0, 5.0), 1)
+    return np.where(word_count > 0, score, 0.0)
+
+
+def calculate_rating(transcript, grammar, feedback, comparison, fluency=None, flagged_words=None, ideal_answer=None):
+    """
+    Rates one spoken answer from:
     - Transcript length
-    - Grammar correctness
-    - Pronunciation quality
-    - Relevance to ideal answer
+    - Share of unclear words and fluency metrics (see fluency.analyze_fluency), when given
+    - The "Score: N/5" lines of the grammar, pronunciation and content feedback
+    - Lexical similarity to the ideal answer, when given
+
+    Sections that are still pending (None) leave the score unchanged. An empty
+    transcript or an error in its place rates 0.0.
     """
-    if not transcript:
+    if is_failed_transcript(transcript):
         return 0.0
+    features = extract_features(transcript, grammar, feedback, comparison, fluency, flagged_words, ideal_answer)
+    return float(score_features(features)[0])
 
-    score = 3.0
 
-    # Word count bonus
-    word_count = len(transcript.split())
-    if word_count > 50:
-        score += 0.5
-    elif word_count > 30:
-        score += 0.3
-    elif word_count > 15:
-        score += 0.1
-
-    # Grammar check
-    grammar_l = grammar.lower()
-    if "no grammar issues" in grammar_l or "excellent grammar" in grammar_l:
-        score += 0.7
-    elif "minor grammar issues" in grammar_l:
-        score += 0.3
-    elif "several grammar issues" in grammar_l:
-        score -= 0.3
-    else:
-        score -= 0.5
-
-    # Pronunciation feedback
-    feedback_l = feedback.lower()
-    if "excellent pronunciation" in feedback_l or "no pronunciation issues" in feedback_l:
-        score += 0.5
-    elif "minor pronunciation issues" in feedback_l:
-        score += 0.2
-    elif "several pronunciation issues" in feedback_l:
-        score -= 0.2
+def session_features(session):
+    """
+    Returns the feature vector for a session record as saved by app.save_history.
+    """
+    return extract_features(
+        session.get("transcript", ""),
+        session.get("grammar_feedback"),
+        session.get("pronunciation_feedback"),
+        session.get("comparison_feedback"),
+        fluency=session.get("fluency"),
+        ideal_answer=session.get("ideal_answer"),
+    )
+
+
+def rate_batch(sessions):
+    """
+    Rates a list of session records in one vectorized pass.
+    """
+    if not sessions:
+        return np.zeros(0)
+    return score_features(np.vstack([session_features(s) for s in sessions]))
+
+
+def has_scored_features(features):
+    """
+    True when a session has more to score than its length: Score lines,
+    fluency metrics or an ideal answer. Older sessions have only the transcript.
+    """
+    features = np.atleast_2d(features)
+    return ~np.isnan(features[:, 1:]).all(axis=1)
+
+
+def rescore_history(history_dir="user_history", write=False):
+    """
+    Re-rates every session in `history_dir` that has the scored features (see
+    `has_scored_features`); the others keep their rating. With `write`, changed
+    ratings are saved back to the history files, each with its `previous_rating`.
+    Returns a summary dict.
+    """
+    files = sorted(Path(history_dir).glob("*.json"))
+    histories = []
+    for path in files:
+        with open(path, "r") as f:
+            histories.append(json.load(f))
+
+    sessions = [s for history in histories for s in history.get("sessions", [])]
+    old = np.array([float(s.get("rating") or 0.0) for s in sessions])
+    if sessions:
+        features = np.vstack([session_features(s) for s in sessions])
+        rescorable = has_scored_features(features)
+        new = np.where(rescorable, score_features(features), old)
     else:
-        score -= 0.4
-
-    # Comparison to ideal answer
-    comparison_l = comparison.lower()
-    if "excellent response" in comparison_l or "outstanding answer" in comparison_l:
-        score += 1.0
-    elif "good response" in comparison_l or "solid answer" in comparison_l:
-        score += 0.5
-    elif "adequate response" in comparison_l:
-        score += 0.2
-    elif "poor response" in comparison_l:
-        score -= 0.5
+        rescorable = np.zeros(0, dtype=bool)
+        new = old
+    changed = old != new
 
-    # Bound and return
-    score = max(1.0, min(5.0, score))
-    return round(score, 1)
+    if write and changed.any():
+        updates = iter(zip(new.tolist(), changed.tolist()))
+        for path, history in zip(files, histories):
+            for session in history.get("sessions", []):
+                rating, session_changed = next(updates)
+                if session_changed:
+                    session.setdefault("previous_rating", session.get("rating"))
+                    session["rating"] = rating
+            with open(path, "w") as f:
+                json.dump(history, f, indent=2)
+
+    return {
+        "files": len(files),
+        "sessions": len(sessions),
+        "skipped": int((~rescorable).sum()),
+        "changed": int(changed.sum()),
+        "mean_old": round(float(old.mean()), 2) if sessions else 0.0,
+        "mean_new": round(float(new.mean()), 2) if sessions else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score saved practice sessions")
+    parser.add_argument("--rescore", action="store_true", help="Re-rate every session in the history directory")
+    parser.add_argument("--history-dir", default="user_history")
+    parser.add_argument("--write", action="store_true", help="Save the new ratings back to the history files")
+    args = parser.parse_args()
+
+    if args.rescore:
+        summary = rescore_history(args.history_dir, write=args.write)
+        print(f"⭐ Re-scored {summary['sessions']} sessions in {summary['files']} files — "
+              f"{summary['changed']} changed, {summary['skipped']} without scored features kept, "
+              f"mean {summary['mean_old']} → {summary['mean_new']}")
+    else:
+        parser.print_help()
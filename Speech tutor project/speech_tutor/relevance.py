@@ -0,0 +1,139 @@
+# relevance.py — Cheap local answer-relevance scoring (TF-IDF cosine with NumPy)
+#
+# Runs before the LLM content evaluation so clear-cut answers (empty or
+# off-topic) don't need an LLM call at all.
+
+import re
+
+import numpy as np
+
+from constants import (
+    CUSTOM_QUESTION_IDEAL_ANSWER,
+    RELEVANCE_MIN_WORDS,
+    RELEVANCE_MIN_IDEAL_WORDS,
+    RELEVANCE_OFF_TOPIC,
+    RELEVANCE_WEAK,
+    RELEVANCE_NEAR_IDENTICAL,
+)
+
+_WORD_PATTERN = re.compile(r"[a-z']+")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an the and or but if of to in on at for with by from as is are was were be been being "
+    "it its this that these those i you he she we they me my your our their them his her "
+    "do does did have has had not no so than then there here what which who how why when "
+    "can could would should will just also very about into more most some such um uh like".split()
+)
+
+
+def content_words(text):
+    return [w for w in _WORD_PATTERN.findall((text or "").lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def _sentences(text):
+    return [s for s in _SENTENCE_PATTERN.split(text or "") if s.strip()]
+
+
+def tfidf_similarity(text, reference):
+    """
+    Cosine similarity (0–1) between `text` and `reference` using sublinear TF-IDF.
+    The IDF comes from the sentences of both texts, so words repeated in every
+    sentence count for less than the distinctive ones. NaN if either is empty.
+    """
+    words_a, words_b = content_words(text), content_words(reference)
+    if not words_a or not words_b:
+        return np.nan
+
+    vocabulary = {w: i for i, w in enumerate(sorted(set(words_a) | set(words_b)))}
+
+    def counts(words):
+        vector = np.zeros(len(vocabulary))
+        if words:
+            np.add.at(vector, np.array([vocabulary[w] for w in words]), 1.0)
+        return vector
+
+    documents = [counts(content_words(s)) for s in _sentences(text) + _sentences(reference)]
+    documents = [d for d in documents if d.any()] or [counts(words_a), counts(words_b)]
+    document_frequency = (np.vstack(documents) > 0).sum(axis=0)
+    idf = np.log((len(documents) + 1) / (document_frequency + 1)) + 1.0
+
+    a = (1.0 + np.log(np.maximum(counts(words_a), 1.0))) * (counts(words_a) > 0) * idf
+    b = (1.0 + np.log(np.maximum(counts(words_b), 1.0))) * (counts(words_b) > 0) * idf
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def has_usable_ideal_answer(ideal_answer):
+    """
+    False for custom questions and placeholder answers too thin to compare against.
+    """
+    return bool(ideal_answer) and ideal_answer != CUSTOM_QUESTION_IDEAL_ANSWER \
+        and len(content_words(ideal_answer)) >= RELEVANCE_MIN_IDEAL_WORDS
+
+
+def score_relevance(transcript, ideal_answer=None, question=None):
+    """
+    Scores how well `transcript` answers the question. Returns a dict with
+    `word_count`, `similarity` to the ideal answer (NaN if unusable),
+    `question_overlap` (share of the question's content words used) and a
+    `verdict`:
+
+    - "empty": too short to evaluate
+    - "off_topic": shares almost nothing with the ideal answer or the question
+    - "near_identical": covers the ideal answer almost word for word (still
+      evaluated by the LLM: the ideal answer is on screen, so it may just be read out)
+    - "weak": low similarity — worth only a short LLM comparison
+    - "normal": needs the full LLM comparison
+    """
+    word_count = len((transcript or "").split())
+    similarity = tfidf_similarity(transcript, ideal_answer) if has_usable_ideal_answer(ideal_answer) else np.nan
+
+    question_words = set(content_words(question))
+    answer_words = set(content_words(transcript))
+    question_overlap = len(question_words & answer_words) / len(question_words) if question_words else np.nan
+
+    if word_count < RELEVANCE_MIN_WORDS:
+        verdict = "empty"
+    elif np.isnan(similarity):
+        verdict = "normal"
+    elif similarity < RELEVANCE_OFF_TOPIC and not question_overlap > 0:
+        verdict = "off_topic"
+    elif similarity >= RELEVANCE_NEAR_IDENTICAL:
+        verdict = "near_identical"
+    elif similarity < RELEVANCE_WEAK:
+        verdict = "weak"
+    else:
+        verdict = "normal"
+
+    return {
+        "word_count": word_count,
+        "similarity": similarity,
+        "question_overlap": question_overlap,
+        "verdict": verdict,
+    }
+
+
+# Content evaluations for clear-cut answers, in the same format the LLM is asked for
+LOCAL_COMPARISONS = {
+    "empty": (
+        "Your answer was too short to compare with the ideal answer.\n\n"
+        "Suggestions:\n"
+        "1. Aim to speak for at least 30 seconds.\n"
+        "2. State your main point, then support it with a reason and an example.\n"
+        "Score: 1/5"
+    ),
+    "off_topic": (
+        "Your answer doesn't seem to address the question that was asked.\n\n"
+        "Suggestions:\n"
+        "1. Listen to or re-read the question and repeat its key words in your first sentence.\n"
+        "2. Keep each point linked back to the question.\n"
+        "Score: 1/5"
+    ),
+}
+
+
+def local_comparison(relevance):
+    """
+    Returns the local content evaluation for a clear-cut verdict, or None when
+    the LLM comparison is needed.
+    """
+    return LOCAL_COMPARISONS.get(relevance["verdict"])
@@ -0,0 +1,142 @@
+# single_flight.py — Coalesces identical in-flight calls so only one does the work
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call
+    with the same key is in flight wait for it and share its result (or exception).
+    `do` runs the call on the first caller's thread; `join` is for calls that
+    run elsewhere and lets each caller give up on its own (see `detach`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> {"done": Event, "result", "error"}
+        self._joined = {}    # key -> {"future", "waiters": [(owner, Future)]}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Returns (result, shared). `shared` is True when the result came from
+        another caller's call.
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = {"done": threading.Event(), "result": None, "error": None}
+                self._inflight[key] = flight
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"], True
+
+        try:
+            flight["result"] = fn()
+        except BaseException as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight["done"].set()
+        return flight["result"], False
+
+    def join(self, key, start, owner=None):
+        """
+        Returns (future, shared). The first caller for `key` calls `start()`,
+        which begins the call and returns a concurrent.futures.Future; later
+        callers share it. Each caller gets its own `future` for the result,
+        which `detach(owner)` cancels without affecting the others. The call
+        itself is cancelled once every caller has detached.
+        """
+        waiter = Future()
+        with self._lock:
+            flight = self._joined.get(key)
+            shared = flight is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                self.calls += 1
+                flight = {"future": None, "waiters": []}
+                self._joined[key] = flight
+            flight["waiters"].append((owner, waiter))
+        if shared:
+            return waiter, True
+
+        try:
+            future = start()
+        except BaseException as e:
+            with self._lock:
+                self._joined.pop(key, None)
+            for _, other in flight["waiters"]:
+                if other.set_running_or_notify_cancel():
+                    other.set_exception(e)
+            raise
+        with self._lock:
+            flight["future"] = future
+            abandoned = self._abandoned(key, flight)
+        if abandoned:
+            future.cancel()
+        future.add_done_callback(lambda done: self._finish(key, flight, done))
+        return waiter, False
+
+    def _abandoned(self, key, flight):
+        """
+        Forgets `flight` once all its callers have detached, so the next caller
+        starts a new call. Call with the lock held.
+        """
+        if any(not waiter.cancelled() for _, waiter in flight["waiters"]):
+            return False
+        if self._joined.get(key) is flight:
+            del self._joined[key]
+        return True
+
+    def _finish(self, key, flight, future):
+        with self._lock:
+            if self._joined.get(key) is flight:
+                del self._joined[key]
+            waiters = list(flight["waiters"])
+        for _, waiter in waiters:
+            if not waiter.set_running_or_notify_cancel():
+                continue  # detached
+            if future.cancelled():
+                waiter.cancel()
+            elif future.exception() is not None:
+                waiter.set_exception(future.exception())
+            else:
+                waiter.set_result(future.result())
+
+    def detach(self, owner):
+        """
+        Cancels the `join` futures of `owner`, and the calls no one else waits
+        for. Returns how many futures were cancelled.
+        """
+        if owner is None:
+            return 0
+        detached = 0
+        abandoned = []
+        with self._lock:
+            for key, flight in list(self._joined.items()):
+                for waiter_owner, waiter in flight["waiters"]:
+                    if waiter_owner == owner and waiter.cancel():
+                        detached += 1
+                if self._abandoned(key, flight) and flight["future"] is not None:
+                    abandoned.append(flight["future"])
+        for future in abandoned:
+            future.cancel()
+        return detached
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight) + len(self._joined)}
@@ -1,11 +1,20 @@
 # states.py — Defines all Gradio state variables for session tracking
 
 import gradio as gr
-import random
+import uuid
+
+def new_user_id():
+    return f"user_{uuid.uuid4().hex[:8]}"
+
+def new_llm_owner():
+    return f"session_{uuid.uuid4().hex}"
 
 def init_states():
     return {
-        "user_id": gr.State(value=f"user_{random.randint(1000, 9999)}"),
+        # Replaced with a fresh id for each browser session on page load (see ui.py)
+        "user_id": gr.State(value=new_user_id()),
+        # Tags this browser session's LLM calls so they can be cancelled together (set on load)
+        "llm_owner": gr.State(),
         "current_topic": gr.State(value=""),
         "question_state": gr.State(),
         "ideal_answer_state": gr.State(),
@@ -0,0 +1,8 @@
+# conftest.py — Makes the app's flat modules importable from the tests
+#
+#   cd "Speech tutor project/speech_tutor" && python -m pytest tests
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
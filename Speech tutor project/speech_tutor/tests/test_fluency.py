@@ -0,0 +1,53 @@
+# test_fluency.py — Filler word counting and pause metrics
+
+from fluency import analyze_fluency
+
+
+def _timed(words, pauses_after=()):
+    """
+    Returns (words, starts, ends, probabilities) with each word lasting 0.3s,
+    back to back except for a 1s pause after the word indexes in `pauses_after`.
+    """
+    starts, ends = [], []
+    t = 0.0
+    for i, _ in enumerate(words):
+        starts.append(t)
+        ends.append(t + 0.3)
+        t += 0.3 + (1.0 if i in pauses_after else 0.0)
+    return words, starts, ends, [0.9] * len(words)
+
+
+def test_hesitation_sounds_always_count():
+    metrics = analyze_fluency(*_timed(["um", "I", "went", "uh", "home."]))
+    assert metrics["filler_count"] == 2
+    assert metrics["filler_rate"] == 40.0
+
+
+def test_like_as_a_verb_is_not_a_filler():
+    metrics = analyze_fluency(*_timed(["I", "like", "travel"]))
+    assert metrics["filler_count"] == 0
+
+
+def test_like_next_to_a_pause_is_a_filler():
+    # "I went, like... home"
+    metrics = analyze_fluency(*_timed(["I", "went,", "like", "home"], pauses_after={2}))
+    assert metrics["filler_count"] == 1
+
+
+def test_phrases_only_count_as_interjections():
+    assert analyze_fluency(*_timed(["what", "kind", "of", "food"]))["filler_count"] == 0
+    assert analyze_fluency(*_timed(["it", "was", "you", "know", "fine"], pauses_after={3}))["filler_count"] == 1
+
+
+def test_pauses_and_rates():
+    metrics = analyze_fluency(*_timed(["one", "two", "three", "four"], pauses_after={1}))
+    assert metrics["pause_count"] == 1
+    assert metrics["longest_pause"] == 1.0
+    assert metrics["speaking_time"] == 2.2
+    assert metrics["articulation_rate_wpm"] > metrics["speaking_rate_wpm"]
+
+
+def test_no_words():
+    metrics = analyze_fluency([], [], [], [])
+    assert metrics["word_count"] == 0
+    assert metrics["filler_rate"] == 0.0
@@ -0,0 +1,102 @@
+# test_history_analytics.py — Incremental columnar export and grouped reports
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from history_analytics import aggregate, export_sessions, filter_sessions, load_sessions, _load_state
+
+
+def _session(timestamp, topic="Travel", difficulty="Beginner", rating=3.0, model="mistral:latest"):
+    return {
+        "timestamp": timestamp,
+        "topic": topic,
+        "difficulty": difficulty,
+        "model": model,
+        "transcript": "I would visit the old town and try the local food with friends",
+        "grammar_feedback": "Score: 4/5",
+        "rating": rating,
+    }
+
+
+def _write_history(history_dir, user_id, sessions):
+    path = history_dir / f"{user_id}.json"
+    path.write_text(json.dumps({"user_id": user_id, "sessions": sessions}))
+    # Make sure the change is visible even on filesystems with coarse mtimes
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return path
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    history_dir, export_dir = tmp_path / "history", tmp_path / "export"
+    history_dir.mkdir()
+    return history_dir, export_dir
+
+
+def test_only_new_sessions_are_exported(dirs):
+    history_dir, export_dir = dirs
+    first = [_session("2026-10-01 10:00:00"), _session("2026-10-02 10:00:00")]
+    _write_history(history_dir, "user_aa", first)
+    _write_history(history_dir, "user_bb", [_session("2026-10-03 09:00:00", topic="Food")])
+
+    assert export_sessions(history_dir, export_dir) == 3
+    assert export_sessions(history_dir, export_dir) == 0
+
+    _write_history(history_dir, "user_aa", first + [_session("2026-10-05 10:00:00", rating=5.0)])
+    assert export_sessions(history_dir, export_dir) == 1
+    assert len(_load_state(export_dir)["parts"]) == 2
+
+    table = load_sessions(export_dir)
+    assert len(table) == 4
+    assert sorted(table["user_id"].tolist()) == ["user_aa", "user_aa", "user_aa", "user_bb"]
+    assert table["grammar_score"].tolist() == [4.0] * 4
+
+
+def test_rewritten_history_rebuilds_the_export(dirs):
+    history_dir, export_dir = dirs
+    _write_history(history_dir, "user_aa", [_session("2026-10-01 10:00:00", rating=2.0)])
+    export_sessions(history_dir, export_dir)
+    old_parts = _load_state(export_dir)["parts"]
+
+    # Same number of sessions, new ratings (e.g. after rating.py --rescore --write)
+    _write_history(history_dir, "user_aa", [_session("2026-10-01 10:00:00", rating=4.5)])
+    assert export_sessions(history_dir, export_dir) == 1
+
+    table = load_sessions(export_dir)
+    assert table["rating"].tolist() == [4.5]
+    assert not any((export_dir / name).exists() for name in old_parts)
+
+
+def test_aggregate_and_filter(dirs):
+    history_dir, export_dir = dirs
+    _write_history(history_dir, "user_aa", [
+        _session("2026-09-30 10:00:00", rating=1.0),
+        _session("2026-10-01 10:00:00", rating=3.0),
+        _session("2026-10-02 10:00:00", topic="Food", rating=4.0),
+    ])
+    _write_history(history_dir, "user_bb", [_session("2026-10-03 10:00:00", rating=5.0, model="phi4-mini:latest")])
+    export_sessions(history_dir, export_dir)
+    table = load_sessions(export_dir)
+
+    october = filter_sessions(table, since="2026-10-01")
+    report = aggregate(october, by=("topic",), metrics=["rating", "pronunciation_score"])
+    assert report == [
+        {"topic": "Food", "sessions": 1, "users": 1, "mean_rating": 4.0, "mean_pronunciation_score": None},
+        {"topic": "Travel", "sessions": 2, "users": 2, "mean_rating": 4.0, "mean_pronunciation_score": None},
+    ]
+
+    by_month = aggregate(table, by=("month",), metrics=["rating"])
+    assert [(row["month"], row["sessions"]) for row in by_month] == [("2026-09", 1), ("2026-10", 3)]
+    assert len(filter_sessions(table, model="phi4-mini:latest")) == 1
+    assert aggregate(table[:0]) == []
+
+
+def test_unparseable_timestamps_become_nat(dirs):
+    history_dir, export_dir = dirs
+    _write_history(history_dir, "user_aa", [_session("not a date")])
+    export_sessions(history_dir, export_dir)
+    assert np.isnat(load_sessions(export_dir)["timestamp"][0])
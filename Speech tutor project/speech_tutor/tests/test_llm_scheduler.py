@@ -0,0 +1,101 @@
+# test_llm_scheduler.py — Per-model limits, priority order and owner cancellation
+
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, PRIORITY_BATCH
+from single_flight import SingleFlight
+
+
+def _wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def blocked_scheduler():
+    """
+    A scheduler allowing one call per model, with a first call holding the
+    only slot of "m" until `release` is set.
+    """
+    scheduler = LLMScheduler(limits={"m": 1}, default_limit=1, worker_threads=2)
+    release = threading.Event()
+    first = scheduler.start("m", lambda: release.wait(5))
+    _wait_until(lambda: scheduler.stats()["running"].get("m") == 1)
+    yield scheduler, release, first
+    release.set()
+
+
+def test_waiting_calls_start_in_priority_order(blocked_scheduler):
+    scheduler, release, first = blocked_scheduler
+    order = []
+    futures = [
+        scheduler.start("m", lambda name=name: order.append(name), priority)
+        for name, priority in [
+            ("batch", PRIORITY_BATCH),
+            ("prefetch", PRIORITY_PREFETCH),
+            ("interactive 1", PRIORITY_INTERACTIVE),
+            ("interactive 2", PRIORITY_INTERACTIVE),
+        ]
+    ]
+    _wait_until(lambda: scheduler.stats()["queued"]["m"] == 4)
+    assert scheduler.free_slots("m") == -4
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    # FIFO within a priority
+    assert order == ["interactive 1", "interactive 2", "prefetch", "batch"]
+    assert scheduler.stats()["wait"]["batch"]["count"] == 1
+
+
+def test_limits_are_per_model(blocked_scheduler):
+    scheduler, release, first = blocked_scheduler
+    # "other" has its own slot, so it runs while "m" is busy
+    assert scheduler.run("other", lambda: "done") == "done"
+    assert not first.done()
+
+
+def test_cancel_owner_drops_only_that_owners_calls(blocked_scheduler):
+    scheduler, release, first = blocked_scheduler
+    mine = scheduler.start("m", lambda: "mine", owner="session_a")
+    theirs = scheduler.start("m", lambda: "theirs", owner="session_b")
+    _wait_until(lambda: scheduler.stats()["queued"]["m"] == 2)
+
+    assert scheduler.cancel_owner("session_a") == 1
+    assert scheduler.cancel_owner(None) == 0
+    release.set()
+    assert theirs.result(timeout=5) == "theirs"
+    with pytest.raises(CancelledError):
+        mine.result(timeout=5)
+
+
+def test_coalesced_call_runs_until_every_owner_cancels(blocked_scheduler):
+    scheduler, release, first = blocked_scheduler
+    flights = SingleFlight()
+    runs = []
+
+    def join(key, owner):
+        return flights.join(key, lambda: scheduler.start("m", lambda: runs.append(key) or key), owner)
+
+    mine, mine_shared = join("shared", "session_a")
+    theirs, theirs_shared = join("shared", "session_b")
+    assert (mine_shared, theirs_shared) == (False, True)
+    dropped, _ = join("dropped", "session_a")
+    _wait_until(lambda: scheduler.stats()["queued"]["m"] == 2)
+
+    # session_b still waits on "shared", so only "dropped" is cancelled
+    assert flights.detach("session_a") == 2
+    assert flights.detach(None) == 0
+    _wait_until(lambda: scheduler.stats()["queued"]["m"] == 1)
+    release.set()
+    assert theirs.result(timeout=5) == "shared"
+    assert runs == ["shared"]
+    for future in (mine, dropped):
+        with pytest.raises(CancelledError):
+            future.result(timeout=5)
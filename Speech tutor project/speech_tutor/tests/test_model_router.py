@@ -0,0 +1,58 @@
+# test_model_router.py — Tier fallback, failure penalties and backend availability
+
+import pytest
+
+import model_router
+from model_router import route_model, record_latency, record_failure
+
+
+@pytest.fixture(autouse=True)
+def fresh_latencies(monkeypatch):
+    monkeypatch.setattr(model_router, "_latency", {})
+    monkeypatch.setattr(model_router, "ADAPTIVE_ROUTING", True)
+    monkeypatch.setattr(model_router, "MODEL_TIERS", {
+        "small": ["small-a", "small-b"],
+        "medium": ["medium-a", "medium-b"],
+        "large": ["large-a"],
+    })
+    monkeypatch.setattr(model_router, "TASK_ROUTES", {"quick": ("small", 5), "full": ("large", 30)})
+
+
+def test_keeps_requested_model_within_tier_and_budget():
+    assert route_model("full", "medium-a") == "medium-a"
+    record_latency("full", "medium-a", 10)
+    assert route_model("full", "medium-a") == "medium-a"
+
+
+def test_unknown_task_or_model_is_left_alone():
+    assert route_model("other", "large-a") == "large-a"
+    assert route_model("quick", "my-own-model") == "my-own-model"
+
+
+def test_task_tier_caps_the_model():
+    assert route_model("quick", "large-a") == "small-a"
+
+
+def test_over_budget_falls_back_in_tier_order():
+    record_latency("full", "large-a", 60)
+    # medium-b is faster, but medium-a comes first in tier order and fits the budget
+    record_latency("full", "medium-a", 20)
+    record_latency("full", "medium-b", 2)
+    assert route_model("full", "large-a") == "medium-a"
+
+
+def test_failures_move_routing_off_a_model():
+    record_failure("quick", "small-a")
+    assert route_model("quick", "medium-a") == "small-b"
+    record_failure("quick", "small-b")
+    record_latency("quick", "small-b", 3)
+    # Everything failed or is over budget: the least bad observation wins
+    assert route_model("quick", "medium-a") == "small-b"
+
+
+def test_only_available_models_are_candidates():
+    assert route_model("quick", "medium-a", available={"small-b:latest", "medium-a"}) == "small-b"
+    # Nothing suitable has been pulled: keep the user's choice
+    assert route_model("quick", "medium-a", available={"medium-a"}) == "medium-a"
+    # Availability not known yet: no restriction
+    assert route_model("quick", "medium-a", available=set()) == "small-a"
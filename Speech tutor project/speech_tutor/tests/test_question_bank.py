@@ -0,0 +1,93 @@
+# test_question_bank.py — Near-duplicate detection, serving and persistence of the question bank
+
+import json
+import time
+
+import pytest
+
+import question_bank
+from question_bank import QuestionBank
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuestionBank(tmp_path / "bank.json", save_delay=60)
+    yield bank
+    bank.flush()
+
+
+def test_near_duplicates_are_rejected_per_slot(bank):
+    first = bank.add("Travel", "Beginner", "What is your favourite place to travel to?", "Paris.")
+    assert first is not None
+    assert bank.is_duplicate("travel", "beginner", "What's your favourite place to travel to")
+    assert bank.add("Travel", "Beginner", "What is your favourite place to travel to?!", "Rome.") is None
+    # Same question in another slot is fine
+    assert bank.add("Travel", "Advanced", "What is your favourite place to travel to?", "Paris.") is not None
+    assert bank.stats() == {"travel|beginner": 1, "travel|advanced": 1}
+
+
+def test_duplicate_counts_as_served(bank):
+    bank.add("Food", "Beginner", "Which dish do you cook most often at home?", "Pasta.")
+    bank.add("Food", "Beginner", "Which dish do you cook most often at home?", "Rice.", served_to="user_aa")
+    assert bank.serve("Food", "Beginner", "user_aa") is None
+
+
+def test_serve_skips_served_and_answered_questions(bank):
+    for question in ["Describe your hometown's main square.", "Which season do you like best and why?",
+                     "Tell me about a book that changed your mind."]:
+        bank.add("Life", "Beginner", question, "...")
+    assert bank.unseen_count("Life", "Beginner", "user_aa") == 3
+
+    first = bank.serve("Life", "Beginner", "user_aa")
+    second = bank.serve("Life", "Beginner", "user_aa", seen_questions=["Which season do you like best and why?"])
+    assert first["question"] == "Describe your hometown's main square."
+    assert second["question"] == "Tell me about a book that changed your mind."
+    assert bank.serve("Life", "Beginner", "user_bb")["question"] == first["question"]
+
+
+def test_served_lists_are_capped(bank, monkeypatch):
+    monkeypatch.setattr(question_bank, "QUESTION_BANK_SERVED_PER_USER", 2)
+    monkeypatch.setattr(question_bank, "QUESTION_BANK_SERVED_USERS", 2)
+    for question in ["Name a hobby you picked up recently.", "What job did you want as a child?",
+                     "How do you usually spend weekends?"]:
+        bank.add("Me", "Beginner", question, "...", served_to="user_aa")
+    assert len(bank._served["user_aa"]) == 2
+    bank.serve("Me", "Beginner", "user_bb")
+    bank.serve("Me", "Beginner", "user_cc")
+    # The least recently served user is forgotten first
+    assert list(bank._served) == ["user_bb", "user_cc"]
+
+
+def test_writes_are_batched_until_flush(bank):
+    bank.add("Work", "Beginner", "What does a good manager do?", "Listens.")
+    bank.serve("Work", "Beginner", "user_aa")
+    assert not bank.path.exists()
+
+    bank.flush()
+    data = json.loads(bank.path.read_text())
+    assert [q["question"] for q in data["questions"]] == ["What does a good manager do?"]
+    assert len(data["served"]["user_aa"]) == 1
+
+    reloaded = QuestionBank(bank.path)
+    assert reloaded.serve("Work", "Beginner", "user_aa") is None
+    assert reloaded.unseen_count("Work", "Beginner", "user_bb") == 1
+
+
+def test_ensure_stock_refills_only_when_low(bank):
+    bank.add("Sport", "Beginner", "Which sport do you enjoy watching?", "Tennis.")
+    generated = iter([
+        ("How often do you exercise each week?", "Three times.", "mistral:latest"),
+        ("Have you ever played in a team?", "Yes, football.", "mistral:latest"),
+        ("Which athlete do you admire?", "Serena Williams.", "mistral:latest"),
+    ])
+    assert bank.ensure_stock("Sport", "Beginner", lambda: next(generated), "user_aa")
+    _wait_for_refill(bank)
+    assert bank.unseen_count("Sport", "Beginner", "user_aa") == 4
+    assert not bank.ensure_stock("Sport", "Beginner", lambda: None, "user_aa")
+
+
+def _wait_for_refill(bank):
+    end = time.monotonic() + 5
+    while bank._refilling:
+        assert time.monotonic() < end
+        time.sleep(0.01)
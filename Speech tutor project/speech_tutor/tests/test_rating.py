@@ -0,0 +1,70 @@
+# test_rating.py — Rating features, failed transcripts and history re-scoring
+
+import json
+
+import numpy as np
+
+from rating import (
+    FEATURE_INDEX,
+    calculate_rating,
+    extract_features,
+    has_scored_features,
+    parse_llm_score,
+    rescore_history,
+)
+
+ANSWER = "I would pack light and book a hostel near the old town so I can walk everywhere"
+
+
+def test_parse_llm_score_takes_the_last_score_line():
+    assert parse_llm_score("Score: 2/5 ... revised **Score: 4 / 5**") == 4.0
+    assert parse_llm_score("Score = 9 out of 5") == 5.0
+    assert np.isnan(parse_llm_score("No score here"))
+    assert np.isnan(parse_llm_score(None))
+
+
+def test_features_from_sections_and_fluency():
+    fluency = {"word_count": 17, "low_confidence_ratio": 0.2, "speaking_rate_wpm": 130, "longest_pause": 1.0, "filler_rate": 0.0}
+    features = extract_features(ANSWER, "Score: 4/5", None, "Score: 2/5", fluency=fluency)
+    assert features[FEATURE_INDEX["word_count"]] == 17
+    assert features[FEATURE_INDEX["flagged_ratio"]] == 0.2
+    assert features[FEATURE_INDEX["grammar_score"]] == 4.0
+    # Pending section
+    assert np.isnan(features[FEATURE_INDEX["pronunciation_score"]])
+    assert features[FEATURE_INDEX["content_score"]] == 2.0
+
+
+def test_llm_scores_move_the_rating():
+    neutral = calculate_rating(ANSWER, None, None, None)
+    assert calculate_rating(ANSWER, "Score: 5/5", "Score: 5/5", "Score: 5/5") > neutral
+    assert calculate_rating(ANSWER, "Score: 1/5", "Score: 1/5", "Score: 1/5") < neutral
+
+
+def test_empty_and_failed_transcripts_rate_zero():
+    assert calculate_rating("", "", "", "") == 0.0
+    assert calculate_rating("❌ No speech detected", "", "", "") == 0.0
+    assert calculate_rating("❌ Recording is too large (40 MB, limit 25 MB)", None, None, None) == 0.0
+
+
+def test_has_scored_features():
+    legacy = extract_features(ANSWER, "Looks good.", "Clear speech.", "Relevant answer.")
+    scored = extract_features(ANSWER, "Score: 3/5", "Clear speech.", "Relevant answer.")
+    assert has_scored_features(np.vstack([legacy, scored])).tolist() == [False, True]
+
+
+def test_rescore_keeps_legacy_sessions_and_the_previous_rating(tmp_path):
+    sessions = [
+        {"transcript": ANSWER, "grammar_feedback": "Nice.", "rating": 2.0},
+        {"transcript": ANSWER, "grammar_feedback": "Score: 5/5", "pronunciation_feedback": "Score: 5/5",
+         "comparison_feedback": "Score: 5/5", "rating": 2.0},
+    ]
+    path = tmp_path / "user_1234abcd.json"
+    path.write_text(json.dumps({"sessions": sessions}))
+
+    summary = rescore_history(tmp_path, write=True)
+    assert summary["skipped"] == 1
+    assert summary["changed"] == 1
+
+    legacy, scored = json.loads(path.read_text())["sessions"]
+    assert legacy["rating"] == 2.0 and "previous_rating" not in legacy
+    assert scored["rating"] > 4.0 and scored["previous_rating"] == 2.0
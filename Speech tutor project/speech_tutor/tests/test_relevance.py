@@ -0,0 +1,51 @@
+# test_relevance.py — Local relevance verdicts and which ones skip the LLM
+
+import numpy as np
+
+from constants import CUSTOM_QUESTION_IDEAL_ANSWER
+from relevance import local_comparison, score_relevance, tfidf_similarity
+
+QUESTION = "What do you enjoy most about travelling to new countries?"
+IDEAL = (
+    "I enjoy discovering local food and markets. Meeting people from different cultures "
+    "teaches me new perspectives. Exploring historic streets and museums helps me understand "
+    "a country's history."
+)
+
+
+def test_similarity_bounds():
+    assert tfidf_similarity(IDEAL, IDEAL) > 0.99
+    assert tfidf_similarity("quantum chromodynamics lattice gauge", IDEAL) == 0.0
+    assert np.isnan(tfidf_similarity("", IDEAL))
+
+
+def test_too_short_is_empty_and_scored_locally():
+    relevance = score_relevance("I like it", IDEAL, QUESTION)
+    assert relevance["verdict"] == "empty"
+    assert "Score: 1/5" in local_comparison(relevance)
+
+
+def test_off_topic_is_scored_locally():
+    answer = "My favourite football team won the league because their striker scored many goals this season"
+    relevance = score_relevance(answer, IDEAL, QUESTION)
+    assert relevance["verdict"] == "off_topic"
+    assert "Score: 1/5" in local_comparison(relevance)
+
+
+def test_sharing_question_words_is_not_off_topic():
+    answer = "Travelling to new countries is something I rarely do because flights from my city are expensive"
+    assert score_relevance(answer, IDEAL, QUESTION)["verdict"] != "off_topic"
+
+
+def test_reading_out_the_ideal_answer_still_goes_to_the_llm():
+    relevance = score_relevance(IDEAL, IDEAL, QUESTION)
+    assert relevance["verdict"] == "near_identical"
+    assert local_comparison(relevance) is None
+
+
+def test_without_a_usable_ideal_answer_the_llm_decides():
+    answer = "I enjoy trying street food and talking with people in the markets when I travel abroad"
+    relevance = score_relevance(answer, CUSTOM_QUESTION_IDEAL_ANSWER, QUESTION)
+    assert np.isnan(relevance["similarity"])
+    assert relevance["verdict"] == "normal"
+    assert local_comparison(relevance) is None
@@ -0,0 +1,123 @@
+# test_single_flight.py — Which concurrent LLM calls share one Ollama request
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import llm_engine
+from llm_scheduler import llm_request_context, PRIORITY_PREFETCH
+from single_flight import SingleFlight
+
+
+def _run_together(calls, started, release):
+    """
+    Starts every call, waits until the first one is inside its function,
+    lets the others queue up behind it, then releases it. Returns the results.
+    """
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(call) for call in calls]
+        assert started.wait(5)
+        time.sleep(0.1)
+        release.set()
+        return [f.result(timeout=5) for f in futures]
+
+
+def test_same_key_runs_once_and_shares_the_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = _run_together([lambda: flight.do("k", work)] * 3, started, release)
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert {result for result, _ in results} == {"answer"}
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_exceptions_are_shared_and_the_key_is_freed():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("backend down")
+
+    def call():
+        with pytest.raises(RuntimeError, match="backend down"):
+            flight.do("k", fail)
+
+    _run_together([call, call], started, release)
+    # A later call with the same key runs again rather than reusing the failure
+    assert flight.do("k", lambda: "recovered") == ("recovered", False)
+
+
+@pytest.fixture
+def fake_send(monkeypatch):
+    """
+    Replaces the Ollama request with one that blocks until released and
+    records each payload actually sent.
+    """
+    monkeypatch.setattr(llm_engine, "_single_flight", SingleFlight())
+    monkeypatch.setattr(llm_engine, "_observe_request", lambda *args: None)
+    sent = []
+    started, release = threading.Event(), threading.Event()
+
+    def send(path, payload, task, model, deadline=None):
+        sent.append((path, task, model, payload))
+        started.set()
+        release.wait(5)
+        return dict(llm_engine._empty_result(model, f"reply to {payload['prompt']}"), error=False)
+
+    monkeypatch.setattr(llm_engine, "_send", send)
+    return sent, started, release
+
+
+def _coalesced(prompt, task="grammar", model="mistral:latest", dedupe_key=None):
+    payload = {"prompt": prompt, "options": {}}
+    return lambda: llm_engine._send_coalesced("/api/generate", payload, task, model, dedupe_key)
+
+
+def test_identical_payloads_coalesce(fake_send):
+    sent, started, release = fake_send
+    results = _run_together([_coalesced("hi"), _coalesced("hi")], started, release)
+    assert len(sent) == 1
+    assert sorted(r["shared"] for r in results) == [False, True]
+
+
+def test_task_and_model_are_part_of_the_key(fake_send):
+    sent, started, release = fake_send
+    _run_together(
+        [_coalesced("hi"), _coalesced("hi", task="comparison"), _coalesced("hi", model="llama2:latest")],
+        started, release,
+    )
+    assert len(sent) == 3
+
+
+def test_dedupe_key_replaces_the_payload(fake_send):
+    sent, started, release = fake_send
+    results = _run_together(
+        [_coalesced("seed 1", dedupe_key="travel|Beginner"), _coalesced("seed 2", dedupe_key="travel|Beginner")],
+        started, release,
+    )
+    assert len(sent) == 1
+    assert results[0]["response"] == results[1]["response"]
+
+
+def test_interactive_calls_dont_wait_on_prefetches(fake_send):
+    sent, started, release = fake_send
+
+    def prefetch():
+        with llm_request_context(priority=PRIORITY_PREFETCH):
+            return _coalesced("seed 1", dedupe_key="travel|Beginner")()
+
+    _run_together([prefetch, _coalesced("seed 2", dedupe_key="travel|Beginner")], started, release)
+    assert len(sent) == 2
@@ -6,18 +6,24 @@ from components import header_section, mic_wave_animation
 from events import (
     handle_question_generation,
     enhanced_tutor_conversation,
+    staged_tutor_conversation,
     format_interview_questions,
     format_history,
     update_current_topic
 )
-from states import init_states
+from states import init_states, new_user_id, new_llm_owner
 from rating import calculate_rating
-from constants import TOPIC_CHOICES, MODEL_CHOICES, DIFFICULTY_LEVELS
+from constants import TOPIC_CHOICES, MODEL_CHOICES, DIFFICULTY_LEVELS, AUDIO_EXTENSIONS
+from llm_engine import cancel_llm_requests
+from llm_scheduler import llm_request_context, iterate_in_llm_context
+from profiling import profile_requested, profiled_call, profiled_iter
+from audio_ingest import discard_upload
 
 
-def create_ui(generate_question_and_answer, tutor_conversation, generate_interview_questions, load_history, save_history, handle_custom_question=None):
+def create_ui(generate_question_and_answer, tutor_conversation, generate_interview_questions, load_history, save_history, handle_custom_question=None, tutor_conversation_stream=None, generate_interview_questions_stream=None):
     states = init_states()
     user_id = states["user_id"]
+    llm_owner = states["llm_owner"]
     current_topic = states["current_topic"]
     question_state = states["question_state"]
     ideal_answer_state = states["ideal_answer_state"]
@@ -74,7 +80,8 @@ def create_ui(generate_question_and_answer, tutor_conversation, generate_intervi
                                 with gr.Column(scale=1):
                                     audio_input = gr.Audio(source="microphone", type="filepath", label="Record from microphone", elem_classes="audio-input")
                                 with gr.Column(scale=1):
-                                    audio_upload = gr.Audio(source="upload", type="filepath", label="Upload audio file", elem_classes="audio-input")
+                                    # A plain file upload: gr.Audio would decode the whole recording into memory to re-encode it
+                                    audio_upload = gr.File(file_types=AUDIO_EXTENSIONS, type="file", label="Upload audio file", elem_classes="audio-input")
                             
                             submit_btn = gr.Button("🚀 Analyze My Speech", variant="primary")
 
@@ -86,6 +93,9 @@ def create_ui(generate_question_and_answer, tutor_conversation, generate_intervi
                         with gr.Accordion("Transcript", open=True):
                             transcript_output = gr.Textbox(label="What You Said")
 
+                        with gr.Accordion("Fluency Analytics", open=True):
+                            fluency_output = gr.Markdown("Speaking rate, pauses and clarity will appear here...")
+
                         with gr.Accordion("Grammar Feedback", open=True):
                             grammar_output = gr.Textbox(label="Grammar Analysis")
 
@@ -124,69 +134,144 @@ def create_ui(generate_question_and_answer, tutor_conversation, generate_intervi
                 gr.update(interactive=(mode == "Enter custom topic"))
             ),
             inputs=topic_choice,
-            outputs=[topic_dropdown, custom_topic_box, question_box]
+            outputs=[topic_dropdown, custom_topic_box, question_box],
+            queue=False
         )
 
+        # Add ?profile=1 to the page URL to profile your own requests (see profiling.py)
+        def generate_question(choice_mode, current_question, topic, difficulty, model, user_id, request: gr.Request = None):
+            return profiled_call(
+                "generate_question_and_answer", handle_question_generation,
+                choice_mode, current_question, topic, difficulty, model, handle_custom_question, generate_question_and_answer,
+                user_id=user_id, enabled=profile_requested(request)
+            )
+
         generate_btn.click(
             fn=update_current_topic,
             inputs=[topic_choice, topic_dropdown, custom_topic_box],
-            outputs=[custom_topic_box, current_topic]
+            outputs=[custom_topic_box, current_topic],
+            queue=False,
+            api_name="set_topic"
         ).then(
-            fn=lambda m, q, t, d, mo: handle_question_generation(m, q, t, d, mo, handle_custom_question, generate_question_and_answer),
-            inputs=[topic_choice, question_box, custom_topic_box, difficulty_selector, model_selector],
-            outputs=[question_box, ideal_answer_box]
+            fn=generate_question,
+            inputs=[topic_choice, question_box, custom_topic_box, difficulty_selector, model_selector, user_id],
+            outputs=[question_box, ideal_answer_box],
+            api_name="generate_question"
         ).then(
             lambda q, a, d: (q, a, d),
             inputs=[question_box, ideal_answer_box, difficulty_selector],
-            outputs=[question_state, ideal_answer_state, difficulty_state]
+            outputs=[question_state, ideal_answer_state, difficulty_state],
+            queue=False,
+            api_name="set_question"
         ).then(
             lambda: gr.update(visible=False),
             inputs=None,
-            outputs=ideal_answer_box
+            outputs=ideal_answer_box,
+            queue=False
         ).then(
             lambda a: a,
             inputs=ideal_answer_box,
-            outputs=ideal_answer_display
+            outputs=ideal_answer_display,
+            queue=False
         )
 
         # Function to process audio from either microphone or uploaded file
-        def process_audio(mic_input, upload_input, question, ideal_answer, difficulty, model, user_id, topic):
+        def process_audio(mic_input, upload_input, question, ideal_answer, difficulty, model, user_id, topic, owner, request: gr.Request = None):
+            upload_path = getattr(upload_input, "name", upload_input)
+            try:
+                yield from evaluate_audio(mic_input, upload_path, question, ideal_answer, difficulty, model, user_id, topic, owner, request)
+            except GeneratorExit:
+                # The browser went away mid-evaluation and Gradio dropped this generator
+                cancelled = cancel_llm_requests(owner)
+                if cancelled:
+                    print(f"⏹️ Session left: cancelled {cancelled} LLM calls")
+                raise
+            finally:
+                # Gradio saves a copy of the recording for every submission; nothing reads it afterwards
+                discard_upload(mic_input)
+                discard_upload(upload_path)
+
+        def evaluate_audio(mic_input, upload_input, question, ideal_answer, difficulty, model, user_id, topic, owner, request):
             # Use uploaded file if available, otherwise use microphone input
             audio_input_to_use = upload_input if upload_input else mic_input
-            return enhanced_tutor_conversation(
-                audio_input_to_use, question, ideal_answer, difficulty, model, 
-                user_id, topic, tutor_conversation, save_history, calculate_rating
+            # A new submission supersedes any of this session's LLM calls still waiting
+            cancel_llm_requests(owner)
+            profile = profile_requested(request)
+            if tutor_conversation_stream is None:
+                with llm_request_context(owner=owner):
+                    result = profiled_call(
+                        "process_audio", enhanced_tutor_conversation,
+                        audio_input_to_use, question, ideal_answer, difficulty, model, 
+                        user_id, topic, tutor_conversation, save_history, calculate_rating,
+                        enabled=profile
+                    )
+                yield result + ("",)
+                return
+
+            # Stream partial results when the latency budget runs out, then fill in the rest
+            yield from profiled_iter(
+                "process_audio",
+                iterate_in_llm_context(
+                    staged_tutor_conversation(
+                        audio_input_to_use, question, ideal_answer, difficulty, model,
+                        user_id, topic, tutor_conversation_stream, save_history, calculate_rating
+                    ),
+                    owner=owner
+                ),
+                enabled=profile
             )
             
         submit_btn.click(
             fn=process_audio,
             inputs=[
                 audio_input, audio_upload, question_state, ideal_answer_state, 
-                difficulty_state, model_selector, user_id, current_topic
+                difficulty_state, model_selector, user_id, current_topic, llm_owner
             ],
-            outputs=[transcript_output, grammar_output, feedback_output, comparison_output, ideal_answer_box, rating_state, rating_display]
+            outputs=[transcript_output, grammar_output, feedback_output, comparison_output, ideal_answer_box, rating_state, rating_display, fluency_output],
+            api_name="submit_answer"
         ).then(
             lambda a: a,
             inputs=ideal_answer_box,
-            outputs=ideal_answer_display
+            outputs=ideal_answer_display,
+            queue=False
         )
 
+        # Show each interview question as soon as it has been generated
+        def generate_interview(topic, personality, skills, model):
+            yield from format_interview_questions(
+                topic, personality, skills, model,
+                generate_interview_questions_stream or generate_interview_questions
+            )
+
         generate_interview_btn.click(
-            lambda t, p, s, m: format_interview_questions(t, p, s, m, generate_interview_questions),
+            generate_interview,
             inputs=[interview_topic, personality_traits, technical_skills, interview_model],
-            outputs=interview_questions
+            outputs=interview_questions,
+            api_name="interview_questions"
         )
 
+        # Cheap events bypass the queue so they never wait behind a transcription
         refresh_history_btn.click(
             lambda u: format_history(u, load_history),
             inputs=user_id,
-            outputs=history_display
+            outputs=history_display,
+            queue=False,
+            api_name="history"
         )
 
+        # Every browser session gets its own user id and LLM owner, so sessions
+        # don't share history or cancel each other's LLM calls
         app.load(
+            lambda: (new_user_id(), new_llm_owner()),
+            inputs=None,
+            outputs=[user_id, llm_owner],
+            queue=False,
+            api_name="start_session"
+        ).then(
             lambda u: format_history(u, load_history),
             inputs=user_id,
-            outputs=history_display
+            outputs=history_display,
+            queue=False
         )
 
     return app
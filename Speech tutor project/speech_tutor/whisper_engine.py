@@ -1,29 +1,238 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from faster_whisper import WhisperModel
 
-# old (float16 on CPU)
-# Option A: use float32 (full precision)
-model = WhisperModel("base.en", device="cpu", compute_type="float32")
+from constants import CLARITY_THRESHOLD, ASR_WORKERS, ASR_MODEL
+from metrics import ASR_SECONDS, ASR_REAL_TIME_FACTOR, register_collector
+from profiling import profile_section
+from audio_ingest import check_upload, audio_chunks, SAMPLE_RATE
+from asr_server import (
+    asr_server_address,
+    server_available,
+    mark_server_down,
+    remote_transcribe,
+    ping,
+    ASRServerError,
+    ASRServerTimeout,
+)
+
+# Models are loaded on first use, so processes that send their audio to a
+# shared ASR server (asr_server.py) never hold one
+_models = {}
+_model_lock = threading.Lock()
+# Characters of the transcript so far given to Whisper as the prompt for the next chunk
+INITIAL_PROMPT_CHARS = 200
+
+# Transcription is CPU-bound, so it runs on its own small pool instead of the
+# threads handling UI events and LLM calls
+_asr_executor = ThreadPoolExecutor(max_workers=ASR_WORKERS, thread_name_prefix="asr")
+_asr_lock = threading.Lock()
+_asr_waiting = 0
+_asr_running = 0
+
 
+def get_model(name=ASR_MODEL, num_workers=ASR_WORKERS):
+    """
+    Returns the Whisper model `name`, loading it the first time.
+    """
+    with _model_lock:
+        if name not in _models:
+            print(f"📦 Loading Whisper model {name}")
+            # old (float16 on CPU)
+            # Option A: use float32 (full precision)
+            # num_workers lets up to that many transcriptions run in parallel on the one model
+            _models[name] = WhisperModel(name, device="cpu", compute_type="float32", num_workers=num_workers)
+        return _models[name]
 
 
-def transcribe(audio_path):
-    print("⚙️ Received audio:", audio_path)
-    segments, _ = model.transcribe(audio_path, beam_size=5, word_timestamps=True)
+def transcribe_local(audio, deadline=None, model_name=ASR_MODEL):
+    """
+    Transcribes `audio` (a path or binary file object) with a model in this
+    process. Returns the `transcribe_detailed` result.
+
+    The recording is decoded in chunks (see audio_ingest), so memory stays
+    bounded however long the upload is.
+    """
+    print("⚙️ Received audio:", audio)
+    check_upload(audio)
+    started = time.perf_counter()
+    model = get_model(model_name)
 
     result = ""
     flagged_words = []
+    words, starts, ends, probabilities = [], [], [], []
+    duration = 0.0
+
+    for offset, samples in audio_chunks(audio):
+        if deadline is not None and deadline.expired() and result:
+            break
+        # The text so far carries context and style across chunk boundaries
+        segments, _ = model.transcribe(
+            samples, beam_size=5, word_timestamps=True, initial_prompt=result[-INITIAL_PROMPT_CHARS:] or None
+        )
+        duration = offset + len(samples) / SAMPLE_RATE
 
-    for segment in segments:
-        print("🧠 Segment:", segment)
-        if not segment.words:
-            continue
-        result += segment.text + " "
-        for word in segment.words:
-            print(f"🔍 Word: {word.word} — Prob: {word.probability}")
-            if word.probability and word.probability < 0.85:
-                flagged_words.append((word.word, word.probability))
+        for segment in segments:
+            # Always keep the first segment, even when the budget was spent waiting for a slot
+            if deadline is not None and deadline.expired() and result:
+                print("⌛ Time budget exceeded — returning partial transcript")
+                break
+            print("🧠 Segment:", segment)
+            if not segment.words:
+                continue
+            result += segment.text + " "
+            for word in segment.words:
+                print(f"🔍 Word: {word.word} — Prob: {word.probability}")
+                words.append(word.word)
+                starts.append(word.start + offset)
+                ends.append(word.end + offset)
+                probabilities.append(word.probability or 0.0)
+                if word.probability and word.probability < CLARITY_THRESHOLD:
+                    flagged_words.append((word.word, word.probability))
 
     print("📋 Final transcript:", result.strip())
     print("🚩 Flagged words:", flagged_words)
 
-    return result.strip(), flagged_words
+    _observe(time.perf_counter() - started, duration)
+
+    return {
+        "transcript": result.strip(),
+        "flagged_words": flagged_words,
+        "words": words,
+        "starts": starts,
+        "ends": ends,
+        "probabilities": probabilities,
+        "duration": duration,
+    }
+
+
+def _observe(elapsed, duration):
+    ASR_SECONDS.observe(elapsed)
+    if duration:
+        ASR_REAL_TIME_FACTOR.observe(elapsed / duration)
+
+
+def _transcribe(audio_path, deadline=None):
+    """
+    Transcribes on the shared ASR server when one is configured and reachable,
+    otherwise in this process. When the server is unreachable or fails, the
+    recording is transcribed here instead, unless `deadline` has passed
+    meanwhile. A server that timed out raises ASRServerTimeout rather than
+    having the same recording transcribed twice.
+    """
+    check_upload(audio_path)
+    address = asr_server_address()
+    if address and server_available():
+        started = time.perf_counter()
+        try:
+            result = remote_transcribe(address, audio_path, deadline)
+        except ASRServerTimeout:
+            raise
+        except ASRServerError as e:
+            # Reachable, so not marked down; e.g. it doesn't serve this model
+            print(f"⚠️ {e}")
+            if deadline is not None and deadline.expired():
+                raise
+        except OSError as e:
+            mark_server_down(e)
+            if deadline is not None and deadline.expired():
+                raise ASRServerError(f"ASR server unreachable and no time left to transcribe here: {e}") from e
+        else:
+            _observe(time.perf_counter() - started, result["duration"])
+            return result
+    return transcribe_local(audio_path, deadline)
+
+
+def warm_up_asr():
+    """
+    Checks the shared ASR server when one is configured, otherwise loads the
+    model here so the first transcription doesn't pay the load time.
+    """
+    address = asr_server_address()
+    if address:
+        try:
+            status = ping(address)
+            print(f"🎧 ASR server at {address} serving {', '.join(status['models'])}")
+            return
+        except (OSError, ASRServerError) as e:
+            mark_server_down(e)
+    get_model()
+
+
+def submit_transcription(audio_path, deadline=None):
+    """
+    Queues `audio_path` on the ASR pool. Returns (future, position): the future
+    resolves to the `transcribe_detailed` result, and `position` is this
+    transcription's place in line (0 if it starts right away).
+    """
+    global _asr_waiting
+
+    def run():
+        global _asr_waiting, _asr_running
+        with _asr_lock:
+            _asr_waiting -= 1
+            _asr_running += 1
+        try:
+            with profile_section():
+                return _transcribe(audio_path, deadline)
+        finally:
+            with _asr_lock:
+                _asr_running -= 1
+
+    with _asr_lock:
+        position = max(0, _asr_running + _asr_waiting - ASR_WORKERS + 1)
+        _asr_waiting += 1
+    # The caller's context carries its profiling session, if any
+    return _asr_executor.submit(contextvars.copy_context().run, run), position
+
+
+def asr_queue_stats():
+    """
+    Returns the number of transcriptions `waiting` and `running`, and the pool size.
+    """
+    with _asr_lock:
+        return {"waiting": _asr_waiting, "running": _asr_running, "workers": ASR_WORKERS}
+
+
+@register_collector
+def _asr_queue_metrics():
+    stats = asr_queue_stats()
+    return [
+        ("speech_tutor_asr_waiting", "Transcriptions waiting for an ASR worker", {(): stats["waiting"]}),
+        ("speech_tutor_asr_running", "Transcriptions in progress", {(): stats["running"]}),
+    ]
+
+
+def transcribe_detailed(audio_path, deadline=None):
+    """
+    Transcribes `audio_path` and returns a dict with the `transcript`,
+    `flagged_words` [(word, probability)], per-word `words`, `starts`, `ends`
+    and `probabilities` lists, and the audio `duration`.
+
+    Segments are decoded lazily, so when `deadline` (a deadline.Deadline) runs
+    out the transcript decoded so far is returned.
+    """
+    future, _ = submit_transcription(audio_path, deadline)
+    return future.result()
+
+
+def transcribe_unpooled(audio_path, deadline=None):
+    """
+    Same as `transcribe_detailed`, but runs on the calling thread instead of
+    waiting for the shared ASR pool. For callers with their own transcription
+    workers (batch_evaluate); load the model with `get_model(num_workers=...)`
+    first so it can run that many at once.
+    """
+    return _transcribe(audio_path, deadline)
+
+
+def transcribe(audio_path, deadline=None):
+    """
+    Transcribes `audio_path` and returns (transcript, flagged_words).
+    See `transcribe_detailed` for the word-level output.
+    """
+    result = transcribe_detailed(audio_path, deadline=deadline)
+    return result["transcript"], result["flagged_words"]